@@ -0,0 +1,148 @@
+"""Benchmark of the extract, transform and load stages of XetraETL on synthetic data"""
+import os
+import json
+import time
+import argparse
+import resource
+import sys
+from datetime import datetime, timedelta
+
+import boto3
+from moto import mock_s3
+
+from benchmarks.synthetic import synthetic_xetra_objects, SOURCE_CONFIG, TARGET_CONFIG
+from xetra.common.constants import MetaProcessFormat
+from xetra.common.s3 import S3BucketConnector
+from xetra.common.local_storage import LocalBucketConnector, is_local_url
+from xetra.transformers.xetra_transformer import XetraETL
+
+ACCESS_KEY = 'AWS_ACCESS_KEY_ID'
+SECRET_KEY = 'AWS_SECRET_ACCESS_KEY'
+SRC_BUCKET = 'xetra-bench-src'
+TRG_BUCKET = 'xetra-bench-trg'
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of the process so far in MB (ru_maxrss is in KB on Linux)
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed(function, *args):
+    """
+    Running a function and returning its result, the wall time and the peak RSS afterwards
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start, peak_rss_mb()
+
+
+def prepare_buckets(endpoint_url: str, isin_count: int, dates: list, hours: range):
+    """
+    Creating the source and target bucket and uploading the synthetic source files
+    :return: number of uploaded source rows and files
+    """
+    if is_local_url(endpoint_url):
+        put_object = LocalBucketConnector(ACCESS_KEY, SECRET_KEY, endpoint_url, SRC_BUCKET).write_object
+    else:
+        s3 = boto3.resource(service_name='s3', endpoint_url=endpoint_url)
+        for bucket in [SRC_BUCKET, TRG_BUCKET]:
+            s3.create_bucket(Bucket=bucket, CreateBucketConfiguration={'LocationConstraint': 'eu-central-1'})
+        src_bucket = s3.Bucket(SRC_BUCKET)
+
+        def put_object(key, body):
+            src_bucket.put_object(Body=body, Key=key)
+    rows, files = 0, 0
+    for key, body, object_rows in synthetic_xetra_objects(isin_count, dates, hours):
+        put_object(key, body)
+        rows += object_rows
+        files += 1
+    return rows, files
+
+
+def run_benchmark(args):
+    """
+    Timing extract, transform_report1 and load of XetraETL separately
+    :return results: dictionary with the benchmark results
+    """
+    today = datetime.today().date()
+    dates = [(today - timedelta(days=day)).strftime(MetaProcessFormat.META_DATE_FORMAT.value)
+             for day in range(args.days, 0, -1)]
+    rows, files = prepare_buckets(args.endpoint_url, args.isins, dates, range(8, 8 + args.hours))
+    connector_class = LocalBucketConnector if is_local_url(args.endpoint_url) else S3BucketConnector
+    s3_bucket_src = connector_class(ACCESS_KEY, SECRET_KEY, args.endpoint_url, SRC_BUCKET)
+    s3_bucket_trg = connector_class(ACCESS_KEY, SECRET_KEY, args.endpoint_url, TRG_BUCKET)
+    source_config = SOURCE_CONFIG._replace(src_first_extract_date=dates[1],
+                                           src_max_workers=args.workers,
+                                           src_csv_engine=args.engine)
+    xetra_etl = XetraETL(s3_bucket_src, s3_bucket_trg, 'meta/bench_meta_file.csv', source_config, TARGET_CONFIG)
+
+    data_frame, extract_time, extract_rss = timed(xetra_etl.extract)
+    report, transform_time, transform_rss = timed(xetra_etl.transform_report1, data_frame)
+    _, load_time, load_rss = timed(xetra_etl.load, report)
+    return {
+        'source_files': files,
+        'source_rows': rows,
+        'report_rows': report.shape[0],
+        'stages': {
+            'extract': {'seconds': extract_time, 'rows_per_second': rows / extract_time,
+                        'peak_rss_mb': extract_rss},
+            'transform': {'seconds': transform_time, 'rows_per_second': rows / transform_time,
+                          'peak_rss_mb': transform_rss},
+            'load': {'seconds': load_time, 'rows_per_second': report.shape[0] / load_time,
+                     'peak_rss_mb': load_rss}
+        }
+    }
+
+
+def main():
+    """
+    Entry point of the ETL benchmark
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the stages of XetraETL on synthetic Xetra data')
+    parser.add_argument('--isins', type=int, default=500, help='number of ISINs')
+    parser.add_argument('--days', type=int, default=3, help='number of trading days ending yesterday')
+    parser.add_argument('--hours', type=int, default=9, help='number of hourly files per day')
+    parser.add_argument('--workers', type=int, default=1, help='src_max_workers of the source configuration')
+    parser.add_argument('--engine', default=None, help='src_csv_engine of the source configuration')
+    parser.add_argument('--endpoint-url', default='https://s3.eu-central-1.amazonaws.com',
+                        help='S3 endpoint, e.g. of a moto server started with moto_server, or a file:// url of '
+                             'a local directory')
+    parser.add_argument('--external', action='store_true', help='use the S3 endpoint instead of mocking S3 in process')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare the stage times with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative slowdown of a stage compared to the baseline')
+    args = parser.parse_args()
+
+    os.environ.setdefault(ACCESS_KEY, 'testing')
+    os.environ.setdefault(SECRET_KEY, 'testing')
+    if args.external or is_local_url(args.endpoint_url):
+        results = run_benchmark(args)
+    else:
+        with mock_s3():
+            results = run_benchmark(args)
+
+    print(f'{results["source_files"]} source files, {results["source_rows"]:,} source rows, '
+          f'{results["report_rows"]:,} report rows')
+    for stage, stage_results in results['stages'].items():
+        print(f'{stage:>10}: {stage_results["seconds"]:8.3f} s {stage_results["rows_per_second"]:14,.0f} rows/s '
+              f'peak RSS {stage_results["peak_rss_mb"]:8.1f} MB')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(results, output_file, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = [
+            stage for stage, stage_results in results['stages'].items()
+            if stage_results['seconds'] > baseline['stages'][stage]['seconds'] * (1 + args.tolerance)
+        ]
+        if regressions:
+            print(f'Regression compared to {args.baseline} in: {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
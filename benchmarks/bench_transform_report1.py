@@ -0,0 +1,90 @@
+"""Benchmark of XetraETL.transform_report1 against the former implementation"""
+import argparse
+import time
+from unittest.mock import patch
+
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_trades, SOURCE_CONFIG, TARGET_CONFIG
+from xetra.common.meta_process import MetaProcess
+from xetra.transformers.xetra_transformer import XetraETL, XetraRunConfig
+
+
+def transform_report1_legacy(xetra_etl: XetraETL, data_frame: pd.DataFrame):
+    """
+    Former transform_report1 with two sorts and two broadcasting groupby transforms,
+    kept as reference for the results and the speed of the current implementation
+    """
+    src_args = xetra_etl.src_args
+    trg_args = xetra_etl.trg_args
+    data_frame = data_frame.loc[:, src_args.src_columns]
+    data_frame.dropna(inplace=True)
+    data_frame[trg_args.trg_col_op_price] = data_frame.sort_values(by=[src_args.src_col_time]).groupby([
+        src_args.src_col_isin,
+        src_args.src_col_date
+    ], observed=True)[src_args.src_col_starting_price].transform('first')
+    data_frame[trg_args.trg_col_clos_price] = data_frame.sort_values(by=[src_args.src_col_time]).groupby([
+        src_args.src_col_isin,
+        src_args.src_col_date
+    ], observed=True)[src_args.src_col_starting_price].transform('last')
+    data_frame.rename(columns={
+        src_args.src_col_min_price: trg_args.trg_col_min_price,
+        src_args.src_col_max_price: trg_args.trg_col_max_price,
+        src_args.src_col_traded_vol: trg_args.trg_col_daily_trad_vol
+    }, inplace=True)
+    data_frame = data_frame.groupby([
+        src_args.src_col_isin,
+        src_args.src_col_date], as_index=False, observed=True
+    ).agg({
+        trg_args.trg_col_op_price: 'min',
+        trg_args.trg_col_clos_price: 'min',
+        trg_args.trg_col_min_price: 'min',
+        trg_args.trg_col_max_price: 'max',
+        trg_args.trg_col_daily_trad_vol: 'sum'
+    })
+    return xetra_etl._finalize_report1(data_frame)
+
+
+def create_xetra_etl(extract_date: str, extract_date_list: list, run_args: XetraRunConfig = None):
+    """
+    Creating a XetraETL instance without S3 connections for transformations only
+    """
+    with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+        return XetraETL(None, None, 'meta.csv', SOURCE_CONFIG, TARGET_CONFIG, run_args)
+
+
+def main():
+    """
+    Entry point of the transform_report1 benchmark
+    """
+    parser = argparse.ArgumentParser(description='Benchmark XetraETL.transform_report1')
+    parser.add_argument('--isins', type=int, default=3000, help='number of ISINs per day')
+    parser.add_argument('--minutes', type=int, default=540, help='number of traded minutes per ISIN and day')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='also time the process pool transformation with this number of workers if > 1')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs, the best one is reported')
+    args = parser.parse_args()
+
+    dates = ['2022-09-15', '2022-09-16']
+    data_frame = synthetic_trades(args.isins, dates, args.minutes)
+    xetra_etl = create_xetra_etl(dates[1], dates)
+    print(f'{data_frame.shape[0]:,} source rows')
+    results = {}
+    transforms = [('legacy', lambda df: transform_report1_legacy(xetra_etl, df)),
+                  ('current', xetra_etl.transform_report1)]
+    if args.workers > 1:
+        xetra_etl_sharded = create_xetra_etl(dates[1], dates, XetraRunConfig(run_transform_workers=args.workers))
+        transforms.append(('sharded', xetra_etl_sharded.transform_report1))
+    for name, transform in transforms:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results[name] = transform(data_frame)
+            timings.append(time.perf_counter() - start)
+        print(f'{name:>8}: {min(timings):.3f} s, {data_frame.shape[0] / min(timings):,.0f} rows/s')
+    for name in results:
+        print(f'{name} identical to legacy: {results["legacy"].equals(results[name])}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Synthetic Xetra source data for benchmarks"""
+import numpy as np
+import pandas as pd
+
+from xetra.transformers.xetra_transformer import XetraSourceConfig, XetraTargetConfig
+
+# columns of the public Xetra source files
+XETRA_COLUMNS = ['ISIN', 'Mnemonic', 'SecurityDesc', 'SecurityType', 'Currency', 'SecurityID', 'Date', 'Time',
+                 'StartPrice', 'MaxPrice', 'MinPrice', 'EndPrice', 'NumberOfTrades', 'TradedVolume']
+
+SOURCE_CONFIG = XetraSourceConfig(
+    src_first_extract_date='2022-09-15',
+    src_columns=['ISIN', 'Mnemonic', 'Date', 'Time', 'StartPrice', 'EndPrice', 'MinPrice', 'MaxPrice',
+                 'TradedVolume'],
+    src_col_date='Date',
+    src_col_isin='ISIN',
+    src_col_time='Time',
+    src_col_starting_price='StartPrice',
+    src_col_min_price='MinPrice',
+    src_col_max_price='MaxPrice',
+    src_col_traded_vol='TradedVolume'
+)
+TARGET_CONFIG = XetraTargetConfig(
+    trg_col_isin='isin',
+    trg_col_date='date',
+    trg_col_op_price='opening_price_eur',
+    trg_col_clos_price='closing_price_eur',
+    trg_col_min_price='minimal_price_eur',
+    trg_col_max_price='maximum_price_eur',
+    trg_col_daily_trad_vol='daily_traded_volume',
+    trg_col_ch_prev_clos='change_prev_closing_%',
+    trg_key='report1/xetra_daily_report1_',
+    trg_key_date_format='%Y%m%d_%H%M%S',
+    trg_format='parquet'
+)
+
+
+def synthetic_trades(isin_count: int, dates: list, minutes: int = 540, seed: int = 1, decimals: int = 2,
+                     price_range: tuple = (1, 500)):
+    """
+    Creating trade level Xetra source data with one row per ISIN, date and minute
+    :param isin_count: number of ISINs
+    :param dates: trading days as strings
+    :param minutes: number of traded minutes per day, starting at 08:00
+    :param seed: seed of the random generator
+    :param decimals: decimals of the prices
+    :param price_range: lowest and highest starting price
+    :return data_frame: DataFrame with the Xetra source columns, shuffled
+    """
+    rng = np.random.default_rng(seed)
+    isins = np.array([f'DE{number:010d}' for number in range(isin_count)])
+    times = np.array([f'{8 + minute // 60:02d}:{minute % 60:02d}' for minute in range(minutes)])
+    rows = isin_count * len(dates) * minutes
+    price = rng.uniform(*price_range, rows).round(decimals)
+    data_frame = pd.DataFrame({
+        'ISIN': np.repeat(isins, len(dates) * minutes),
+        'Mnemonic': 'MNE',
+        'Date': np.tile(np.repeat(np.array(dates), minutes), isin_count),
+        'Time': np.tile(times, isin_count * len(dates)),
+        'StartPrice': price,
+        'EndPrice': (price * rng.uniform(0.98, 1.02, rows)).round(decimals),
+        'MinPrice': (price * 0.97).round(decimals),
+        'MaxPrice': (price * 1.03).round(decimals),
+        'TradedVolume': rng.integers(1, 10000, rows)
+    })
+    return data_frame.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def synthetic_xetra_objects(isin_count: int, dates: list, hours: range = range(8, 17), trade_probability: float = 0.6,
+                            seed: int = 1):
+    """
+    Creating Xetra source files in the layout of the public Xetra bucket: one csv file per date and hour,
+    one row per ISIN and minute with at least one trade
+    :param isin_count: number of ISINs
+    :param dates: trading days as strings
+    :param hours: trading hours, one file per hour
+    :param trade_probability: probability that an ISIN is traded in a given minute
+    :param seed: seed of the random generator
+    :return: yields tuples of key, csv content as bytes and number of rows
+    """
+    rng = np.random.default_rng(seed)
+    isins = np.array([f'DE{number:010d}' for number in range(isin_count)])
+    mnemonics = np.array([f'M{number:04d}' for number in range(isin_count)])
+    base_price = rng.uniform(1, 500, isin_count)
+    for date in dates:
+        for hour in hours:
+            minute_index, isin_index = np.nonzero(rng.random((60, isin_count)) < trade_probability)
+            rows = len(isin_index)
+            start = (base_price[isin_index] * rng.uniform(0.95, 1.05, rows)).round(2)
+            end = (start * rng.uniform(0.99, 1.01, rows)).round(2)
+            data_frame = pd.DataFrame({
+                'ISIN': isins[isin_index],
+                'Mnemonic': mnemonics[isin_index],
+                'SecurityDesc': 'SYNTHETIC SECURITY',
+                'SecurityType': 'Common stock',
+                'Currency': 'EUR',
+                'SecurityID': isin_index + 2504000,
+                'Date': date,
+                'Time': [f'{hour:02d}:{minute:02d}' for minute in minute_index],
+                'StartPrice': start,
+                'MaxPrice': np.maximum(start, end) * 1.01,
+                'MinPrice': np.minimum(start, end) * 0.99,
+                'EndPrice': end,
+                'NumberOfTrades': rng.integers(1, 20, rows),
+                'TradedVolume': rng.integers(1, 10000, rows)
+            }, columns=XETRA_COLUMNS).round(2)
+            yield f'{date}/{date}_BINS_XETR{hour:02d}.csv', data_frame.to_csv(index=False).encode('utf-8'), rows
@@ -1,11 +1,20 @@
 """ Running the Xetra ETL application"""
+import os
 import argparse
+import importlib
 import logging
 import logging.config
 import yaml
 
-from xetra.common.s3 import S3BucketConnector
-from xetra.transformers.xetra_transformer import XetraETL, XetraSourceConfig, XetraTargetConfig
+from xetra.common.constants import S3IoBackends, XetraRunModes
+from xetra.common.s3 import S3BucketConnector, S3ClientFactory
+from xetra.common.local_storage import LocalBucketConnector, is_local_url
+from xetra.common.object_cache import LocalObjectCache
+from xetra.common.metrics import RunMetrics
+from xetra.common.profiling import RunProfiler
+from xetra.transformers.xetra_transformer import XetraETL, XetraSourceConfig, XetraTargetConfig, XetraRunConfig
+from xetra.transformers.xetra_transformer import REPORT_TRANSFORMS
+from xetra.transformers.reports import XetraReportsETL
 
 
 def main():
@@ -16,6 +25,15 @@ def main():
     # Parsing YAML file
     parser = argparse.ArgumentParser(description='Run the Xetra ETL jpb')
     parser.add_argument('config', help='A configuration file in YAML format')
+    parser.add_argument('--compact', action='store_true',
+                        help='only compact the source files of the completed dates to src_compacted_key')
+    parser.add_argument('--profile', action='store_true',
+                        help='profile the run with cProfile and tracemalloc, the artifacts are written to '
+                             'the directory of the metrics summary')
+    parser.add_argument('--profile-top', type=int, default=25, help='number of hotspots reported per stage')
+    parser.add_argument('--profile-sampler',
+                        help='command of a sampling profiler started for the run, {pid} and {output_dir} '
+                             'are replaced, e.g. "py-spy record --pid {pid} --output {output_dir}/py-spy.svg"')
     args = parser.parse_args()
     config = yaml.safe_load(open(args.config))
     # Configure logging
@@ -23,25 +41,98 @@ def main():
     logging.config.dictConfig(log_config)
     logger = logging.getLogger(__name__)
     logger.info("This is a test.")
+    # Metrics of the run shared by the connectors and the ETL job
+    metrics_config = config.get('metrics', {})
+    metrics = RunMetrics()
+    profiler = None
+    if args.profile:
+        # the profile artifacts are written next to the run summary
+        profiler = RunProfiler(output_dir=os.path.join(os.path.dirname(metrics_config.get('summary_path') or ''),
+                                                       'profile'),
+                               top_n=args.profile_top, sampler_command=args.profile_sampler)
+        profiler.attach(metrics)
     # Reading S3 configuration
     s3_config = config['s3']
-    # Creating 2 instances
-    s3_bucket_src = S3BucketConnector(access_key=s3_config['access_key'], secret_key=s3_config['secret_key'],
-                                      endpoint_url=s3_config['src_endpoint_url'], bucket=s3_config['src_bucket'])
-    s3_bucket_trg = S3BucketConnector(access_key=s3_config['access_key'], secret_key=s3_config['secret_key'],
-                                      endpoint_url=s3_config['trg_endpoint_url'], bucket=s3_config['trg_bucket'])
+    # Local cache of the parsed source files, optional
+    src_cache = None
+    if s3_config.get('src_cache_dir'):
+        src_cache = LocalObjectCache(cache_dir=s3_config['src_cache_dir'],
+                                     max_bytes=s3_config.get('src_cache_max_bytes', 10 * 1024 ** 3))
+    # Both instances share one client per endpoint and its connection pool
+    client_factory = S3ClientFactory(max_pool_connections=s3_config.get('max_pool_connections', 10),
+                                     max_attempts=s3_config.get('max_attempts'),
+                                     retry_mode=s3_config.get('retry_mode'))
+    # The aiobotocore backend needs the optional package aiobotocore
+    connector_class = S3BucketConnector
+    if s3_config.get('io_backend', S3IoBackends.BOTO3.value) == S3IoBackends.AIOBOTOCORE.value:
+        from xetra.common.async_s3 import AsyncS3BucketConnector
+        connector_class = AsyncS3BucketConnector
+    # Creating 2 instances, a file:// endpoint url is a local directory
+    src_class = LocalBucketConnector if is_local_url(s3_config['src_endpoint_url']) else connector_class
+    trg_class = LocalBucketConnector if is_local_url(s3_config['trg_endpoint_url']) else connector_class
+    s3_bucket_src = src_class(access_key=s3_config['access_key'], secret_key=s3_config['secret_key'],
+                              endpoint_url=s3_config['src_endpoint_url'], bucket=s3_config['src_bucket'],
+                              object_cache=src_cache, client_factory=client_factory, metrics=metrics)
+    s3_bucket_trg = trg_class(access_key=s3_config['access_key'], secret_key=s3_config['secret_key'],
+                              endpoint_url=s3_config['trg_endpoint_url'], bucket=s3_config['trg_bucket'],
+                              client_factory=client_factory, metrics=metrics)
     # Reading source configuration
     source_config = XetraSourceConfig(**config['source'])
     # Reading target configuration
     target_config = XetraTargetConfig(**config['target'])
+    # Reading run configuration, the section is optional
+    run_config = XetraRunConfig(**config.get('run', {}))
     # Reading meta file configuration
     meta_config = config['meta']
-    # Creating XetraETL class instance
+    # Modules registering further report transformations with register_report_transform
+    for module in config.get('report_modules') or []:
+        importlib.import_module(module)
+    report_configs = config.get('reports') or []
+    for report_target in [target_config] + [target_config._replace(**report_config.get('target', {}))
+                                            for report_config in report_configs]:
+        if report_target.trg_report not in REPORT_TRANSFORMS:
+            raise ValueError(f'The report {report_target.trg_report} is not registered, '
+                             f'add the module registering it to report_modules')
+    if report_configs and (run_config.run_mode != XetraRunModes.BATCH.value or run_config.run_backfill_chunk_days
+                           or meta_config.get('manifest_key')):
+        logger.warning('With further reports all reports are computed in one batch run, run_mode %s, '
+                       'run_backfill_chunk_days and manifest_key are not used', run_config.run_mode)
+    # Creating XetraETL class instance, reading the meta file is profiled as well
     logger.info('Xetra ETL job started')
+    if profiler is not None:
+        profiler.start()
     xetra_etl = XetraETL(s3_bucket_src=s3_bucket_src, s3_bucket_trg=s3_bucket_trg,
-                         meta_key=meta_config['meta_key'], src_args=source_config, trg_args=target_config)
-    #Running ETL job for xetra report1
-    xetra_etl.etl_report1()
+                         meta_key=meta_config['meta_key'], src_args=source_config, trg_args=target_config,
+                         run_args=run_config, state_key=meta_config.get('state_key'), metrics=metrics,
+                         manifest_key=meta_config.get('manifest_key'), partials_key=meta_config.get('partials_key'))
+    # Further reports override the target section and have their own meta file
+    report_etls = [
+        XetraETL(s3_bucket_src=s3_bucket_src, s3_bucket_trg=s3_bucket_trg, meta_key=report_config['meta_key'],
+                 src_args=source_config, trg_args=target_config._replace(**report_config.get('target', {})),
+                 run_args=run_config, state_key=report_config.get('state_key'), metrics=metrics)
+        for report_config in report_configs
+    ]
+    #Running ETL job for xetra report1 and the further reports on one extraction
+    try:
+        if args.compact:
+            xetra_etl.compact_source()
+        elif report_etls:
+            XetraReportsETL([xetra_etl] + report_etls).etl_reports()
+        else:
+            xetra_etl.etl_report1()
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.write()
+            logger.info('Profile written to %s', profiler.output_dir)
+        s3_bucket_src.close()
+        s3_bucket_trg.close()
+        for stage, stage_metrics in metrics.summary()['stages'].items():
+            logger.info('Stage %s took %.3f s', stage, stage_metrics['seconds'])
+        if metrics_config.get('summary_path'):
+            metrics.write_json(metrics_config['summary_path'])
+        if metrics_config.get('prometheus_textfile'):
+            metrics.write_prometheus(metrics_config['prometheus_textfile'])
     logger.info('Xetra ETL job finished.')
 
 
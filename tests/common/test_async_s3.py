@@ -0,0 +1,122 @@
+"""TestAsyncS3BucketConnectorMethods"""
+
+import os
+import socket
+import unittest
+from urllib.request import Request, urlopen
+
+import boto3
+import pandas as pd
+
+from xetra.common.async_s3 import AsyncS3BucketConnector, get_session
+
+try:
+    from moto.server import ThreadedMotoServer
+except ImportError:
+    # the server needs the optional moto[server] dependencies
+    ThreadedMotoServer = None
+
+
+@unittest.skipIf(get_session is None or ThreadedMotoServer is None, 'aiobotocore or moto[server] is not installed')
+class TestAsyncS3BucketConnectorMethods(unittest.TestCase):
+    """
+    Testing the AsyncS3BucketConnector against a local moto server,
+    mock_s3 does not patch the aiohttp requests of aiobotocore
+    """
+
+    def setUp(self):
+        """
+        Setting up the enviroment
+        :return:
+        """
+        with socket.socket() as free_socket:
+            free_socket.bind(('127.0.0.1', 0))
+            port = free_socket.getsockname()[1]
+        self.server = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+        self.server.start()
+        # Defining the class arguments
+        self.s3_access_key = 'AWS_ACCESS_KEY_ID'
+        self.s3_secret_key = 'AWS_SECRET_ACCESS_KEY'
+        self.s3_endpoint_url = f'http://127.0.0.1:{port}'
+        self.s3_bucket_name = 'test-bucket'
+        # Create S3 access keys
+        os.environ[self.s3_access_key] = 'KEY1'
+        os.environ[self.s3_secret_key] = 'KEY2'
+        # Creating bucket on the moto server
+        self.s3 = boto3.resource(service_name='s3', endpoint_url=self.s3_endpoint_url, region_name='eu-central-1')
+        self.s3.create_bucket(Bucket=self.s3_bucket_name, CreateBucketConfiguration={
+            'LocationConstraint': 'eu-central-1'
+        })
+        self.s3_bucket = self.s3.Bucket(self.s3_bucket_name)
+        # Creating testing instance
+        self.s3_bucket_conn = AsyncS3BucketConnector(self.s3_access_key, self.s3_secret_key,
+                                                     self.s3_endpoint_url, self.s3_bucket_name)
+
+    def tearDown(self):
+        """
+        Exectunig after unittest
+        :return:
+        """
+        self.s3_bucket_conn.close()
+        # the moto backends are shared by all servers of the process
+        urlopen(Request(f'{self.s3_endpoint_url}/moto-api/reset', method='POST'))
+        self.server.stop()
+
+    def test_list_filex_in_prefix_ok(self):
+        # Expected results
+        keys_exp = [f'prefix/test{number}.csv' for number in range(3)]
+        # Test init
+        for key in keys_exp:
+            self.s3_bucket.put_object(Body='col1,col2\nvalA,valB', Key=key)
+        self.s3_bucket.put_object(Body='col1,col2\nvalA,valB', Key='other/test.csv')
+        # Method execution
+        list_result = self.s3_bucket_conn.list_filex_in_prefix('prefix/')
+        # Tests after method execution
+        self.assertEqual(sorted(list_result), keys_exp)
+
+    def test_read_csv_to_dfs_ok(self):
+        # Expected results
+        keys_exp = [f'prefix/test{number}.csv' for number in range(10)]
+        # Test init
+        for number, key in enumerate(keys_exp):
+            self.s3_bucket.put_object(Body=f'col1,col2\nval{number},{number}', Key=key)
+        # Method execution
+        dfs_result = self.s3_bucket_conn.read_csv_to_dfs(keys_exp, max_workers=3, dtypes={'col2': 'float64'})
+        # Tests after method execution
+        self.assertEqual([df['col1'][0] for df in dfs_result], [f'val{number}' for number in range(10)])
+        self.assertEqual(dfs_result[9]['col2'].dtype, 'float64')
+
+    def test_read_csv_to_df_no_such_key(self):
+        with self.assertRaises(self.s3_bucket_conn.exceptions.NoSuchKey):
+            self.s3_bucket_conn.read_csv_to_df('missing.csv')
+
+    def test_no_such_key_boto3_exceptions(self):
+        # the errors of the async client are raised as the exceptions of the boto3 client
+        self.assertIs(self.s3_bucket_conn.exceptions, self.s3_bucket_conn._client.exceptions)
+        with self.assertRaises(self.s3_bucket_conn.exceptions.NoSuchKey):
+            self.s3_bucket_conn.read_object('missing.csv')
+        with self.assertRaises(self.s3_bucket_conn.exceptions.NoSuchKey):
+            self.s3_bucket_conn.read_parquet_to_df('missing.parquet')
+        with self.assertRaises(self.s3_bucket_conn.exceptions.NoSuchKey):
+            self.s3_bucket_conn.read_csv_to_dfs(['missing.csv', 'missing2.csv'], max_workers=2)
+
+    def test_read_object_object_info(self):
+        self.s3_bucket.put_object(Body=b'col1,col2\nvalA,valB', Key='test.csv')
+        etag = self.s3_bucket.Object('test.csv').e_tag
+        # the object was not listed, its ETag and size are read with a HEAD request
+        self.assertEqual(self.s3_bucket_conn.object_info('test.csv'), (etag, 19))
+        self.assertEqual(self.s3_bucket_conn.read_object('test.csv'), b'col1,col2\nvalA,valB')
+
+    def test_write_df_to_s3_parquet(self):
+        # Expected results
+        df_exp = pd.DataFrame([['a', 'b'], ['c', 'd']], columns=['col1', 'col2'])
+        key_exp = 'test.parquet'
+        # Method execution
+        result = self.s3_bucket_conn.write_df_to_s3(df_exp, key_exp, 'parquet')
+        # Tests after method execution
+        self.assertTrue(result)
+        self.assertTrue(df_exp.equals(self.s3_bucket_conn.read_parquet_to_df(key_exp)))
+
+
+if __name__ == '__main__':
+    unittest.main()
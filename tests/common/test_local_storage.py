@@ -0,0 +1,135 @@
+"""TestLocalBucketConnectorMethods"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import boto3
+import pandas as pd
+from mock import patch
+from moto import mock_s3
+
+from xetra.common.local_storage import LocalBucketConnector, is_local_url
+from xetra.common.meta_process import MetaProcess
+from xetra.common.s3 import S3BucketConnector
+from xetra.transformers.xetra_transformer import XetraETL, XetraSourceConfig, XetraTargetConfig
+
+
+class TestLocalBucketConnectorMethods(unittest.TestCase):
+    """
+    Testing the LocalBucketConnector
+    """
+
+    def setUp(self):
+        """
+        Setting up the enviroment
+        :return:
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.endpoint_url = Path(self.tmp_dir.name).as_uri()
+        self.bucket_conn = LocalBucketConnector(None, None, self.endpoint_url, 'test-bucket')
+
+    def tearDown(self):
+        """
+        Exectunig after unittest
+        :return:
+        """
+        self.tmp_dir.cleanup()
+
+    def test_list_filex_in_prefix_ok(self):
+        # Expected results
+        keys_exp = ['2021-04-17/a.csv', '2021-04-17/b.csv']
+        # Test init
+        for key in keys_exp + ['2021-04-18/c.csv', 'meta/2021-04-17.csv']:
+            self.bucket_conn.write_object(key, b'col1,col2\nvalA,valB')
+        # a write in progress is not listed
+        Path(self.bucket_conn.root, '2021-04-17', '.c.csv.1.tmp').touch()
+        # Method execution
+        list_result = self.bucket_conn.list_filex_in_prefix('2021-04-17')
+        # Tests after method execution
+        self.assertTrue(is_local_url(self.endpoint_url))
+        self.assertEqual(list_result, keys_exp)
+        self.assertEqual(self.bucket_conn.list_filex_in_prefix('2021-04-19'), [])
+
+    def test_read_and_write_ok(self):
+        # Expected results
+        df_exp = pd.DataFrame([['A', 1.5], ['B', 2.5]], columns=['col1', 'col2'])
+        # Method execution
+        self.bucket_conn.write_df_to_s3(df_exp, 'csv/test.csv', 'csv')
+        self.bucket_conn.write_df_to_s3(df_exp, 'parquet/test.parquet', 'parquet')
+        self.bucket_conn.write_parquet_stream([df_exp, df_exp], 'parquet/stream.parquet')
+        # Tests after method execution
+        for engine in [None, 'pyarrow']:
+            self.assertTrue(df_exp.equals(self.bucket_conn.read_csv_to_df('csv/test.csv', engine=engine)))
+        self.assertTrue(df_exp.equals(S3BucketConnector.parse_csv(self.bucket_conn.read_object('csv/test.csv'))))
+        self.assertTrue(df_exp.equals(self.bucket_conn.read_parquet_to_df('parquet/test.parquet')))
+        self.assertEqual(self.bucket_conn.read_parquet_to_df('parquet/stream.parquet').shape[0], 4)
+        self.assertEqual(self.bucket_conn.object_info('csv/test.csv')[1], os.path.getsize(
+            os.path.join(self.bucket_conn.root, 'csv', 'test.csv')
+        ))
+        # no temporary files are left behind
+        self.assertEqual(sorted(os.listdir(os.path.join(self.bucket_conn.root, 'parquet'))),
+                         ['stream.parquet', 'test.parquet'])
+
+    def test_failed_stream_leaves_no_file(self):
+        def data_frames():
+            yield pd.DataFrame({'col1': [1]})
+            raise OSError
+
+        with self.assertRaises(OSError):
+            self.bucket_conn.write_parquet_stream(data_frames(), 'parquet/stream.parquet')
+        self.assertEqual(os.listdir(os.path.join(self.bucket_conn.root, 'parquet')), [])
+
+    def test_no_such_key(self):
+        with self.assertRaises(self.bucket_conn.exceptions.NoSuchKey):
+            self.bucket_conn.read_parquet_to_df('missing.parquet')
+        with self.assertRaises(self.bucket_conn.exceptions.NoSuchKey):
+            self.bucket_conn.read_object('missing.csv')
+        self.assertTrue(self.bucket_conn.delete_objects(['missing.csv']))
+
+    @mock_s3
+    def test_mirror_and_etl_report1(self):
+        # Test init
+        os.environ['AWS_ACCESS_KEY_ID'] = 'KEY1'
+        os.environ['AWS_SECRET_ACCESS_KEY'] = 'KEY2'
+        s3_endpoint_url = 'https://s3.eu-central-1.amazonaws.com'
+        boto3.resource(service_name='s3', endpoint_url=s3_endpoint_url).create_bucket(
+            Bucket='src-bucket', CreateBucketConfiguration={'LocationConstraint': 'eu-central-1'}
+        )
+        s3_bucket_src = S3BucketConnector('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', s3_endpoint_url, 'src-bucket')
+        df_src = pd.DataFrame([['AT0000AE9W5', 'SANT', '2021-04-16', '15:08', 18.27, 21.19, 18.27, 21.34, 987],
+                               ['AT0000AE9W5', 'SANT', '2021-04-17', '13:00', 20.21, 21.19, 18.21, 20.42, 633]],
+                              columns=['ISIN', 'Mnemonic', 'Date', 'Time', 'StartPrice', 'EndPrice', 'MinPrice',
+                                       'MaxPrice', 'TradedVolume'])
+        s3_bucket_src.write_df_to_s3(df_src.loc[0:0], '2021-04-16/2021-04-16_BINS_XETRA15.csv', 'csv')
+        s3_bucket_src.write_df_to_s3(df_src.loc[1:1], '2021-04-17/2021-04-17_BINS_XETRA13.csv', 'csv')
+        source_config = XetraSourceConfig(
+            src_first_extract_date='2021-04-17', src_columns=list(df_src.columns), src_col_date='Date',
+            src_col_isin='ISIN', src_col_time='Time', src_col_starting_price='StartPrice',
+            src_col_min_price='MinPrice', src_col_max_price='MaxPrice', src_col_traded_vol='TradedVolume'
+        )
+        target_config = XetraTargetConfig(
+            trg_col_isin='isin', trg_col_date='date', trg_col_op_price='opening_price_eur',
+            trg_col_clos_price='closing_price_eur', trg_col_min_price='minimal_price_eur',
+            trg_col_max_price='maximum_price_eur', trg_col_daily_trad_vol='daily_traded_volume',
+            trg_col_ch_prev_clos='change_prev_closing_%', trg_key='report1/xetra_daily_report1_',
+            trg_key_date_format='%Y%m%d_%H%M%S', trg_format='parquet'
+        )
+        local_src = LocalBucketConnector(None, None, self.endpoint_url, 'src-bucket')
+        # Method execution
+        mirrored = local_src.mirror(s3_bucket_src, ['2021-04-16', '2021-04-17'], max_workers=2)
+        mirrored_again = local_src.mirror(s3_bucket_src, ['2021-04-16', '2021-04-17'])
+        with patch.object(MetaProcess, 'return_date_list', return_value=['2021-04-17', ['2021-04-16', '2021-04-17']]):
+            xetra_etl = XetraETL(local_src, self.bucket_conn, 'meta/meta.csv', source_config, target_config)
+            xetra_etl.etl_report1()
+        # Tests after method execution
+        self.assertEqual(len(mirrored), 2)
+        self.assertEqual(mirrored_again, [])
+        df_result = self.bucket_conn.read_parquet_to_df(self.bucket_conn.list_filex_in_prefix('report1/')[0])
+        self.assertEqual(list(df_result['change_prev_closing_%']), [10.62])
+        self.assertEqual(list(self.bucket_conn.read_csv_to_df('meta/meta.csv')['source_date']), ['2021-04-17'])
+
+
+if __name__ == '__main__':
+    unittest.main()
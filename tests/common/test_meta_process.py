@@ -2,7 +2,9 @@
 
 import os
 import unittest
+from unittest.mock import patch
 import boto3
+import numpy as np
 import pandas as pd
 from io import StringIO
 from moto import mock_s3
@@ -10,6 +12,7 @@ from datetime import datetime, timedelta
 from xetra.common.s3 import S3BucketConnector
 from xetra.common.meta_process import MetaProcess
 from xetra.common.constants import MetaProcessFormat
+from xetra.common.trading_calendar import trading_calendar
 from xetra.common.custom_exceptions import WrongMetaFileEceptions
 
 
@@ -228,6 +231,123 @@ class TestMetaProcessMethods(unittest.TestCase):
             }
         )
 
+    def test_meta_file_parquet_ok(self):
+        meta_key = 'meta.parquet'
+        date_list_exp = [self.dates[4], self.dates[3], self.dates[1]]
+        # dates are written unsorted and with a duplicate
+        MetaProcess.update_meta_file([self.dates[3], self.dates[4]], meta_key, self.s3_bucket_meta)
+        MetaProcess.update_meta_file([self.dates[1], self.dates[3]], meta_key, self.s3_bucket_meta)
+
+        df_meta_result = self.s3_bucket_meta.read_parquet_to_df(meta_key)
+        min_date_return, date_list_return = MetaProcess.return_date_list(self.dates[4], meta_key,
+                                                                         self.s3_bucket_meta)
+        self.assertEqual(date_list_exp, list(df_meta_result[MetaProcessFormat.META_SOURCE_DATE_COL.value]))
+        self.assertEqual(self.dates[2], min_date_return)
+        self.assertEqual(set(self.dates[0:4]), set(date_list_return))
+        self.s3_bucket.delete_objects(
+            Delete={
+                'Objects': [
+                    {
+                        'Key': meta_key
+                    }
+                ]
+            }
+        )
+
+    def test_meta_prefix_ok(self):
+        meta_key = 'meta/'
+        date_list_exp = [self.dates[4], self.dates[3], self.dates[1]]
+        with patch.object(self.s3_bucket_meta, 'read_csv_to_df') as read_csv_to_df:
+            # dates are written unsorted and with a duplicate
+            MetaProcess.update_meta_file([self.dates[3], self.dates[4]], meta_key, self.s3_bucket_meta)
+            MetaProcess.update_meta_file([self.dates[1], self.dates[3]], meta_key, self.s3_bucket_meta)
+            min_date_return, date_list_return = MetaProcess.return_date_list(self.dates[4], meta_key,
+                                                                             self.s3_bucket_meta)
+        df_meta_result = MetaProcess.read_meta_file(meta_key, self.s3_bucket_meta)
+
+        # neither the updates nor the dates read a meta object
+        read_csv_to_df.assert_not_called()
+        self.assertEqual(self.s3_bucket_meta.list_filex_in_prefix(meta_key),
+                         [f'meta/{date}.csv' for date in date_list_exp])
+        self.assertEqual(date_list_exp, list(df_meta_result[MetaProcessFormat.META_SOURCE_DATE_COL.value]))
+        self.assertEqual(self.dates[2], min_date_return)
+        self.assertEqual(set(self.dates[0:4]), set(date_list_return))
+        self.assertEqual(MetaProcess.read_meta_dates('missing/', self.s3_bucket_meta).size, 0)
+
+    def test_manifest_diff_and_update(self):
+        manifest_key = 'manifest.parquet'
+        columns = MetaProcess.manifest_columns()[:-1]
+        df_processed = pd.DataFrame([[self.dates[1], f'{self.dates[1]}/a.csv', '"e1"', 10],
+                                     [self.dates[1], f'{self.dates[1]}/b.csv', '"e2"', 20],
+                                     [self.dates[2], f'{self.dates[2]}/c.csv', '"e3"', 30]], columns=columns)
+        MetaProcess.update_manifest(df_processed, [], manifest_key, self.s3_bucket_meta)
+        # b.csv changed, c.csv is gone and d.csv is new
+        df_listing = pd.DataFrame([[self.dates[1], f'{self.dates[1]}/a.csv', '"e1"', 10],
+                                   [self.dates[1], f'{self.dates[1]}/b.csv', '"e4"', 25],
+                                   [self.dates[1], f'{self.dates[1]}/d.csv', '"e5"', 5],
+                                   [self.dates[2], f'{self.dates[2]}/e.csv', '"e6"', 5]], columns=columns)
+
+        df_manifest = MetaProcess.read_manifest(manifest_key, self.s3_bucket_meta)
+        df_new, df_changed, df_removed = MetaProcess.diff_manifest(df_manifest, df_listing)
+        MetaProcess.update_manifest(pd.concat([df_new, df_changed]), list(df_removed['source_key']),
+                                    manifest_key, self.s3_bucket_meta)
+        df_manifest_updated = MetaProcess.read_manifest(manifest_key, self.s3_bucket_meta)
+
+        self.assertEqual(list(df_manifest.columns), MetaProcess.manifest_columns())
+        self.assertEqual(list(df_new['source_key']), [f'{self.dates[1]}/d.csv', f'{self.dates[2]}/e.csv'])
+        self.assertEqual(list(df_changed['source_key']), [f'{self.dates[1]}/b.csv'])
+        self.assertEqual(list(df_removed['source_key']), [f'{self.dates[2]}/c.csv'])
+        self.assertEqual(list(df_manifest_updated['etag']), ['"e6"', '"e1"', '"e4"', '"e5"'])
+        self.assertTrue(MetaProcess.read_manifest('missing.parquet', self.s3_bucket_meta).empty)
+
+    def test_dated_keys(self):
+        dates = ['2022-09-01', '2022-09-02', '2022-09-05']
+        keys = ['2022-09-01/a.csv', '2022-09-01/b.csv', '2022-09-05/c.csv']
+        dated_keys_exp = [('2022-09-01', keys[0]), ('2022-09-01', keys[1]), ('2022-09-05', keys[2])]
+
+        self.assertEqual(list(MetaProcess.dated_keys(dates, keys)), dated_keys_exp)
+        self.assertEqual(list(MetaProcess.dated_keys(dates, [])), [])
+
+    def test_first_missing_date(self):
+        first_date = datetime(2022, 9, 1).date()
+        last_date = datetime(2022, 9, 30).date()
+        dates = [first_date - timedelta(days=2)] + [first_date + timedelta(days=day) for day in range(30)]
+        dates_gap = dates[:10] + dates[12:]
+
+        self.assertIsNone(MetaProcess.first_missing_date(dates, first_date, last_date))
+        self.assertEqual(first_date + timedelta(days=9), MetaProcess.first_missing_date(dates_gap, first_date,
+                                                                                        last_date))
+        self.assertEqual(first_date, MetaProcess.first_missing_date([], first_date, last_date))
+        self.assertEqual(last_date, MetaProcess.first_missing_date(dates[:-1], first_date, last_date))
+
+    def test_return_date_list_trading_calendar(self):
+        # Expected results, Good Friday and Easter Monday 2021 and the weekend between are skipped
+        date_list_exp = ['2021-03-31', '2021-04-01', '2021-04-06', '2021-04-07']
+        calendar = trading_calendar(2021, datetime.today().year, holidays=['2021-04-07'])
+        # Method execution
+        min_date_return, date_list_return = MetaProcess.return_date_list(
+            '2021-04-01', 'meta.csv', self.s3_bucket_meta, trading_calendar(2021, datetime.today().year)
+        )
+        first_missing_return = MetaProcess.first_missing_date(
+            np.array(['2021-03-31', '2021-04-01'], dtype='datetime64[D]'), datetime(2021, 4, 1).date(),
+            datetime(2021, 4, 9).date(), calendar
+        )
+        # Good Friday and the Saturday were recorded by runs without the calendar
+        first_missing_legacy_return = MetaProcess.first_missing_date(
+            np.array(['2021-03-31', '2021-04-01', '2021-04-02', '2021-04-03', '2021-04-06'], dtype='datetime64[D]'),
+            datetime(2021, 4, 1).date(), datetime(2021, 4, 9).date(), calendar
+        )
+        # Test after method executed
+        self.assertEqual('2021-04-01', min_date_return)
+        self.assertEqual(date_list_exp, date_list_return[:4])
+        self.assertTrue(all(datetime.strptime(date, '%Y-%m-%d').weekday() < 5 for date in date_list_return))
+        self.assertNotIn('2021-12-24', date_list_return)
+        self.assertEqual(datetime(2021, 4, 6).date(), first_missing_return)
+        self.assertEqual(datetime(2021, 4, 8).date(), first_missing_legacy_return)
+        self.assertEqual(['2021-04-06', '2021-04-08'], list(np.datetime_as_string(
+            MetaProcess.trading_days('2021-04-02', '2021-04-08', calendar)
+        )))
+
     def test_returtn_date_list_meta_file_wrong(self):
         meta_key = 'meta.csv'
         meta_content = (
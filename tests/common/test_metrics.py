@@ -0,0 +1,78 @@
+"""TestRunMetricsMethods"""
+
+import os
+import json
+import tempfile
+import unittest
+
+from xetra.common.metrics import RunMetrics
+
+
+class TestRunMetricsMethods(unittest.TestCase):
+    """
+    Testing the RunMetrics
+    """
+
+    def setUp(self):
+        """
+        Setting up the enviroment
+        :return:
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.metrics = RunMetrics()
+
+    def tearDown(self):
+        """
+        Exectunig after unittest
+        :return:
+        """
+        self.tmp_dir.cleanup()
+
+    def test_summary_ok(self):
+        # Method execution
+        for _ in range(2):
+            with self.metrics.stage('extract'):
+                self.metrics.increment('rows_in', 10)
+        for value in range(1, 101):
+            self.metrics.observe('download_seconds', value / 100)
+        summary = self.metrics.summary()
+        # Tests after method execution
+        self.assertEqual(summary['stages']['extract']['calls'], 2)
+        self.assertGreater(summary['stages']['extract']['peak_rss_bytes'], 0)
+        self.assertEqual(summary['counters'], {'rows_in': 20})
+        self.assertEqual(summary['observations']['download_seconds']['count'], 100)
+        self.assertAlmostEqual(summary['observations']['download_seconds']['max'], 1.0)
+        self.assertAlmostEqual(summary['observations']['download_seconds']['p50'], 0.505)
+
+    def test_stage_exception(self):
+        with self.assertRaises(ValueError):
+            with self.metrics.stage('load'):
+                raise ValueError
+        self.assertEqual(self.metrics.summary()['stages']['load']['calls'], 1)
+
+    def test_write_json_and_prometheus(self):
+        # Expected results
+        json_path = os.path.join(self.tmp_dir.name, 'metrics', 'summary.json')
+        prom_path = os.path.join(self.tmp_dir.name, 'metrics', 'xetra.prom')
+        # Method execution
+        with self.metrics.stage('transform'):
+            self.metrics.increment('download_bytes', 2048)
+            self.metrics.observe('parse_seconds', 0.25)
+        self.metrics.write_json(json_path)
+        self.metrics.write_prometheus(prom_path)
+        # Tests after method execution
+        with open(json_path, encoding='utf-8') as json_file:
+            summary = json.load(json_file)
+        with open(prom_path, encoding='utf-8') as prom_file:
+            prom_lines = prom_file.read().splitlines()
+        self.assertEqual(summary['counters']['download_bytes'], 2048)
+        self.assertIn('xetra_etl_download_bytes_total 2048', prom_lines)
+        self.assertIn('xetra_etl_parse_seconds{quantile="0.5"} 0.25', prom_lines)
+        self.assertIn('xetra_etl_parse_seconds_count 1', prom_lines)
+        self.assertTrue(any(line.startswith('xetra_etl_stage_seconds{stage="transform"}') for line in prom_lines))
+        # no temporary files are left behind
+        self.assertEqual(sorted(os.listdir(os.path.dirname(json_path))), ['summary.json', 'xetra.prom'])
+
+
+if __name__ == '__main__':
+    unittest.main()
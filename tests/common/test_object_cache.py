@@ -0,0 +1,88 @@
+"""TestLocalObjectCacheMethods"""
+
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from xetra.common.object_cache import LocalObjectCache
+
+
+class TestLocalObjectCacheMethods(unittest.TestCase):
+    """
+    Testing the LocalObjectCache
+    """
+
+    def setUp(self):
+        """
+        Setting up the enviroment
+        :return:
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, 'cache')
+        self.read_options = {'decoding': 'utf-8', 'sep': ','}
+        self.df = pd.DataFrame([['a', 1.5], ['b', 2.5]], columns=['col1', 'col2'])
+
+    def tearDown(self):
+        """
+        Exectunig after unittest
+        :return:
+        """
+        self.tmp_dir.cleanup()
+
+    def test_put_get_ok(self):
+        cache = LocalObjectCache(self.cache_dir, max_bytes=10 * 1024 ** 2)
+        result = cache.put('bucket', 'key.csv', '"etag1"', self.read_options, self.df)
+        df_result = cache.get('bucket', 'key.csv', '"etag1"', self.read_options)
+        self.assertTrue(result)
+        self.assertTrue(self.df.equals(df_result))
+
+    def test_get_changed_etag(self):
+        cache = LocalObjectCache(self.cache_dir, max_bytes=10 * 1024 ** 2)
+        cache.put('bucket', 'key.csv', '"etag1"', self.read_options, self.df)
+        self.assertIsNone(cache.get('bucket', 'key.csv', '"etag2"', self.read_options))
+        self.assertIsNone(cache.get('bucket', 'key.csv', '"etag1"', {'decoding': 'utf-8', 'sep': ';'}))
+
+    def test_put_evicts_least_recently_used(self):
+        cache = LocalObjectCache(self.cache_dir, max_bytes=10 * 1024 ** 2)
+        cache.put('bucket', 'key1.csv', '"etag"', self.read_options, self.df)
+        entry_size = cache._size
+        cache.max_bytes = 3 * entry_size
+        cache.put('bucket', 'key2.csv', '"etag"', self.read_options, self.df)
+        cache.put('bucket', 'key3.csv', '"etag"', self.read_options, self.df)
+        # key1 is used again, so key2 and key3 are the least recently used entries
+        cache.get('bucket', 'key1.csv', '"etag"', self.read_options)
+        cache.put('bucket', 'key4.csv', '"etag"', self.read_options, self.df)
+        # the eviction goes down to the low watermark, not only below max_bytes
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        self.assertEqual(cache._size, 2 * entry_size)
+        self.assertIsNotNone(cache.get('bucket', 'key1.csv', '"etag"', self.read_options))
+        self.assertIsNone(cache.get('bucket', 'key2.csv', '"etag"', self.read_options))
+        self.assertIsNone(cache.get('bucket', 'key3.csv', '"etag"', self.read_options))
+        self.assertIsNotNone(cache.get('bucket', 'key4.csv', '"etag"', self.read_options))
+
+    def test_put_rewrite_size(self):
+        cache = LocalObjectCache(self.cache_dir, max_bytes=10 * 1024 ** 2)
+        cache.put('bucket', 'key.csv', '"etag"', self.read_options, self.df)
+        entry_size = cache._size
+        cache.put('bucket', 'key.csv', '"etag"', self.read_options, self.df)
+        self.assertEqual(cache._size, entry_size)
+
+    def test_init_access_order(self):
+        cache = LocalObjectCache(self.cache_dir, max_bytes=10 * 1024 ** 2)
+        cache.put('bucket', 'key1.csv', '"etag"', self.read_options, self.df)
+        cache.put('bucket', 'key2.csv', '"etag"', self.read_options, self.df)
+        entry_size = cache._size // 2
+        for mtime, name in enumerate(sorted(os.listdir(self.cache_dir))):
+            os.utime(os.path.join(self.cache_dir, name), (mtime, mtime))
+        cache.get('bucket', 'key1.csv', '"etag"', self.read_options)
+        # a new cache takes the access order of the last run from the modification times
+        cache = LocalObjectCache(self.cache_dir, max_bytes=int(2.5 * entry_size))
+        self.assertEqual(cache._size, 2 * entry_size)
+        cache.put('bucket', 'key3.csv', '"etag"', self.read_options, self.df)
+        self.assertIsNotNone(cache.get('bucket', 'key1.csv', '"etag"', self.read_options))
+        self.assertIsNone(cache.get('bucket', 'key2.csv', '"etag"', self.read_options))
+
+if __name__ == '__main__':
+    unittest.main()
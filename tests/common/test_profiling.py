@@ -0,0 +1,58 @@
+"""TestRunProfilerMethods"""
+
+import os
+import json
+import pstats
+import tempfile
+import unittest
+
+from xetra.common.metrics import RunMetrics
+from xetra.common.profiling import RunProfiler
+
+
+class TestRunProfilerMethods(unittest.TestCase):
+    """
+    Testing the RunProfiler
+    """
+
+    def setUp(self):
+        """
+        Setting up the enviroment
+        :return:
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.metrics = RunMetrics()
+        self.profiler = RunProfiler(self.tmp_dir.name, top_n=5)
+        self.profiler.attach(self.metrics)
+
+    def tearDown(self):
+        """
+        Exectunig after unittest
+        :return:
+        """
+        self.tmp_dir.cleanup()
+
+    def test_profile_stages(self):
+        # Method execution
+        self.profiler.start()
+        with self.metrics.stage('extract'):
+            data = [str(number) * 10 for number in range(100000)]
+        with self.metrics.stage('transform'):
+            data = sorted(data)
+        self.profiler.stop()
+        summary = self.profiler.write()
+        # Tests after method execution
+        self.assertTrue({'extract', 'transform'} <= set(summary))
+        # the list of 100000 strings is allocated in the extract stage
+        self.assertGreater(summary['extract']['peak_traced_bytes'], 100000 * 50)
+        self.assertIn('sorted', ''.join(str(key) for key in pstats.Stats(
+            os.path.join(self.tmp_dir.name, 'profile_transform.pstats')).stats))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, 'profile.pstats')))
+        with open(os.path.join(self.tmp_dir.name, 'hotspots.txt'), encoding='utf-8') as hotspots_file:
+            self.assertIn('stage extract: allocations', hotspots_file.read())
+        with open(os.path.join(self.tmp_dir.name, 'profile_summary.json'), encoding='utf-8') as summary_file:
+            self.assertEqual(json.load(summary_file), summary)
+
+
+if __name__ == '__main__':
+    unittest.main()
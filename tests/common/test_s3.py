@@ -1,13 +1,18 @@
 """TestS3BucketConnectorsMethods"""
 
 import os
+import tempfile
 import unittest
 
 import boto3
 from moto import mock_s3
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 
-from xetra.common.s3 import S3BucketConnector
+from mock import patch
+from xetra.common.s3 import S3BucketConnector, S3ClientFactory
+from xetra.common.object_cache import LocalObjectCache
 from pandas import DataFrame
 from io import StringIO, BytesIO
 from xetra.common.custom_exceptions import WrongFormatException
@@ -90,6 +95,48 @@ class TestS3BucketConnectorMethods(unittest.TestCase):
         # Tests after method executions
         self.assertTrue(not list_result)
 
+    def test_list_files_in_prefixes_cached(self):
+        # Expected results
+        keys_exp = ['2022-09-15/test1.csv', '2022-09-15/test2.csv', '2022-09-16/test1.csv']
+        # Test init
+        for key in keys_exp:
+            self.s3_bucket.put_object(Body='col1,col2\nvalA,valB', Key=key)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # Method execution
+            list_result = self.s3_bucket_conn.list_files_in_prefixes(
+                ['2022-09-15', '2022-09-16'], max_workers=2, cache_dir=cache_dir, cacheable={'2022-09-15'}
+            )
+            self.s3_bucket.put_object(Body='col1,col2\nvalA,valB', Key='2022-09-15/test3.csv')
+            self.s3_bucket.put_object(Body='col1,col2\nvalA,valB', Key='2022-09-16/test2.csv')
+            list_cached_result = self.s3_bucket_conn.list_files_in_prefixes(
+                ['2022-09-15', '2022-09-16'], cache_dir=cache_dir, cacheable={'2022-09-15'}
+            )
+        # Tests after method executions
+        self.assertEqual(keys_exp, list_result)
+        self.assertEqual(keys_exp + ['2022-09-16/test2.csv'], list_cached_result)
+        # Cleanup after tests
+        self.s3_bucket.delete_objects(
+            Delete={
+                'Objects': [{'Key': key} for key in keys_exp + ['2022-09-15/test3.csv', '2022-09-16/test2.csv']]
+            }
+        )
+
+    def test_client_factory_shared(self):
+        client_factory = S3ClientFactory(max_pool_connections=32, max_attempts=5, retry_mode='adaptive')
+        key_exp = 'missing.csv'
+        # Method execution
+        conn1 = S3BucketConnector(self.s3_access_key, self.s3_secret_key, self.s3_endpoint_url,
+                                  self.s3_bucket_name, client_factory=client_factory)
+        conn2 = S3BucketConnector(self.s3_access_key, self.s3_secret_key, self.s3_endpoint_url,
+                                  self.s3_bucket_name, client_factory=client_factory)
+        # Test after method execution
+        self.assertIs(conn1._client, conn2._client)
+        self.assertIsNot(conn1._client, self.s3_bucket_conn._client)
+        self.assertEqual(conn1._client.meta.config.max_pool_connections, 32)
+        self.assertEqual(conn1._client.meta.config.retries['mode'], 'adaptive')
+        with self.assertRaises(conn2.exceptions.NoSuchKey):
+            conn1._client.get_object(Bucket=self.s3_bucket_name, Key=key_exp)
+
     def test_read_csv_to_df_ok(self):
         # Expected results
         key_exem1 = 'key1.csv'
@@ -114,6 +161,89 @@ class TestS3BucketConnectorMethods(unittest.TestCase):
             }
         )
 
+    def test_read_csv_to_df_pyarrow(self):
+        # Expected results
+        key_exp = 'key1.csv'
+        df_exp = pd.DataFrame([['valA', 1.5], ['valC', 2.5]], columns=['col1', 'col3'])
+        df_exp['col3'] = df_exp['col3'].astype('float32')
+        # Test init
+        self.s3_bucket.put_object(Body='col1,col2,col3\nvalA,valB,1.5\nvalC,valD,2.5', Key=key_exp)
+        # Method execution
+        df_result = self.s3_bucket_conn.read_csv_to_df(key_exp, engine='pyarrow', columns=['col1', 'col3'],
+                                                       dtypes={'col3': 'float32'})
+        # Test after method executed
+        self.assertEqual(list(df_result.columns), ['col1', 'col3'])
+        self.assertEqual(list(df_result['col1']), list(df_exp['col1']))
+        self.assertEqual(df_result['col3'].dtype, df_exp['col3'].dtype)
+        self.assertEqual(list(df_result['col3']), list(df_exp['col3']))
+        # Clean after test
+        self.s3_bucket.delete_objects(
+            Delete={
+                'Objects': [{'Key': key_exp}]
+            }
+        )
+
+    def test_read_with_filters(self):
+        # Expected results
+        filters_exp = {'col1': ['valA', 'valE']}
+        # Test init
+        self.s3_bucket.put_object(Body='col1,col2\nvalA,1\nvalC,2\nvalE,3', Key='key1.csv')
+        self.s3_bucket_conn.write_df_to_s3(pd.DataFrame({'col1': ['valA', 'valC', 'valE'], 'col2': [1, 2, 3]}),
+                                           'key1.parquet', 'parquet', row_group_size=1)
+        # Method execution
+        df_results = [self.s3_bucket_conn.read_csv_to_df('key1.csv', engine=engine, filters=filters_exp)
+                      for engine in [None, 'pyarrow']]
+        df_results.append(self.s3_bucket_conn.read_parquet_to_df('key1.parquet', filters=filters_exp))
+        # Test after method executed
+        for df_result in df_results:
+            self.assertEqual(list(df_result['col1']), ['valA', 'valE'])
+            self.assertEqual(list(df_result['col2']), [1, 3])
+            self.assertEqual(list(df_result.index), [0, 1])
+
+    def test_read_csv_to_dfs_concurrent_ok(self):
+        # Expected results
+        keys_exp = [f'prefix/key{number}.csv' for number in range(5)]
+        # Test init
+        for number, key in enumerate(keys_exp):
+            self.s3_bucket.put_object(Body=f'col1,col2\nval{number},valB', Key=key)
+        # Method execution
+        dfs_result = self.s3_bucket_conn.read_csv_to_dfs(keys_exp, max_workers=3)
+        # Test after method executed
+        self.assertEqual(len(dfs_result), len(keys_exp))
+        self.assertEqual([df['col1'][0] for df in dfs_result], [f'val{number}' for number in range(5)])
+        # Clean after test
+        self.s3_bucket.delete_objects(
+            Delete={
+                'Objects': [{'Key': key} for key in keys_exp]
+            }
+        )
+
+    def test_read_csv_to_df_cached(self):
+        # Expected results
+        key_exp = 'prefix/key1.csv'
+        # Test init
+        self.s3_bucket.put_object(Body='col1,col2\nvalA,valB', Key=key_exp)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            s3_bucket_conn = S3BucketConnector(self.s3_access_key, self.s3_secret_key,
+                                               self.s3_endpoint_url, self.s3_bucket_name,
+                                               object_cache=LocalObjectCache(cache_dir, 1024 ** 2))
+            # Method execution
+            df_first = s3_bucket_conn.read_csv_to_df(key_exp)
+            with patch.object(s3_bucket_conn._client, 'get_object', side_effect=AssertionError):
+                df_cached = s3_bucket_conn.read_csv_to_df(key_exp)
+            # a changed object must not be read from the cache
+            self.s3_bucket.put_object(Body='col1,col2\nvalC,valD', Key=key_exp)
+            df_changed = s3_bucket_conn.read_csv_to_df(key_exp)
+        # Test after method executed
+        self.assertTrue(df_first.equals(df_cached))
+        self.assertEqual(df_changed['col1'][0], 'valC')
+        # Clean after test
+        self.s3_bucket.delete_objects(
+            Delete={
+                'Objects': [{'Key': key_exp}]
+            }
+        )
+
     def test_write_df_to_s3_empty(self):
         return_exp = None
         log_exp = 'The DataFrame is empty! File will not be written!'
@@ -179,6 +309,78 @@ class TestS3BucketConnectorMethods(unittest.TestCase):
             }
         )
 
+    def test_write_df_to_s3_parquet_multipart(self):
+        return_exp = True
+        # random floats do not compress, the file needs more than one part of 5 MB
+        df_exp = pd.DataFrame({'col1': np.random.default_rng(1).random(1500000), 'col2': 'a'})
+        key_exp = 'test.parquet'
+        part_size = 5 * 1024 ** 2
+        # moto does not decode the aws-chunked bodies boto sends for upload_part with default checksums
+        with patch.dict(os.environ, {'AWS_REQUEST_CHECKSUM_CALCULATION': 'when_required'}):
+            s3_bucket_conn = S3BucketConnector(self.s3_access_key, self.s3_secret_key,
+                                               self.s3_endpoint_url, self.s3_bucket_name)
+
+        result = s3_bucket_conn.write_df_to_s3(df_exp, key_exp, 'parquet', part_size=part_size,
+                                               max_workers=2, row_group_size=500000)
+        data = self.s3_bucket.Object(key_exp).get().get('Body').read()
+        parquet_file = pq.ParquetFile(BytesIO(data))
+        df_result = parquet_file.read().to_pandas()
+        self.assertEqual(return_exp, result)
+        self.assertGreater(len(data), part_size)
+        self.assertEqual(parquet_file.num_row_groups, 3)
+        self.assertTrue(df_exp.equals(df_result))
+        self.s3_bucket.delete_objects(
+            Delete={
+                'Objects': [
+                    {
+                        'Key': key_exp
+                    }
+                ]
+            }
+        )
+
+    def test_write_parquet_stream(self):
+        df_exp = pd.DataFrame({'col1': ['a', 'b', 'c'], 'col2': [1.5, 2.5, 3.5]})
+        key_exp = 'test.parquet'
+        # moto does not decode the aws-chunked bodies boto sends for upload_part with default checksums
+        with patch.dict(os.environ, {'AWS_REQUEST_CHECKSUM_CALCULATION': 'when_required'}):
+            s3_bucket_conn = S3BucketConnector(self.s3_access_key, self.s3_secret_key,
+                                               self.s3_endpoint_url, self.s3_bucket_name)
+
+        result = s3_bucket_conn.write_parquet_stream(
+            [df_exp.iloc[0:2], df_exp.iloc[0:0], df_exp.iloc[2:3]], key_exp, part_size=5 * 1024 ** 2
+        )
+        body = s3_bucket_conn.read_object(key_exp)
+
+        self.assertTrue(result)
+        # one row group per non empty DataFrame
+        self.assertEqual(pq.ParquetFile(BytesIO(body)).num_row_groups, 2)
+        self.assertTrue(df_exp.equals(pd.read_parquet(BytesIO(body))))
+        self.assertIsNone(s3_bucket_conn.write_parquet_stream([], 'empty.parquet', part_size=5 * 1024 ** 2))
+
+    def test_write_df_to_s3_parquet_multipart_abort(self):
+        df_exp = pd.DataFrame([['a', 'b'], ['c', 'd']], columns=['col1', 'col2'])
+        key_exp = 'test.parquet'
+
+        with patch.object(pq.ParquetWriter, 'write_table', side_effect=OSError):
+            with self.assertRaises(OSError):
+                self.s3_bucket_conn.write_df_to_s3(df_exp, key_exp, 'parquet', part_size=5 * 1024 ** 2)
+        uploads = self.s3.meta.client.list_multipart_uploads(Bucket=self.s3_bucket_name)
+        self.assertFalse(uploads.get('Uploads'))
+        self.assertFalse(self.s3_bucket_conn.list_filex_in_prefix(key_exp))
+
+    def test_write_df_to_s3_parquet_multipart_upload_part_error(self):
+        df_exp = pd.DataFrame([['a', 'b'], ['c', 'd']], columns=['col1', 'col2'])
+        key_exp = 'test.parquet'
+
+        # the only part is uploaded while the upload is closed
+        with patch.object(self.s3_bucket_conn._client, 'upload_part', side_effect=OSError):
+            with self.assertRaises(OSError):
+                self.s3_bucket_conn.write_df_to_s3(df_exp, key_exp, 'parquet', part_size=5 * 1024 ** 2)
+        uploads = self.s3.meta.client.list_multipart_uploads(Bucket=self.s3_bucket_name)
+        self.assertFalse(uploads.get('Uploads'))
+        self.assertFalse(self.s3_bucket_conn.list_filex_in_prefix(key_exp))
+
     def test_write_df_to_s3_wrong_format(self):
         df_exp = pd.DataFrame([['a', 'b'], ['c', 'd']], columns=['col1', 'col2'])
         key_exp = 'test.parquet'
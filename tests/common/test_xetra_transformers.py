@@ -1,19 +1,38 @@
 """TestXetraTransformersMethods"""
 
 import os
+import tempfile
 import unittest
+from datetime import date, timedelta
 
 import boto3
+import yaml
 from moto import mock_s3
 import pandas as pd
 from mock import patch
 from xetra.common.s3 import S3BucketConnector
 from xetra.common.meta_process import MetaProcess
-from xetra.transformers.xetra_transformer import XetraETL, XetraTargetConfig, XetraSourceConfig
+from xetra.common.metrics import RunMetrics
+from xetra.transformers.xetra_transformer import XetraETL, XetraTargetConfig, XetraSourceConfig, XetraRunConfig
+from xetra.transformers.xetra_transformer import register_report_transform
+from xetra.transformers.reports import XetraReportsETL
+from benchmarks.synthetic import synthetic_trades
+from benchmarks.bench_transform_report1 import transform_report1_legacy
 from pandas import DataFrame
 from io import StringIO, BytesIO
 
 
+@register_report_transform('test_volume')
+def transform_test_volume(xetra_etl, data_frame):
+    """Daily traded volume per date, a second report for the tests"""
+    date_col = xetra_etl.src_args.src_col_date
+    if data_frame.empty:
+        return data_frame
+    data_frame = data_frame.groupby(date_col, as_index=False, observed=True)[
+        xetra_etl.src_args.src_col_traded_vol].sum()
+    return data_frame[data_frame[date_col] >= xetra_etl.extract_date].reset_index(drop=True)
+
+
 class TestXetraETLMethods(unittest.TestCase):
     """
     Testing the XetraETLMethods
@@ -138,6 +157,176 @@ class TestXetraETLMethods(unittest.TestCase):
             df_result = xetra_etl.extract()
         self.assertTrue(df_exp.equals(df_result))
 
+    def test_extract_files_concurrent(self):
+        df_exp = self.df_src.loc[1:8].reset_index(drop=True)
+
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19', '2021-04-20']
+        source_config = self.source_config._replace(src_max_workers=4)
+        with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, source_config,
+                                 self.target_config)
+            df_result = xetra_etl.extract()
+        self.assertTrue(df_exp.equals(df_result))
+
+    def test_etl_report1_pyarrow_engine(self):
+        df_exp = self.df_report
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']
+        source_config = self.source_config._replace(src_csv_engine='pyarrow')
+        with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, source_config,
+                                 self.target_config)
+            df_result = xetra_etl.transform_report1(xetra_etl.extract())
+        self.assertTrue(df_exp.equals(df_result))
+
+    def test_etl_report1_typed_schema(self):
+        df_exp = self.df_report
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']
+        src_dtypes = {
+            'ISIN': 'category', 'Mnemonic': 'category', 'Date': 'category', 'Time': 'str',
+            'StartPrice': 'float64', 'EndPrice': 'float64', 'MinPrice': 'float64', 'MaxPrice': 'float64',
+            'TradedVolume': 'int64'
+        }
+        for engine in ['c', 'pyarrow']:
+            source_config = self.source_config._replace(src_csv_engine=engine, src_dtypes=src_dtypes)
+            with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+                xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, source_config,
+                                     self.target_config)
+                df_extracted = xetra_etl.extract()
+                df_result = xetra_etl.transform_report1(df_extracted)
+                df_stream_result = xetra_etl.transform_report1_stream(xetra_etl.extract_iter())
+            self.assertEqual(df_extracted['ISIN'].dtype, 'category')
+            self.assertEqual(df_extracted['StartPrice'].dtype, 'float64')
+            self.assertTrue(df_exp.equals(df_result))
+            self.assertTrue(df_exp.equals(df_stream_result))
+
+    def test_etl_report1_typed_schema_precision(self):
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']
+        df_input = synthetic_trades(isin_count=200, dates=extract_date_list, minutes=5, decimals=4,
+                                    price_range=(0.001, 500))
+        for date in extract_date_list:
+            self.s3_bucket_src.write_df_to_s3(df_input[df_input['Date'] == date], f'{date}/{date}_BINS_XETRA08.csv',
+                                              'csv')
+        # the schema of the shipped configuration
+        with open('configs/xetra_report1_config.yml', encoding='utf-8') as config_file:
+            src_dtypes = yaml.safe_load(config_file)['source']['src_dtypes']
+        for engine in ['c', 'pyarrow']:
+            source_config = self.source_config._replace(src_csv_engine=engine)
+            with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+                xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, source_config,
+                                     self.target_config)
+                xetra_etl_typed = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key,
+                                           source_config._replace(src_dtypes=src_dtypes), self.target_config)
+                df_exp = xetra_etl.transform_report1(xetra_etl.extract())
+                df_result = xetra_etl_typed.transform_report1(xetra_etl_typed.extract())
+            self.assertEqual(df_exp.shape[0], 200 * 3 + self.df_report.shape[0])
+            self.assertTrue(df_exp.equals(df_result))
+
+    def test_extract_compacted(self):
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']
+        source_config = self.source_config._replace(src_compacted_key='staging/')
+        counters = []
+        for _ in range(2):
+            metrics = RunMetrics()
+            s3_bucket_src = S3BucketConnector(self.s3_access_key, self.s3_secret_key, self.s3_endpoint_url,
+                                              self.s3_bucket_name_src, metrics=metrics)
+            with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+                xetra_etl = XetraETL(s3_bucket_src, self.s3_bucket_trg, self.meta_key, source_config,
+                                     self.target_config, metrics=metrics)
+                df_result = xetra_etl.transform_report1(xetra_etl.extract())
+                df_stream_result = xetra_etl.transform_report1_stream(xetra_etl.extract_iter())
+                compacted_dates = xetra_etl.compact_source()
+            counters.append(metrics.summary()['counters'])
+            self.assertTrue(self.df_report.equals(df_result))
+            self.assertTrue(self.df_report.equals(df_stream_result))
+            self.assertEqual(compacted_dates, [])
+
+        # the first extraction reads the 8 source files and compacts the dates, all later ones
+        # read the compacted files of the target bucket
+        self.assertEqual(self.s3_bucket_trg.list_filex_in_prefix('staging/'),
+                         [f'staging/{date}.parquet' for date in extract_date_list])
+        self.assertEqual(counters[0]['source_files'], 8)
+        self.assertEqual(counters[0]['download_objects'], 8)
+        self.assertEqual(counters[1]['source_files'], 0)
+        self.assertNotIn('download_objects', counters[1])
+
+    def test_compact_source(self):
+        extract_date_list = ['2021-04-18', '2021-04-19', '2200-01-01']
+        source_config = self.source_config._replace(src_compacted_key='staging/')
+        with patch.object(MetaProcess, 'return_date_list', return_value=['2021-04-18', extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, source_config,
+                                 self.target_config)
+            compacted_dates = xetra_etl.compact_source()
+        df_compacted = self.s3_bucket_trg.read_parquet_to_df('staging/2021-04-19.parquet')
+
+        # a date is completed src_settle_hours after its end
+        yesterday = (date.today() - timedelta(days=1)).strftime('%Y-%m-%d')
+        self.s3_bucket_src.write_df_to_s3(self.df_src.loc[8:8].assign(Date=yesterday),
+                                          f'{yesterday}/{yesterday}_BINS_XETRA09.csv', 'csv')
+        compacted_yesterday = []
+        for settle_hours in [48, 0]:
+            with patch.object(MetaProcess, 'return_date_list', return_value=[yesterday, [yesterday]]):
+                xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key,
+                                     source_config._replace(src_settle_hours=settle_hours), self.target_config)
+                compacted_yesterday.append(xetra_etl.compact_source())
+
+        # dates that are not completed yet are not compacted
+        self.assertEqual(compacted_dates, ['2021-04-18', '2021-04-19'])
+        self.assertEqual(list(df_compacted['Time']), ['07:00', '08:00', '09:00'])
+        self.assertEqual(compacted_yesterday, [[], [yesterday]])
+
+    def test_compacted_dates(self):
+        extract_date_list = ['2021-04-18', '2021-04-19']
+        source_config = self.source_config._replace(src_compacted_key='staging/')
+        for compacted_date in ['2021-01-04', '2021-04-19']:
+            self.s3_bucket_trg.write_df_to_s3(self.df_src.loc[0:0], f'staging/{compacted_date}.parquet', 'parquet')
+        with patch.object(MetaProcess, 'return_date_list', return_value=['2021-04-18', extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, source_config,
+                                 self.target_config)
+        with patch.object(self.s3_bucket_trg, '_list_keys', wraps=self.s3_bucket_trg._list_keys) as list_keys:
+            compacted = xetra_etl._compacted_dates()
+
+        # only the compacted keys of extract_date_list are listed
+        self.assertEqual(compacted, {'2021-04-19'})
+        self.assertEqual(sorted(call.args[0] for call in list_keys.call_args_list),
+                         [f'staging/{date}.parquet' for date in extract_date_list])
+
+    def test_etl_report1_isin_universe(self):
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']
+        self.s3_bucket_src.write_df_to_s3(
+            pd.DataFrame([['DE0005190003', 'BMW', '2021-04-18', '09:00', 80.1, 80.2, 80.0, 80.3, 500]],
+                         columns=self.df_src.columns),
+            '2021-04-18/2021-04-18_BINS_XETRA09.csv', 'csv'
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            isin_file = os.path.join(tmp_dir, 'isins.txt')
+            with open(isin_file, 'w', encoding='utf-8') as isin_file_handle:
+                isin_file_handle.write('AT0000AE9W5\n\n')
+            source_configs = [
+                self.source_config._replace(src_isins=['AT0000AE9W5', 'US0000000001']),
+                self.source_config._replace(src_isin_file=isin_file, src_csv_engine='pyarrow',
+                                            src_dtypes={'ISIN': 'category'}),
+                # the second extraction reads the compacted files with the filter
+                self.source_config._replace(src_isins=['AT0000AE9W5'], src_compacted_key='staging/'),
+                self.source_config._replace(src_isins=['AT0000AE9W5'], src_compacted_key='staging/')
+            ]
+            for source_config in source_configs:
+                with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+                    xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, source_config,
+                                         self.target_config)
+                    df_extracted = xetra_etl.extract()
+                    df_result = xetra_etl.transform_report1(df_extracted)
+                self.assertEqual(set(df_extracted['ISIN']), {'AT0000AE9W5'})
+                self.assertTrue(self.df_report.equals(df_result))
+        # the compacted files keep all ISINs for other universes
+        self.assertEqual(set(self.s3_bucket_trg.read_parquet_to_df('staging/2021-04-18.parquet')['ISIN']),
+                         {'AT0000AE9W5', 'DE0005190003'})
+
     def test_extract_no_files(self):
         extract_date = '2200-01-02'
         extract_date_list = []
@@ -181,6 +370,59 @@ class TestXetraETLMethods(unittest.TestCase):
         pd.set_option('display.max_columns', None)
         self.assertTrue(df_exp.equals(df_result))
 
+    def test_transform_report1_matches_legacy(self):
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']
+        df_input = synthetic_trades(isin_count=50, dates=extract_date_list, minutes=60)
+        df_input.loc[::97, 'EndPrice'] = None
+
+        with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 self.target_config)
+            df_exp = transform_report1_legacy(xetra_etl, df_input.copy())
+            df_result = xetra_etl.transform_report1(df_input.copy())
+        self.assertEqual(df_result.shape[0], 50 * 3)
+        self.assertTrue(df_exp.equals(df_result))
+        self.assertTrue(pd.util.hash_pandas_object(df_exp).equals(pd.util.hash_pandas_object(df_result)))
+
+    def test_transform_report1_sharded(self):
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']
+        df_input = synthetic_trades(isin_count=50, dates=extract_date_list, minutes=60)
+        run_config = XetraRunConfig(run_transform_workers=3)
+
+        with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 self.target_config)
+            xetra_etl_sharded = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                         self.target_config, run_config)
+            df_exp = xetra_etl.transform_report1(df_input)
+            df_result = xetra_etl_sharded.transform_report1(df_input)
+        self.assertTrue(df_exp.equals(df_result))
+
+    def test_transform_report1_stream_ok(self):
+        df_exp = self.df_report
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']
+        # every row as its own source file and merging after every second file
+        df_inputs = [self.df_src.loc[row:row].reset_index(drop=True) for row in range(8, 0, -1)]
+        run_config = XetraRunConfig(run_mode='streaming', run_stream_merge_batch=2)
+
+        with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 self.target_config, run_config)
+            df_result = xetra_etl.transform_report1_stream(iter(df_inputs))
+        self.assertTrue(df_exp.equals(df_result))
+
+    def test_transform_report1_stream_emptydf(self):
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18']
+
+        with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 self.target_config)
+            df_result = xetra_etl.transform_report1_stream(iter([]))
+        self.assertTrue(df_result.empty)
 
     def test_load(self):
         log_exp1 = 'Xetra target data successfully written.'
@@ -218,6 +460,32 @@ class TestXetraETLMethods(unittest.TestCase):
                 }
             )
 
+    def test_load_partitioned(self):
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']
+        df_input = pd.concat([self.df_report, self.df_report.assign(ISIN='DE0005140008')], ignore_index=True)
+        target_config = self.target_config._replace(trg_partition_key='report1/', trg_isin_buckets=4)
+        keys_exp = {f'report1/date={date}/' for date in ['2021-04-17', '2021-04-18', '2021-04-19']}
+
+        with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 target_config)
+            xetra_etl.load(df_input)
+            trg_files = self.s3_bucket_trg.list_filex_in_prefix('report1/')
+            df_result = pd.concat([
+                pd.read_parquet(BytesIO(self.trg_bucket.Object(key=key).get().get('Body').read()))
+                for key in trg_files
+            ]).sort_values(by=['ISIN', 'Date']).reset_index(drop=True)
+            # rewriting a date with one bucket only replaces all files of the date
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 target_config._replace(trg_isin_buckets=1))
+            xetra_etl.load(self.df_report.loc[0:0])
+            trg_files_rewritten = self.s3_bucket_trg.list_filex_in_prefix('report1/date=2021-04-17/')
+        self.assertEqual(keys_exp, {key[:key.rindex('/') + 1] for key in trg_files})
+        self.assertTrue(all(key.endswith('.parquet') and '/part-' in key for key in trg_files))
+        self.assertTrue(df_input.sort_values(by=['ISIN', 'Date']).reset_index(drop=True).equals(df_result))
+        self.assertEqual(['report1/date=2021-04-17/part-00000.parquet'], trg_files_rewritten)
+
     def test_etl_report1(self):
         df_exp = self.df_report
         meta_exp = ['2021-04-17', '2021-04-18', '2021-04-19']
@@ -249,6 +517,340 @@ class TestXetraETLMethods(unittest.TestCase):
             }
         )
 
+    def test_etl_report1_metrics(self):
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']
+        metrics = RunMetrics()
+        s3_bucket_src = S3BucketConnector(self.s3_access_key, self.s3_secret_key, self.s3_endpoint_url,
+                                          self.s3_bucket_name_src, metrics=metrics)
+        s3_bucket_trg = S3BucketConnector(self.s3_access_key, self.s3_secret_key, self.s3_endpoint_url,
+                                          self.s3_bucket_name_trg, metrics=metrics)
+        with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(s3_bucket_src, s3_bucket_trg, self.meta_key, self.source_config,
+                                 self.target_config, metrics=metrics)
+            xetra_etl.etl_report1()
+        summary = metrics.summary()
+
+        self.assertEqual(set(summary['stages']), {'extract', 'transform', 'load'})
+        # the source files from 2021-04-16 on, one row each
+        self.assertEqual(summary['counters']['source_files'], 8)
+        self.assertEqual(summary['counters']['rows_in'], 8)
+        self.assertEqual(summary['counters']['rows_out'], self.df_report.shape[0])
+        self.assertEqual(summary['observations']['download_seconds']['count'], 8)
+        self.assertEqual(summary['counters']['upload_objects'], 2)
+
+    def test_etl_report1_backfill(self):
+        df_exp = self.df_report
+        meta_exp = ['2021-04-17', '2021-04-18', '2021-04-19']
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']
+        for run_mode in ['batch', 'streaming']:
+            run_config = XetraRunConfig(run_mode=run_mode, run_backfill_chunk_days=2)
+            with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+                xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                     self.target_config, run_config)
+                xetra_etl.etl_report1()
+
+            trg_files = sorted(self.s3_bucket_trg.list_filex_in_prefix(self.target_config.trg_key))
+            df_result = pd.concat([self.s3_bucket_trg.read_parquet_to_df(key) for key in trg_files],
+                                  ignore_index=True)
+            df_meta_result = self.s3_bucket_trg.read_csv_to_df(self.meta_key)
+            # one file per chunk, the previous closing price is carried over the chunk boundary
+            self.assertEqual(len(trg_files), 2)
+            self.assertTrue(trg_files[0].endswith('_2021-04-17_2021-04-18.parquet'))
+            self.assertTrue(df_exp.equals(df_result))
+            self.assertEqual(list(df_meta_result['source_date']), meta_exp)
+            self.s3_bucket_trg.delete_objects(trg_files + [self.meta_key])
+
+    def test_etl_report1_backfill_unrounded_state(self):
+        dates = ['2021-05-03', '2021-05-04', '2021-05-05', '2021-05-06']
+        # penny prices with 4 decimals, rounded to 2 decimals they are 0.0
+        df_input = synthetic_trades(isin_count=100, dates=dates, minutes=3, decimals=4, price_range=(0.001, 2))
+        for date in dates:
+            self.s3_bucket_src.write_df_to_s3(df_input[df_input['Date'] == date], f'{date}/{date}_BINS_XETRA08.csv',
+                                              'csv')
+        with patch.object(MetaProcess, 'return_date_list', return_value=[dates[1], dates]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 self.target_config)
+            df_exp = xetra_etl.transform_report1(xetra_etl.extract())
+        # moto does not decode the aws-chunked bodies boto sends for upload_part with default checksums
+        with patch.dict(os.environ, {'AWS_REQUEST_CHECKSUM_CALCULATION': 'when_required'}):
+            s3_bucket_trg = S3BucketConnector(self.s3_access_key, self.s3_secret_key, self.s3_endpoint_url,
+                                              self.s3_bucket_name_trg)
+        for run_mode in ['batch', 'streaming', 'pipelined']:
+            run_config = XetraRunConfig(run_mode=run_mode, run_backfill_chunk_days=1)
+            with patch.object(MetaProcess, 'return_date_list', return_value=[dates[1], dates]):
+                xetra_etl = XetraETL(self.s3_bucket_src, s3_bucket_trg, self.meta_key, self.source_config,
+                                     self.target_config, run_config)
+                xetra_etl.etl_report1()
+
+            trg_files = s3_bucket_trg.list_filex_in_prefix(self.target_config.trg_key)
+            df_result = pd.concat([s3_bucket_trg.read_parquet_to_df(key) for key in trg_files], ignore_index=True)
+            df_result = df_result.sort_values(by=['ISIN', 'Date']).reset_index(drop=True)
+            # the chunks compute their changes from unrounded previous opening prices
+            self.assertEqual(len(trg_files), 3)
+            self.assertTrue(df_exp.equals(df_result))
+            s3_bucket_trg.delete_objects(trg_files + [self.meta_key])
+
+    def test_etl_report1_backfill_failed_chunk(self):
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']
+        run_config = XetraRunConfig(run_backfill_chunk_days=1)
+        with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 self.target_config, run_config)
+        with patch.object(XetraETL, '_write_target', side_effect=[True, OSError]):
+            with self.assertRaises(OSError):
+                xetra_etl.etl_report1()
+        df_meta_result = self.s3_bucket_trg.read_csv_to_df(self.meta_key)
+
+        # only the first chunk is committed, the next run resumes with 2021-04-18
+        self.assertEqual(list(df_meta_result['source_date']), ['2021-04-17'])
+
+    def test_etl_report1_pipelined(self):
+        df_exp = self.df_report
+        meta_exp = ['2021-04-17', '2021-04-18', '2021-04-19']
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']
+        run_config = XetraRunConfig(run_mode='pipelined', run_pipeline_queue_size=2, run_stream_merge_batch=2)
+        # moto does not decode the aws-chunked bodies boto sends for upload_part with default checksums
+        with patch.dict(os.environ, {'AWS_REQUEST_CHECKSUM_CALCULATION': 'when_required'}):
+            s3_bucket_trg = S3BucketConnector(self.s3_access_key, self.s3_secret_key, self.s3_endpoint_url,
+                                              self.s3_bucket_name_trg)
+        for target_config in [self.target_config, self.target_config._replace(trg_partition_key='report1/')]:
+            with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+                xetra_etl = XetraETL(self.s3_bucket_src, s3_bucket_trg, self.meta_key, self.source_config,
+                                     target_config, run_config)
+                xetra_etl.etl_report1()
+
+            trg_files = sorted(s3_bucket_trg.list_filex_in_prefix('report1/'))
+            df_result = pd.concat([s3_bucket_trg.read_parquet_to_df(key) for key in trg_files], ignore_index=True)
+            df_meta_result = s3_bucket_trg.read_csv_to_df(self.meta_key)
+            # the timestamped target is streamed as one file, the partitioned one is written per date
+            self.assertEqual(len(trg_files), 3 if target_config.trg_partition_key else 1)
+            self.assertTrue(df_exp.equals(df_result))
+            self.assertEqual(list(df_meta_result['source_date']), meta_exp)
+            s3_bucket_trg.delete_objects(trg_files + [self.meta_key])
+
+    def test_etl_report1_pipelined_write_error(self):
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']
+        run_config = XetraRunConfig(run_mode='pipelined')
+        with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 self.target_config, run_config)
+        with patch.object(S3BucketConnector, 'write_parquet_stream', side_effect=OSError):
+            with self.assertRaises(OSError):
+                xetra_etl.etl_report1()
+
+        # nothing is committed if the target could not be written
+        self.assertFalse(self.s3_bucket_trg.list_filex_in_prefix(self.meta_key))
+
+    def test_etl_report1_streaming(self):
+        df_exp = self.df_report
+        extract_date = '2021-04-17'
+        extract_date_list = ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']
+        run_config = XetraRunConfig(run_mode='streaming')
+        with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 self.target_config, run_config)
+            xetra_etl.etl_report1()
+
+        trg_files = self.s3_bucket_trg.list_filex_in_prefix(self.target_config.trg_key)[0]
+        data = self.trg_bucket.Object(key=trg_files).get().get('Body').read()
+        df_result = pd.read_parquet(BytesIO(data))
+        self.assertTrue(df_exp.equals(df_result))
+
+    def test_etl_report1_prev_close_state(self):
+        state_key = 'meta/state.parquet'
+        self.s3_bucket_src.write_df_to_s3(
+            pd.DataFrame([['AT0000AE9W5', 'SANT', '2021-04-20', '08:00', 25.0, 25.5, 24.9, 25.6, 1000]],
+                         columns=self.df_src.columns),
+            '2021-04-20/2021-04-20_BINS_XETRA08.csv', 'csv'
+        )
+        # the first run has no state yet and reads the extra day before the extract date
+        with patch.object(MetaProcess, 'return_date_list',
+                          return_value=['2021-04-17', ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 self.target_config, state_key=state_key)
+            xetra_etl.etl_report1()
+        df_state = self.s3_bucket_trg.read_parquet_to_df(state_key)
+        # the second run only extracts the new date and takes the previous opening price from the state
+        with patch.object(MetaProcess, 'return_date_list', return_value=['2021-04-20', ['2021-04-19', '2021-04-20']]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 self.target_config, state_key=state_key)
+            extract_date_list = xetra_etl.extract_date_list
+            df_result = xetra_etl.transform_report1(xetra_etl.extract())
+            xetra_etl.load(df_result)
+        df_state_updated = self.s3_bucket_trg.read_parquet_to_df(state_key)
+
+        self.assertEqual(list(df_state['Date']), ['2021-04-19'])
+        self.assertEqual(list(df_state['opening_price_eur']), [23.58])
+        self.assertEqual(extract_date_list, ['2021-04-20'])
+        self.assertEqual(list(df_result['Date']), ['2021-04-20'])
+        self.assertEqual(list(df_result['change_prev_closing_%']), [6.02])
+        self.assertEqual(list(df_state_updated['Date']), ['2021-04-20'])
+
+    def test_etl_report1_prev_close_state_unrounded(self):
+        state_key = 'meta/state.parquet'
+        dates = ['2021-05-03', '2021-05-04', '2021-05-05']
+        # penny prices with 4 decimals, rounded to 2 decimals they are 0.0
+        df_input = synthetic_trades(isin_count=100, dates=dates, minutes=3, decimals=4, price_range=(0.001, 2))
+        for date in dates:
+            self.s3_bucket_src.write_df_to_s3(df_input[df_input['Date'] == date], f'{date}/{date}_BINS_XETRA08.csv',
+                                              'csv')
+        with patch.object(MetaProcess, 'return_date_list', return_value=[dates[1], dates]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 self.target_config)
+            df_exp = xetra_etl.transform_report1(xetra_etl.extract())
+        # the meta file update of the first run fails after the state was written
+        with patch.object(MetaProcess, 'return_date_list', return_value=[dates[1], dates[:2]]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 self.target_config, state_key=state_key)
+            with patch.object(MetaProcess, 'update_meta_file', side_effect=OSError):
+                with self.assertRaises(OSError):
+                    xetra_etl.etl_report1()
+            df_state = self.s3_bucket_trg.read_parquet_to_df(state_key)
+            # the state is ahead of the meta file and not used
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 self.target_config, state_key=state_key)
+            self.assertIsNone(xetra_etl.prev_close_state)
+            xetra_etl.etl_report1()
+        with patch.object(MetaProcess, 'return_date_list', return_value=[dates[2], dates[1:]]):
+            xetra_etl = XetraETL(self.s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                 self.target_config, state_key=state_key)
+            extract_date_list = xetra_etl.extract_date_list
+            df_result = xetra_etl.transform_report1(xetra_etl.extract())
+
+        self.assertEqual(set(df_state['Date']), {dates[1]})
+        self.assertEqual(extract_date_list, [dates[2]])
+        self.assertEqual(df_result.shape[0], 100)
+        self.assertTrue(df_exp[df_exp['Date'] == dates[2]].reset_index(drop=True).equals(df_result))
+
+    def test_etl_report1_incremental(self):
+        manifest_key = 'meta/manifest.parquet'
+        partials_key = 'meta/partials/'
+        # all processed test dates are in the lookback period
+        run_config = XetraRunConfig(run_manifest_lookback_days=(date.today() - date(2021, 4, 17)).days)
+
+        def run_incremental(extract_date, extract_date_list):
+            metrics = RunMetrics()
+            s3_bucket_src = S3BucketConnector(self.s3_access_key, self.s3_secret_key, self.s3_endpoint_url,
+                                              self.s3_bucket_name_src, metrics=metrics)
+            with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+                xetra_etl = XetraETL(s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                     self.target_config, run_config, metrics=metrics, manifest_key=manifest_key,
+                                     partials_key=partials_key)
+                xetra_etl.etl_report1()
+            trg_keys = self.s3_bucket_trg.list_filex_in_prefix(self.target_config.trg_key)
+            df_result = self.s3_bucket_trg.read_parquet_to_df(trg_keys[0])
+            self.trg_bucket.objects.filter(Prefix=self.target_config.trg_key).delete()
+            return df_result, metrics.summary()['counters']
+
+        df_first, counters_first = run_incremental('2021-04-17', ['2021-04-16', '2021-04-17', '2021-04-18',
+                                                                  '2021-04-19'])
+        # a late file of a processed date
+        self.s3_bucket_src.write_df_to_s3(
+            pd.DataFrame([['AT0000AE9W5', 'SANT', '2021-04-18', '09:00', 21.0, 21.5, 19.0, 22.0, 100]],
+                         columns=self.df_src.columns),
+            '2021-04-18/2021-04-18_BINS_XETRA09.csv', 'csv'
+        )
+        df_late, counters_late = run_incremental('2200-01-01', [])
+        # a changed file of a processed date
+        self.s3_bucket_src.write_df_to_s3(self.df_src.loc[8:8].assign(TradedVolume=23),
+                                          '2021-04-19/2021-04-19_BINS_XETRA09.csv', 'csv')
+        df_changed, counters_changed = run_incremental('2200-01-01', [])
+        df_manifest = MetaProcess.read_manifest(manifest_key, self.s3_bucket_trg)
+
+        self.assertTrue(df_first.equals(self.df_report))
+        self.assertEqual(counters_first['download_objects'], 8)
+        # only the late file is fetched, the next day is rewritten with the same change to the previous day
+        self.assertEqual(counters_late['download_objects'], 1)
+        self.assertEqual(list(df_late['Date']), ['2021-04-18', '2021-04-19'])
+        self.assertEqual(list(df_late['closing_price_eur']), [21.0, 24.22])
+        self.assertEqual(list(df_late['daily_traded_volume']), [10386, 3586])
+        self.assertEqual(list(df_late['change_prev_closing_%']), [1.83, 14.58])
+        self.assertEqual(counters_changed['download_objects'], 1)
+        self.assertEqual(list(df_changed['Date']), ['2021-04-19'])
+        self.assertEqual(list(df_changed['daily_traded_volume']), [2086])
+        self.assertEqual(df_manifest.shape[0], 9)
+
+    def test_etl_report1_incremental_weekend(self):
+        manifest_key = 'meta/manifest.parquet'
+        partials_key = 'meta/partials/'
+        run_config = XetraRunConfig(run_manifest_lookback_days=(date.today() - date(2021, 5, 6)).days)
+        # Thursday and Friday, nothing is traded on the weekend
+        for key, row in [('2021-05-06/2021-05-06_BINS_XETRA10.csv', ['2021-05-06', '10:00', 10.0]),
+                         ('2021-05-07/2021-05-07_BINS_XETRA10.csv', ['2021-05-07', '10:00', 11.0]),
+                         ('2021-05-10/2021-05-10_BINS_XETRA10.csv', ['2021-05-10', '10:00', 12.0])]:
+            self.s3_bucket_src.write_df_to_s3(pd.DataFrame([['DE0005190003', 'BMW', *row, 11.0, 9.0, 12.5, 100]],
+                                                           columns=self.df_src.columns), key, 'csv')
+
+        def run_incremental(extract_date, extract_date_list, state_key):
+            metrics = RunMetrics()
+            s3_bucket_src = S3BucketConnector(self.s3_access_key, self.s3_secret_key, self.s3_endpoint_url,
+                                              self.s3_bucket_name_src, metrics=metrics)
+            with patch.object(MetaProcess, 'return_date_list', return_value=[extract_date, extract_date_list]):
+                xetra_etl = XetraETL(s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                     self.target_config, run_config, state_key=state_key, metrics=metrics,
+                                     manifest_key=manifest_key, partials_key=partials_key)
+                xetra_etl.etl_report1()
+            trg_keys = self.s3_bucket_trg.list_filex_in_prefix(self.target_config.trg_key)
+            df_result = self.s3_bucket_trg.read_parquet_to_df(trg_keys[0])
+            self.trg_bucket.objects.filter(Prefix=self.target_config.trg_key).delete()
+            return df_result, metrics.summary()['counters']
+
+        for state_key in [None, 'meta/state.parquet']:
+            # Friday evening, then Monday with the weekend dates without files
+            run_incremental('2021-05-07', ['2021-05-06', '2021-05-07'], state_key)
+            df_monday, _ = run_incremental('2021-05-08', ['2021-05-07', '2021-05-08', '2021-05-09', '2021-05-10'],
+                                           state_key)
+            # a late file of Friday with an earlier trade changes the opening price of Friday
+            self.s3_bucket_src.write_df_to_s3(
+                pd.DataFrame([['DE0005190003', 'BMW', '2021-05-07', '09:00', 10.5, 11.0, 9.0, 12.5, 100]],
+                             columns=self.df_src.columns),
+                '2021-05-07/2021-05-07_BINS_XETRA09.csv', 'csv'
+            )
+            df_late, counters_late = run_incremental('2200-01-01', [], state_key)
+
+            self.assertEqual(list(df_monday['Date']), ['2021-05-10'])
+            self.assertEqual(list(df_monday['change_prev_closing_%']), [9.09])
+            self.assertEqual(counters_late['download_objects'], 1)
+            # Monday depends on the opening price of Friday and is rewritten
+            self.assertEqual(list(df_late['Date']), ['2021-05-07', '2021-05-10'])
+            self.assertEqual(list(df_late['opening_price_eur']), [10.5, 12.0])
+            self.assertEqual(list(df_late['change_prev_closing_%']), [5.0, 14.29])
+            self.trg_bucket.objects.filter(Prefix='meta').delete()
+            self.trg_bucket.objects.filter(Prefix=self.meta_key).delete()
+            self.src_bucket.objects.filter(Prefix='2021-05-07/2021-05-07_BINS_XETRA09.csv').delete()
+
+    def test_etl_reports_shared_extraction(self):
+        metrics = RunMetrics()
+        s3_bucket_src = S3BucketConnector(self.s3_access_key, self.s3_secret_key, self.s3_endpoint_url,
+                                          self.s3_bucket_name_src, metrics=metrics)
+        volume_meta_key = 'meta-key-volume'
+        volume_config = self.target_config._replace(trg_key='volume/', trg_report='test_volume')
+        # the reports are at different dates, the union of their dates is extracted once
+        with patch.object(MetaProcess, 'return_date_list', side_effect=[
+            ['2021-04-17', ['2021-04-16', '2021-04-17', '2021-04-18', '2021-04-19']],
+            ['2021-04-19', ['2021-04-19']]
+        ]):
+            report1_etl = XetraETL(s3_bucket_src, self.s3_bucket_trg, self.meta_key, self.source_config,
+                                   self.target_config, metrics=metrics)
+            volume_etl = XetraETL(s3_bucket_src, self.s3_bucket_trg, volume_meta_key, self.source_config,
+                                  volume_config, metrics=metrics)
+            XetraReportsETL([report1_etl, volume_etl]).etl_reports()
+        report1_key = self.s3_bucket_trg.list_filex_in_prefix(self.target_config.trg_key)[0]
+        df_report1 = self.s3_bucket_trg.read_parquet_to_df(report1_key)
+        df_volume = self.s3_bucket_trg.read_parquet_to_df(self.s3_bucket_trg.list_filex_in_prefix('volume/')[0])
+
+        self.assertEqual(metrics.summary()['counters']['download_objects'], 8)
+        self.assertTrue(df_report1.equals(self.df_report))
+        self.assertEqual(list(df_volume['Date']), ['2021-04-19'])
+        self.assertEqual(list(self.s3_bucket_trg.read_csv_to_df(self.meta_key)['source_date']),
+                         ['2021-04-17', '2021-04-18', '2021-04-19'])
+        self.assertEqual(list(self.s3_bucket_trg.read_csv_to_df(volume_meta_key)['source_date']), ['2021-04-19'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,271 @@
+"""Connector accessing S3 with an asyncio client"""
+import os
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
+from functools import partial
+from io import BytesIO
+
+import pandas as pd
+from botocore.exceptions import ClientError
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+except ImportError:  # pragma: no cover - optional dependency
+    get_session = None
+
+from xetra.common.constants import S3FileTypes
+from xetra.common.object_cache import LocalObjectCache
+from xetra.common.metrics import RunMetrics
+from xetra.common.s3 import S3BucketConnector, S3ClientFactory, filter_expression
+
+
+class AsyncS3BucketConnector(S3BucketConnector):
+    """
+    class for interacting with s3 Buckets through an aiobotocore client
+
+    The connector keeps the blocking interface of S3BucketConnector, the requests run on
+    an event loop in a background thread. Many small objects are fetched concurrently
+    bounded by a semaphore, parsing them is offloaded to a thread pool. Multipart uploads
+    and deletes use the inherited boto3 client. Errors of the async client are raised as the
+    modeled exceptions of the boto3 client, so exceptions.NoSuchKey catches both.
+    """
+
+    def __init__(self, access_key: str, secret_key: str, endpoint_url: str, bucket: str,
+                 object_cache: LocalObjectCache = None, client_factory: S3ClientFactory = None,
+                 parse_workers: int = None, metrics: RunMetrics = None):
+        """
+        Constructor for the async S3 Bucket connector
+        :param access_key: for accessing S3
+        :param secret_key: key for accessing S3
+        :param endpoint_url: end point url for accessing S3
+        :param bucket: S3 Bucket
+        :param object_cache: local cache for parsed csv files, no caching if None
+        :param client_factory: factory with the client configuration, a private one if None
+        :param parse_workers: number of threads parsing files, number of CPUs if None
+        :param metrics: metrics of the run the transfers are recorded in, a private instance if None
+        """
+        if get_session is None:
+            raise ImportError('AsyncS3BucketConnector requires the optional package aiobotocore')
+        client_factory = client_factory or S3ClientFactory()
+        super().__init__(access_key, secret_key, endpoint_url, bucket, object_cache=object_cache,
+                         client_factory=client_factory, metrics=metrics)
+        self._parse_executor = ThreadPoolExecutor(max_workers=parse_workers or os.cpu_count(),
+                                                  thread_name_prefix='s3-parse')
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name='s3-event-loop', daemon=True)
+        self._loop_thread.start()
+        self._exit_stack = AsyncExitStack()
+        self._async_client = self._run(self._exit_stack.enter_async_context(get_session().create_client(
+            's3', endpoint_url=endpoint_url, aws_access_key_id=os.environ[access_key],
+            aws_secret_access_key=os.environ[secret_key], config=AioConfig(**client_factory.config_options)
+        )))
+
+    def close(self):
+        """
+        Closing the async client and stopping the event loop
+        """
+        if self._loop.is_closed():
+            return
+        self._run(self._exit_stack.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._loop.close()
+        self._parse_executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self, coroutine):
+        return self._result(asyncio.run_coroutine_threadsafe(coroutine, self._loop))
+
+    def _result(self, future):
+        """
+        Result of a request on the event loop, errors converted to the exceptions of the boto3 client
+        """
+        try:
+            return future.result()
+        except ClientError as error:
+            # the modeled exceptions of the async client are different classes than the boto3 ones
+            modeled = self.exceptions.from_code(error.response.get('Error', {}).get('Code'))
+            if isinstance(error, modeled):
+                raise
+            raise modeled(error.response, error.operation_name) from error
+
+    def list_filex_in_prefix(self, prefix: str):
+        """
+        Listing all files with a prefix on the S3 bucket
+        :param prefix: prefix on the S3 bucket
+        :return files: list of all the file names containing prefix in the key
+        """
+        return self._list_keys(prefix)
+
+    def _list_keys(self, prefix: str):
+        return self._run(self.__list_keys(prefix))
+
+    async def __list_keys(self, prefix: str):
+        paginator = self._async_client.get_paginator('list_objects_v2')
+        files = []
+        async for page in paginator.paginate(Bucket=self._bucket.name, Prefix=prefix,
+                                             PaginationConfig={'PageSize': 1000}):
+            for obj in page.get('Contents', []):
+                self._etags[obj['Key']] = obj['ETag']
+                self._sizes[obj['Key']] = obj['Size']
+                files.append(obj['Key'])
+        return files
+
+    def object_info(self, key: str):
+        """
+        ETag and size of an object seen while listing, read with a HEAD request otherwise
+        :param key: key of the object
+        :return: tuple of ETag and size in bytes
+        """
+        if self._etags.get(key) is None or self._sizes.get(key) is None:
+            response = self._run(self._async_client.head_object(Bucket=self._bucket.name, Key=key))
+            self._etags[key] = response['ETag']
+            self._sizes[key] = response['ContentLength']
+        return self._etags[key], self._sizes[key]
+
+    def read_object(self, key: str):
+        """
+        Reading the raw content of a file from the S3 bucket
+        :param key: key of the file that should be read
+        :return body: content of the file as bytes
+        """
+        self._logger.info('Reading files %s/%s/%s', self.endpoint_url, self._bucket.name, key)
+        _, body = self._run(self.__get_object(key))
+        return body
+
+    def read_csv_to_df(self, key: str, decoding='utf-8', sep=',', engine: str = None, columns: list = None,
+                       dtypes: dict = None, filters: dict = None):
+        """
+        Reading a csv file from the S3 bucket and returning a DataFrame
+        :param key: key of the file that should be read
+        :param decoding: encoding of the data inside the csv file
+        :param sep: seperator of the csv file
+        :param engine: csv parser, one of CsvEngines, pandas default if None
+        :param columns: columns that should be read, all columns if None
+        :param dtypes: dtypes of the columns by column name, inferred if None
+        :param filters: allowed values by column name, all rows if None
+        :return df: Pandas DataFrame containing the data of the csv file
+        """
+        return self._run(self.__read_csv(key, None, decoding=decoding, sep=sep, engine=engine, columns=columns,
+                                         dtypes=dtypes, filters=filters))
+
+    async def __read_csv(self, key: str, semaphore: asyncio.Semaphore, **read_kwargs):
+        loop = asyncio.get_running_loop()
+        # same cache entries as the blocking connector
+        read_kwargs = {'decoding': 'utf-8', 'sep': ',', 'engine': None, 'columns': None, 'dtypes': None,
+                       **read_kwargs}
+        if not read_kwargs.get('filters'):
+            read_kwargs.pop('filters', None)
+        start = time.perf_counter()
+        etag = None
+        if self._object_cache is not None:
+            etag = self._etags.get(key)
+            if etag is None:
+                etag = (await self._async_client.head_object(Bucket=self._bucket.name, Key=key))['ETag']
+            data_frame = await loop.run_in_executor(
+                self._parse_executor, self._object_cache.get, self._bucket.name, key, etag, read_kwargs
+            )
+            if data_frame is not None:
+                self._metrics.increment('cache_hits')
+                return data_frame
+        self._logger.info('Reading files %s/%s/%s', self.endpoint_url, self._bucket.name, key)
+        # only the request is bounded, parsing must not hold a slot of the semaphore
+        if semaphore is None:
+            etag, body = await self.__get_object(key)
+        else:
+            async with semaphore:
+                etag, body = await self.__get_object(key)
+        data_frame = await loop.run_in_executor(self._parse_executor, partial(self.__parse_csv, body, read_kwargs))
+        if self._object_cache is not None:
+            await loop.run_in_executor(self._parse_executor, self._object_cache.put, self._bucket.name, key, etag,
+                                       read_kwargs, data_frame)
+        self._logger.debug('Read %s with %s rows in %.3f s', key, data_frame.shape[0], time.perf_counter() - start)
+        return data_frame
+
+    def __parse_csv(self, body: bytes, read_kwargs: dict):
+        start = time.perf_counter()
+        data_frame = self.parse_csv(body, **read_kwargs)
+        self._record_parse(start, data_frame)
+        return data_frame
+
+    async def __get_object(self, key: str):
+        start = time.perf_counter()
+        response = await self._async_client.get_object(Bucket=self._bucket.name, Key=key)
+        async with response['Body'] as stream:
+            body = await stream.read()
+        self._record_transfer('download', start, len(body))
+        return response['ETag'], body
+
+    def read_parquet_to_df(self, key: str, columns: list = None, filters: dict = None):
+        """
+        Reading a parquet file from the S3 bucket and returning a DataFrame
+        :param key: key of the file that should be read
+        :param columns: columns that should be read, all columns if None
+        :param filters: allowed values by column name, all rows if None
+        :return df: Pandas DataFrame containing the data of the parquet file
+        """
+        self._logger.info('Reading files %s/%s/%s', self.endpoint_url, self._bucket.name, key)
+        _, body = self._run(self.__get_object(key))
+        return pd.read_parquet(BytesIO(body), columns=columns, filters=filter_expression(filters) if filters else None)
+
+    def iter_csv_to_dfs(self, keys: list, max_workers: int = 1, **read_kwargs):
+        """
+        Generator reading many csv files from the S3 bucket with at most max_workers concurrent requests.
+        At most 2 * max_workers files are fetched ahead of the consumer.
+        :param keys: keys of the files that should be read
+        :param max_workers: maximal number of concurrent requests
+        :param read_kwargs: keyword arguments passed to read_csv_to_df
+        :return: yields DataFrames in the same order as keys
+        """
+        max_workers = max(max_workers, 1)
+        semaphore = asyncio.Semaphore(max_workers)
+        pending = deque()
+        try:
+            for key in keys:
+                pending.append(asyncio.run_coroutine_threadsafe(
+                    self.__read_csv(key, semaphore, **read_kwargs), self._loop
+                ))
+                if len(pending) >= 2 * max_workers:
+                    yield self._result(pending.popleft())
+            while pending:
+                yield self._result(pending.popleft())
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def write_df_to_s3(self, data_frame: pd.DataFrame, key: str, file_format: str, part_size: int = None,
+                       max_workers: int = 4, row_group_size: int = None):
+        """
+        Writing a DataFrame as csv or parquet file to the S3 bucket
+        :param data_frame:  Pandas DataFrame that should be written
+        :param key: key of the saved file
+        :param file_format: format of the saved file
+        :param part_size: parquet files are streamed as multipart upload with parts of this size if set
+        :param max_workers: maximal number of parts uploaded concurrently
+        :param row_group_size: maximal number of rows per parquet row group
+        """
+        if data_frame.empty or file_format not in (S3FileTypes.CSV.value, S3FileTypes.PARQUET.value) \
+                or (file_format == S3FileTypes.PARQUET.value and part_size):
+            return super().write_df_to_s3(data_frame, key, file_format, part_size=part_size,
+                                          max_workers=max_workers, row_group_size=row_group_size)
+        if file_format == S3FileTypes.CSV.value:
+            body = data_frame.to_csv(index=False).encode('utf-8')
+        else:
+            out_buffer = BytesIO()
+            data_frame.to_parquet(out_buffer, index=False, row_group_size=row_group_size)
+            body = out_buffer.getvalue()
+        self._logger.info('Writing file to %s/%s/%s', self.endpoint_url, self._bucket.name, key)
+        start = time.perf_counter()
+        self._run(self._async_client.put_object(Bucket=self._bucket.name, Key=key, Body=body))
+        self._record_transfer('upload', start, len(body))
+        return True
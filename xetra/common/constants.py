@@ -13,6 +13,23 @@ class S3FileTypes(Enum):
     PARQUET = 'parquet'
 
 
+class CsvEngines(Enum):
+    """
+    supported csv parsers for S3BucketConnector
+    """
+    C = 'c'
+    PYTHON = 'python'
+    PYARROW = 'pyarrow'
+
+
+class S3IoBackends(Enum):
+    """
+    S3 clients of the bucket connectors
+    """
+    BOTO3 = 'boto3'
+    AIOBOTOCORE = 'aiobotocore'
+
+
 class MetaProcessFormat(Enum):
     """
     formation for MetaProcess class
@@ -22,3 +39,15 @@ class MetaProcessFormat(Enum):
     META_SOURCE_DATE_COL = 'source_date'
     META_PROCESS_COL = 'datetime_of_precessing'
     META_FILE_FORMAT = 'csv'
+    MANIFEST_KEY_COL = 'source_key'
+    MANIFEST_ETAG_COL = 'etag'
+    MANIFEST_SIZE_COL = 'size_bytes'
+
+
+class XetraRunModes(Enum):
+    """
+    execution modes of XetraETL
+    """
+    BATCH = 'batch'
+    STREAMING = 'streaming'
+    PIPELINED = 'pipelined'
@@ -8,4 +8,9 @@ class WrongFormatException(Exception):
 class WrongMetaFileEceptions(Exception):
     """
 
-    """
\ No newline at end of file
+    """
+
+class NoSuchKeyException(FileNotFoundError):
+    """
+    A key does not exist in a local bucket, the counterpart of the NoSuchKey error of S3
+    """
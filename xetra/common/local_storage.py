@@ -0,0 +1,303 @@
+"""Connector and methods accessing a local directory like an S3 bucket"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+from pyarrow import parquet as pq
+from xetra.common.constants import S3FileTypes, CsvEngines
+from xetra.common.custom_exceptions import WrongFormatException, NoSuchKeyException
+from xetra.common.metrics import RunMetrics
+from xetra.common.object_cache import LocalObjectCache
+from xetra.common.s3 import S3BucketConnector, S3ClientFactory, arrow_type, filter_expression, filter_frame
+
+FILE_URL_SCHEME = 'file'
+
+
+def is_local_url(endpoint_url: str):
+    """
+    Checking if an endpoint url points to a local directory, e.g. file:///data/xetra
+    """
+    return urlparse(endpoint_url).scheme == FILE_URL_SCHEME
+
+
+class LocalStorageExceptions():
+    """
+    modeled exceptions of the local connector, the counterpart of the exceptions of a boto3 client
+    """
+    NoSuchKey = NoSuchKeyException
+
+
+class LocalBucketConnector(S3BucketConnector):
+    """
+    class for interacting with a local directory as if it was an S3 bucket
+
+    The bucket is the directory <path of the endpoint url>/<bucket> and a key is a path relative
+    to it. Files are read through memory maps without copying them, files are written to a
+    temporary file first and renamed, so readers never see a half written file. The ETag of a
+    file is derived from its modification time and size.
+    """
+
+    def __init__(self, access_key: str, secret_key: str, endpoint_url: str, bucket: str,
+                 object_cache: LocalObjectCache = None, client_factory: S3ClientFactory = None,
+                 metrics: RunMetrics = None):
+        """
+        Constructor for LocalBucketConnector, with the arguments of S3BucketConnector
+        :param access_key: not used
+        :param secret_key: not used
+        :param endpoint_url: file url of the directory containing the bucket, e.g. file:///data/xetra
+        :param bucket: name of the bucket directory
+        :param object_cache: not used, parsing a memory mapped file is as fast as reading the cache
+        :param client_factory: not used
+        :param metrics: metrics of the run the transfers are recorded in, a private instance if None
+        """
+        # no boto3 client is created, all methods using one are overridden
+        self._logger = logging.getLogger(__name__)
+        self.endpoint_url = endpoint_url
+        self.bucket_name = bucket
+        self.root = os.path.join(url2pathname(urlparse(endpoint_url).path), bucket)
+        self.exceptions = LocalStorageExceptions
+        self._metrics = metrics or RunMetrics()
+        os.makedirs(self.root, exist_ok=True)
+
+    def list_filex_in_prefix(self, prefix: str):
+        return self._list_keys(prefix)
+
+    def list_files_in_prefixes(self, prefixes: list, max_workers: int = 1, cache_dir: str = None,
+                               cacheable: set = None):
+        """
+        Listing all files for many prefixes, listing a local directory needs no cache
+        :param prefixes: prefixes of the keys
+        :return files: list of all the file names, ordered by the order of the prefixes
+        """
+        return [key for prefix in prefixes for key in self._list_keys(prefix)]
+
+    def _list_keys(self, prefix: str):
+        start = time.perf_counter()
+        directory = os.path.join(self.root, os.path.dirname(prefix))
+        files = []
+        for dir_path, dir_names, file_names in os.walk(directory):
+            relative = os.path.relpath(dir_path, self.root).replace(os.sep, '/')
+            # only directories that can contain keys of the prefix are walked, hidden files are
+            # temporary files of writes in progress
+            dir_names[:] = [name for name in dir_names if not name.startswith('.') and self.__may_contain(
+                name if relative == '.' else f'{relative}/{name}', prefix
+            )]
+            for name in file_names:
+                key = name if relative == '.' else f'{relative}/{name}'
+                if key.startswith(prefix) and not name.startswith('.'):
+                    files.append(key)
+        self._metrics.observe('list_seconds', time.perf_counter() - start)
+        # in the order of an S3 listing
+        return sorted(files)
+
+    def object_info(self, key: str):
+        """
+        ETag and size of a file
+        :param key: key of the file
+        :return: tuple of ETag and size in bytes
+        """
+        stat = self.__stat(key)
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"', stat.st_size
+
+    def read_csv_to_df(self, key: str, decoding='utf-8', sep=',', engine: str = None, columns: list = None,
+                       dtypes: dict = None, filters: dict = None):
+        """
+        Reading a csv file and returning a DataFrame
+        :param key: key of the file that should be read
+        :param decoding: encoding of the data inside the csv file
+        :param sep: seperator of the csv file
+        :param engine: csv parser, one of CsvEngines, pandas default if None
+        :param columns: columns that should be read, all columns if None
+        :param dtypes: dtypes of the columns by column name, inferred if None
+        :param filters: allowed values by column name, all rows if None
+        :return df: Pandas DataFrame containing the data of the csv file
+        """
+        path = self.__path(key)
+        self._logger.info('Reading file %s', path)
+        start = time.perf_counter()
+        size = self.__stat(key).st_size
+        if engine == CsvEngines.PYARROW.value and size:
+            with pa.memory_map(path) as source:
+                table = pa_csv.read_csv(
+                    source,
+                    read_options=pa_csv.ReadOptions(encoding=decoding, use_threads=True),
+                    parse_options=pa_csv.ParseOptions(delimiter=sep),
+                    convert_options=pa_csv.ConvertOptions(
+                        include_columns=columns,
+                        column_types={column: arrow_type(dtype) for column, dtype in (dtypes or {}).items()}
+                    )
+                )
+            df = (table.filter(filter_expression(filters)) if filters else table).to_pandas()
+        else:
+            df = filter_frame(pd.read_csv(path, delimiter=sep, encoding=decoding, engine=engine, usecols=columns,
+                                          dtype=dtypes, memory_map=engine in (None, CsvEngines.C.value)), filters)
+        # reading and parsing are one pass over the memory map
+        self._record_transfer('download', start, size)
+        self._record_parse(start, df)
+        return df
+
+    def read_object(self, key: str):
+        """
+        Reading the raw content of a file without copying it
+        :param key: key of the file that should be read
+        :return body: buffer of the memory mapped file, bytes for an empty file
+        """
+        path = self.__path(key)
+        self._logger.info('Reading file %s', path)
+        start = time.perf_counter()
+        if not self.__stat(key).st_size:
+            # an empty file can not be memory mapped
+            body = b''
+        else:
+            with pa.memory_map(path) as source:
+                body = source.read_buffer()
+        self._record_transfer('download', start, len(body))
+        return body
+
+    def read_parquet_to_df(self, key: str, columns: list = None, filters: dict = None):
+        """
+        Reading a parquet file and returning a DataFrame
+        :param key: key of the file that should be read
+        :param columns: columns that should be read, all columns if None
+        :param filters: allowed values by column name, all rows if None, row groups are skipped by their statistics
+        :return df: Pandas DataFrame containing the data of the parquet file
+        """
+        path = self.__path(key)
+        self._logger.info('Reading file %s', path)
+        start = time.perf_counter()
+        size = self.__stat(key).st_size
+        df = pd.read_parquet(path, columns=columns, memory_map=True,
+                             filters=filter_expression(filters) if filters else None)
+        self._record_transfer('download', start, size)
+        return df
+
+    def delete_objects(self, keys: list):
+        """
+        Deleting files, missing files are ignored like S3 does
+        :param keys: keys of the files that should be deleted
+        """
+        self._logger.info('Deleting %s files from %s', len(keys), self.root)
+        for key in keys:
+            try:
+                os.remove(self.__path(key))
+            except FileNotFoundError:
+                pass
+        return True
+
+    def write_df_to_s3(self, data_frame: pd.DataFrame, key: str, file_format: str, part_size: int = None,
+                       max_workers: int = 4, row_group_size: int = None):
+        """
+        Writing a DataFrame to a file atomically
+        :param data_frame:  Pandas DataFrame that should be written
+        :param key: key of the saved file
+        :param file_format: format of the saved file
+        :param part_size: not used, there are no multipart uploads
+        :param max_workers: not used, there are no multipart uploads
+        :param row_group_size: maximal number of rows per parquet row group
+        """
+        if data_frame.empty:
+            self._logger.info('The DataFrame is empty! File will not be written!')
+            return None
+        if file_format == S3FileTypes.CSV.value:
+            return self.__write_atomic(key, lambda path: data_frame.to_csv(path, index=False))
+        if file_format == S3FileTypes.PARQUET.value:
+            return self.__write_atomic(key, lambda path: data_frame.to_parquet(path, index=False,
+                                                                               row_group_size=row_group_size))
+        self._logger.info('The file format %s is not supported', file_format)
+        raise WrongFormatException
+
+    def write_parquet_stream(self, data_frames, key: str, part_size: int = None, max_workers: int = 4,
+                             row_group_size: int = None):
+        """
+        Writing DataFrames with the same columns one after another as one parquet file, the file
+        only appears if all DataFrames were written
+        :param data_frames: iterable of DataFrames, the first non empty one determines the schema
+        :param key: key of the saved file
+        :param part_size: not used, there are no multipart uploads
+        :param max_workers: not used, there are no multipart uploads
+        :param row_group_size: maximal number of rows per parquet row group
+        :return: True if the file was written, None if there was no data
+        """
+        data_frames = (data_frame for data_frame in data_frames if not data_frame.empty)
+        first = next(data_frames, None)
+        if first is None:
+            self._logger.info('The DataFrame is empty! File will not be written!')
+            return None
+
+        def write(path):
+            table = pa.Table.from_pandas(first, preserve_index=False)
+            with pq.ParquetWriter(path, table.schema) as writer:
+                writer.write_table(table, row_group_size=row_group_size)
+                for data_frame in data_frames:
+                    writer.write_table(pa.Table.from_pandas(data_frame, schema=table.schema, preserve_index=False),
+                                       row_group_size=row_group_size)
+        return self.__write_atomic(key, write)
+
+    def write_object(self, key: str, body: bytes):
+        """
+        Writing raw content to a file atomically
+        :param key: key of the saved file
+        :param body: content of the file
+        """
+        def write(path):
+            with open(path, 'wb') as target_file:
+                target_file.write(body)
+        return self.__write_atomic(key, write)
+
+    def mirror(self, s3_bucket: S3BucketConnector, prefixes: list, max_workers: int = 1):
+        """
+        Copying the files of prefixes from another connector, e.g. for local replays of S3 data.
+        Files whose size did not change are not copied again.
+        :param s3_bucket: connector of the bucket that is mirrored
+        :param prefixes: prefixes of the keys that are mirrored
+        :param max_workers: maximal number of files copied concurrently
+        :return keys: keys of the copied files
+        """
+        keys = [key for key in s3_bucket.list_files_in_prefixes(prefixes, max_workers=max_workers)
+                if not os.path.exists(self.__path(key)) or self.__stat(key).st_size != s3_bucket.object_info(key)[1]]
+
+        def copy(key):
+            self.write_object(key, s3_bucket.read_object(key))
+
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            list(executor.map(copy, keys))
+        self._logger.info('Mirrored %s files of %s to %s', len(keys), s3_bucket.endpoint_url, self.root)
+        return keys
+
+    @staticmethod
+    def __may_contain(directory: str, prefix: str):
+        directory = f'{directory}/'
+        return directory.startswith(prefix) or prefix.startswith(directory)
+
+    def __path(self, key: str):
+        return os.path.join(self.root, *key.split('/'))
+
+    def __stat(self, key: str):
+        try:
+            return os.stat(self.__path(key))
+        except FileNotFoundError as error:
+            raise NoSuchKeyException(key) from error
+
+    def __write_atomic(self, key: str, write):
+        path = self.__path(key)
+        self._logger.info('Writing file %s', path)
+        start = time.perf_counter()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = os.path.join(os.path.dirname(path),
+                                f'.{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._record_transfer('upload', start, os.path.getsize(path))
+        return True
@@ -1,12 +1,15 @@
 """
 Methods for processing meta file
 """
+import bisect
 import collections
 
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-from xetra.common.constants import MetaProcessFormat
+from datetime import datetime
+from xetra.common.constants import MetaProcessFormat, S3FileTypes
 from xetra.common.s3 import S3BucketConnector
+from xetra.common.trading_calendar import trading_calendar
 from xetra.common.custom_exceptions import WrongMetaFileEceptions
 
 
@@ -24,39 +27,245 @@ class MetaProcess():
         df_new[MetaProcessFormat.META_PROCESS_COL.value] = datetime.today().strftime(
             MetaProcessFormat.META_PROCESS_DATE_FORMAT.value
         )
+        if MetaProcess.meta_is_prefix(meta_key):
+            # one small object per source date, nothing of the earlier runs is read or rewritten
+            for _, df_date in df_new.groupby(MetaProcessFormat.META_SOURCE_DATE_COL.value, sort=False):
+                s3_bucket_meta.write_df_to_s3(df_date, MetaProcess.meta_date_key(meta_key, df_date.iat[0, 0]),
+                                              MetaProcessFormat.META_FILE_FORMAT.value)
+            return True
         try:
-            df_old = s3_bucket_meta.read_csv_to_df(meta_key)
+            df_old = MetaProcess.read_meta_file(meta_key, s3_bucket_meta)
             if collections.Counter(df_old.columns) != collections.Counter(df_new.columns):
                 raise WrongMetaFileEceptions
             df_all = pd.concat([df_old, df_new])
-        except s3_bucket_meta.session.client('s3').exceptions.NoSuchKey:
+        except s3_bucket_meta.exceptions.NoSuchKey:
             df_all = df_new
 
-        s3_bucket_meta.write_df_to_s3(df_all, meta_key, MetaProcessFormat.META_FILE_FORMAT.value)
+        file_format = MetaProcess.meta_file_format(meta_key)
+        if file_format == S3FileTypes.PARQUET.value:
+            # parquet meta files are kept sorted and unique by source date, a sorted date index
+            df_all = df_all.drop_duplicates(subset=MetaProcessFormat.META_SOURCE_DATE_COL.value, keep='last')
+            df_all = df_all.sort_values(by=MetaProcessFormat.META_SOURCE_DATE_COL.value).reset_index(drop=True)
+        s3_bucket_meta.write_df_to_s3(df_all, meta_key, file_format)
         return True
 
     @staticmethod
-    def return_date_list(first_date: str, meta_key: str, s3_bucket_meta: S3BucketConnector):
-        start = datetime.strptime(first_date,
-                                  MetaProcessFormat.META_DATE_FORMAT.value).date() - timedelta(days=1)
-        today = datetime.today().date()
+    def return_date_list(first_date: str, meta_key: str, s3_bucket_meta: S3BucketConnector,
+                         calendar: np.busdaycalendar = None):
+        """
+        Dates that should be extracted, from the day before the first missing date until today
+        :param first_date: first date that should be processed
+        :param meta_key: key of the meta file
+        :param s3_bucket_meta: connection to the S3 bucket of the meta file
+        :param calendar: busdaycalendar of the trading days, see trading_calendar, every day is a trading day if None
+        :return: tuple of the first missing date and the list of trading days from the trading day before it
+        """
+        calendar = calendar or trading_calendar()
+        first = np.datetime64(first_date, 'D')
+        today = np.datetime64(datetime.today().date(), 'D')
         try:
-            df_meta = s3_bucket_meta.read_csv_to_df(meta_key)
-            dates = [(start + timedelta(days=x)) for x in range(0, (today - start).days + 1)]
-            src_dates = set(pd.to_datetime(df_meta[MetaProcessFormat.META_SOURCE_DATE_COL.value]).dt.date)
-            date_missing = set(dates[1:]) - src_dates
-            if date_missing:
-                min_date = min(set(dates[1:]) - src_dates) - timedelta(days=1)
-                return_dates = [date.strftime(MetaProcessFormat.META_DATE_FORMAT.value)
-                                for date in dates if date >= min_date]
-                return_min_date = (min_date + timedelta(days=1)).strftime(MetaProcessFormat.META_DATE_FORMAT.value)
-            else:
-                return_dates = []
-                return_min_date = datetime(2200, 1, 1).date().strftime(
-                    MetaProcessFormat.META_DATE_FORMAT.value
-                )
-        except s3_bucket_meta.session.client('s3').exceptions.NoSuchKey:
-            return_dates = [(start + timedelta(days=x)).strftime(MetaProcessFormat.META_DATE_FORMAT.value)
-                            for x in range(0, (today - start).days + 1)]
+            src_dates = MetaProcess.read_meta_dates(meta_key, s3_bucket_meta)
+            first_missing = MetaProcess.first_missing_date(src_dates, first, today, calendar)
+            if first_missing is None:
+                return datetime(2200, 1, 1).date().strftime(MetaProcessFormat.META_DATE_FORMAT.value), []
+            first = np.datetime64(first_missing, 'D')
+            return_min_date = str(first)
+        except s3_bucket_meta.exceptions.NoSuchKey:
             return_min_date = first_date
-        return return_min_date, return_dates
+        # the trading day before the first date provides the previous closing prices
+        start = np.busday_offset(first, -1, roll='forward', busdaycal=calendar)
+        return return_min_date, list(np.datetime_as_string(MetaProcess.trading_days(start, today, calendar)))
+
+    @staticmethod
+    def trading_days(first_date, last_date, calendar: np.busdaycalendar):
+        """
+        Trading days between first_date and last_date
+        :return: datetime64[D] array of the trading days including first_date and last_date
+        """
+        days = np.arange(np.datetime64(first_date, 'D'), np.datetime64(last_date, 'D') + 1)
+        return days[np.is_busday(days, busdaycal=calendar)]
+
+    @staticmethod
+    def read_manifest(manifest_key: str, s3_bucket_meta: S3BucketConnector):
+        """
+        Reading the manifest of the processed source objects
+        :param manifest_key: key of the manifest, in the format of a meta file with the same key
+        :param s3_bucket_meta: connection to the S3 bucket of the manifest
+        :return df_manifest: DataFrame with source date, key, ETag, size and processing time per object,
+                             empty if there is no manifest yet
+        """
+        try:
+            return MetaProcess.read_meta_file(manifest_key, s3_bucket_meta)
+        except s3_bucket_meta.exceptions.NoSuchKey:
+            return pd.DataFrame(columns=MetaProcess.manifest_columns())
+
+    @staticmethod
+    def diff_manifest(df_manifest: pd.DataFrame, df_listing: pd.DataFrame):
+        """
+        Comparing the listed source objects with the manifest
+        :param df_manifest: manifest of the processed source objects
+        :param df_listing: DataFrame with source date, key, ETag and size of the listed objects
+        :return: tuple of the new objects, the changed objects of the listing and the manifest
+                 entries of listed dates whose objects are gone
+        """
+        key_col = MetaProcessFormat.MANIFEST_KEY_COL.value
+        etag_col = MetaProcessFormat.MANIFEST_ETAG_COL.value
+        processed_etags = df_listing[key_col].map(df_manifest.set_index(key_col)[etag_col])
+        df_new = df_listing[processed_etags.isna()].reset_index(drop=True)
+        df_changed = df_listing[processed_etags.notna() & (processed_etags != df_listing[etag_col])]
+        df_removed = df_manifest[
+            df_manifest[MetaProcessFormat.META_SOURCE_DATE_COL.value].isin(
+                df_listing[MetaProcessFormat.META_SOURCE_DATE_COL.value]
+            ) & ~df_manifest[key_col].isin(df_listing[key_col])
+        ]
+        return df_new, df_changed.reset_index(drop=True), df_removed.reset_index(drop=True)
+
+    @staticmethod
+    def update_manifest(df_processed: pd.DataFrame, removed_keys: list, manifest_key: str,
+                        s3_bucket_meta: S3BucketConnector):
+        """
+        Recording processed source objects in the manifest and dropping removed ones
+        :param df_processed: DataFrame with source date, key, ETag and size of the processed objects
+        :param removed_keys: keys of the objects that are gone from the source
+        :param manifest_key: key of the manifest
+        :param s3_bucket_meta: connection to the S3 bucket of the manifest
+        """
+        key_col = MetaProcessFormat.MANIFEST_KEY_COL.value
+        df_new = df_processed.assign(**{MetaProcessFormat.META_PROCESS_COL.value: datetime.today().strftime(
+            MetaProcessFormat.META_PROCESS_DATE_FORMAT.value
+        )})
+        df_old = MetaProcess.read_manifest(manifest_key, s3_bucket_meta)
+        df_old = df_old[~df_old[key_col].isin(set(removed_keys) | set(df_new[key_col]))]
+        df_all = pd.concat([df_old, df_new.loc[:, MetaProcess.manifest_columns()]], ignore_index=True)
+        df_all = df_all.sort_values(by=[MetaProcessFormat.META_SOURCE_DATE_COL.value, key_col]).reset_index(drop=True)
+        s3_bucket_meta.write_df_to_s3(df_all, manifest_key, MetaProcess.meta_file_format(manifest_key))
+        return True
+
+    @staticmethod
+    def manifest_columns():
+        """
+        Columns of the manifest of the processed source objects
+        """
+        return [
+            MetaProcessFormat.META_SOURCE_DATE_COL.value,
+            MetaProcessFormat.MANIFEST_KEY_COL.value,
+            MetaProcessFormat.MANIFEST_ETAG_COL.value,
+            MetaProcessFormat.MANIFEST_SIZE_COL.value,
+            MetaProcessFormat.META_PROCESS_COL.value
+        ]
+
+    @staticmethod
+    def dated_keys(dates: list, keys: list):
+        """
+        Assigning source keys to their dates
+        :param dates: sorted list of dates in the format of the key prefixes
+        :param keys: keys listed by date prefix, ordered like dates and every key starting with its date
+        :return: yields a tuple of date and key for every key
+        """
+        remaining = iter(dates)
+        date = next(remaining, None)
+        for key in keys:
+            while not key.startswith(date):
+                date = next(remaining)
+            yield date, key
+
+    @staticmethod
+    def meta_is_prefix(meta_key: str):
+        """
+        A meta key ending with / is a prefix with one meta object per processed source date
+        """
+        return meta_key.endswith('/')
+
+    @staticmethod
+    def meta_date_key(meta_key: str, source_date: str):
+        """
+        Key of the meta object of a source date under the meta prefix
+        """
+        return f'{meta_key}{source_date}.{MetaProcessFormat.META_FILE_FORMAT.value}'
+
+    @staticmethod
+    def meta_file_format(meta_key: str):
+        """
+        Format of the meta file, parquet for keys ending with .parquet, csv otherwise
+        """
+        if meta_key.endswith(f'.{S3FileTypes.PARQUET.value}'):
+            return S3FileTypes.PARQUET.value
+        return MetaProcessFormat.META_FILE_FORMAT.value
+
+    @staticmethod
+    def read_meta_file(meta_key: str, s3_bucket_meta: S3BucketConnector, columns: list = None):
+        """
+        Reading the meta file in its format
+        :param meta_key: key of the meta file
+        :param s3_bucket_meta: connection to the S3 bucket of the meta file
+        :param columns: columns that should be read, all columns if None
+        :return df_meta: DataFrame with the content of the meta file
+        """
+        if MetaProcess.meta_file_format(meta_key) == S3FileTypes.PARQUET.value:
+            return s3_bucket_meta.read_parquet_to_df(meta_key, columns=columns)
+        if MetaProcess.meta_is_prefix(meta_key):
+            df_meta = pd.DataFrame(columns=[MetaProcessFormat.META_SOURCE_DATE_COL.value,
+                                            MetaProcessFormat.META_PROCESS_COL.value])
+            keys = MetaProcess.__meta_date_keys(meta_key, s3_bucket_meta)
+            if keys:
+                df_meta = pd.concat([s3_bucket_meta.read_csv_to_df(key) for key in keys], ignore_index=True)
+            return df_meta if columns is None else df_meta[columns]
+        df_meta = s3_bucket_meta.read_csv_to_df(meta_key)
+        return df_meta if columns is None else df_meta[columns]
+
+    @staticmethod
+    def read_meta_dates(meta_key: str, s3_bucket_meta: S3BucketConnector):
+        """
+        Reading the processed source dates of the meta file
+        :return dates: sorted datetime64[D] array of unique processed dates
+        """
+        if MetaProcess.meta_is_prefix(meta_key):
+            # the dates are taken from the keys of the listing, no meta object is downloaded
+            suffix_length = len(MetaProcessFormat.META_FILE_FORMAT.value) + 1
+            return np.array([key[len(meta_key):-suffix_length] for key in
+                             MetaProcess.__meta_date_keys(meta_key, s3_bucket_meta)], dtype='datetime64[D]')
+        df_meta = MetaProcess.read_meta_file(meta_key, s3_bucket_meta,
+                                             columns=[MetaProcessFormat.META_SOURCE_DATE_COL.value])
+        # the dates are ISO formatted, numpy parses them without inferring a format
+        dates = df_meta[MetaProcessFormat.META_SOURCE_DATE_COL.value].to_numpy(dtype=str).astype('datetime64[D]')
+        if MetaProcess.meta_file_format(meta_key) == S3FileTypes.PARQUET.value:
+            return dates
+        return np.unique(dates)
+
+    @staticmethod
+    def __meta_date_keys(meta_key: str, s3_bucket_meta: S3BucketConnector):
+        """
+        Keys of the meta objects under the meta prefix, sorted by their source date
+        """
+        suffix = f'.{MetaProcessFormat.META_FILE_FORMAT.value}'
+        return sorted(key for key in s3_bucket_meta.list_filex_in_prefix(meta_key)
+                      if key.endswith(suffix) and '/' not in key[len(meta_key):])
+
+    @staticmethod
+    def first_missing_date(dates, first_date, last_date, calendar: np.busdaycalendar = None):
+        """
+        Finding the first trading day between first_date and last_date that is not processed yet.
+        The trading days are not materialized, a processed trading day before the first gap is
+        exactly as many positions after first_date as there are trading days between them, so the
+        gap is found by binary search.
+        :param dates: sorted unique processed dates as datetime64[D] array or list of dates
+        :param first_date: first date that should be processed
+        :param last_date: last date that should be processed
+        :param calendar: busdaycalendar of the trading days, every day is a trading day if None
+        :return: first missing date or None if all dates are processed
+        """
+        calendar = calendar or trading_calendar()
+        first = np.busday_offset(np.datetime64(first_date, 'D'), 0, roll='forward', busdaycal=calendar)
+        last = np.datetime64(last_date, 'D')
+        if first > last:
+            return None
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        processed = dates[np.searchsorted(dates, first):np.searchsorted(dates, last, side='right')]
+        # meta files written without the calendar may contain non-trading days
+        processed = processed[np.is_busday(processed, busdaycal=calendar)]
+        if processed.size == np.busday_count(first, last + 1, busdaycal=calendar):
+            return None
+        gap = bisect.bisect_left(range(processed.size), True, key=lambda index: np.busday_count(
+            first, processed[index], busdaycal=calendar
+        ) != index)
+        return np.busday_offset(first, gap, busdaycal=calendar).astype(object)
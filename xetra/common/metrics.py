@@ -0,0 +1,166 @@
+"""Metrics of an ETL run"""
+import os
+import sys
+import json
+import time
+import resource
+import threading
+from contextlib import contextmanager, ExitStack
+from datetime import datetime
+
+import numpy as np
+
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of the process so far in bytes
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB on Linux
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+class RunMetrics():
+    """
+    class collecting the metrics of one ETL run
+
+    Stages record their wall time and the peak memory at their end, counters sum up values
+    like rows or bytes and observations keep single measurements like the latency of one
+    download for percentiles. All methods are thread safe.
+    """
+
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self, run_name: str = 'xetra_etl'):
+        """
+        Constructor for RunMetrics
+        :param run_name: name of the run, used as prefix of the Prometheus metrics
+        """
+        self.run_name = run_name
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+        self._observations = {}
+        self._stage_hooks = []
+
+    def add_stage_hook(self, hook):
+        """
+        Registering a hook around every stage, e.g. for profiling the stages
+        :param hook: callable taking the stage name and returning a context manager
+        """
+        self._stage_hooks.append(hook)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Context manager timing a stage of the run, repeated stages are summed up
+        :param name: name of the stage
+        """
+        with ExitStack() as hooks:
+            for hook in self._stage_hooks:
+                hooks.enter_context(hook(name))
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                seconds = time.perf_counter() - start
+                with self._lock:
+                    stage = self._stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+                    stage['seconds'] += seconds
+                    stage['calls'] += 1
+                    stage['peak_rss_bytes'] = peak_rss_bytes()
+
+    def increment(self, name: str, value: float = 1):
+        """
+        Adding a value to a counter
+        :param name: name of the counter
+        :param value: value added to the counter
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        """
+        Recording a single measurement
+        :param name: name of the observation
+        :param value: measured value
+        """
+        with self._lock:
+            self._observations.setdefault(name, []).append(value)
+
+    def summary(self):
+        """
+        Summarizing the metrics collected so far
+        :return summary: dictionary with stages, counters and statistics of the observations
+        """
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self._stages.items()}
+            counters = dict(self._counters)
+            observations = {name: np.asarray(values, dtype='float64') for name, values in self._observations.items()}
+        return {
+            'run_name': self.run_name,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'wall_seconds': time.perf_counter() - self._start,
+            'peak_rss_bytes': peak_rss_bytes(),
+            'stages': stages,
+            'counters': counters,
+            'observations': {
+                name: {
+                    'count': int(values.size),
+                    'sum': float(values.sum()),
+                    'min': float(values.min()),
+                    'max': float(values.max()),
+                    **{f'p{int(quantile * 100)}': float(np.quantile(values, quantile)) for quantile in self.QUANTILES}
+                } for name, values in observations.items()
+            }
+        }
+
+    def write_json(self, path: str):
+        """
+        Writing the summary as JSON file
+        :param path: local path of the JSON file
+        :return summary: the written summary
+        """
+        summary = self.summary()
+        self.__write_atomic(path, json.dumps(summary, indent=2))
+        return summary
+
+    def write_prometheus(self, path: str):
+        """
+        Writing the summary in the Prometheus text format, e.g. for the textfile collector of the node exporter
+        :param path: local path of the .prom file
+        """
+        summary = self.summary()
+        prefix = self.run_name
+        lines = [
+            f'# TYPE {prefix}_last_run_timestamp_seconds gauge',
+            f'{prefix}_last_run_timestamp_seconds {self.started_at.timestamp()}',
+            f'# TYPE {prefix}_wall_seconds gauge',
+            f'{prefix}_wall_seconds {summary["wall_seconds"]}',
+            f'# TYPE {prefix}_peak_rss_bytes gauge',
+            f'{prefix}_peak_rss_bytes {summary["peak_rss_bytes"]}',
+            f'# TYPE {prefix}_stage_seconds gauge'
+        ]
+        lines += [f'{prefix}_stage_seconds{{stage="{name}"}} {stage["seconds"]}'
+                  for name, stage in summary['stages'].items()]
+        for name, value in summary['counters'].items():
+            lines += [f'# TYPE {prefix}_{name}_total counter', f'{prefix}_{name}_total {value}']
+        for name, statistics in summary['observations'].items():
+            lines.append(f'# TYPE {prefix}_{name} summary')
+            lines += [f'{prefix}_{name}{{quantile="{quantile}"}} {statistics[f"p{int(quantile * 100)}"]}'
+                      for quantile in self.QUANTILES]
+            lines += [f'{prefix}_{name}_sum {statistics["sum"]}', f'{prefix}_{name}_count {statistics["count"]}']
+        self.__write_atomic(path, '\n'.join(lines) + '\n')
+
+    @staticmethod
+    def __write_atomic(path: str, content: str):
+        # readers like the node exporter must never see a half written file
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as metrics_file:
+            metrics_file.write(content)
+        os.replace(tmp_path, path)
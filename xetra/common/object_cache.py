@@ -0,0 +1,114 @@
+"""Local on-disk cache of parsed source objects"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+
+
+class LocalObjectCache():
+    """
+    class for caching parsed S3 objects as feather files on the local disk
+
+    The cache is content addressed by bucket, key, ETag and read options, so a changed
+    object never hits an old entry. If the cache grows above max_bytes the least recently
+    used entries are evicted until it is below LOW_WATERMARK of max_bytes, so the following
+    writes do not evict again. The access order is kept in memory and seeded from the
+    modification times of the files.
+    """
+
+    FILE_SUFFIX = '.feather'
+    LOW_WATERMARK = 0.8
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        """
+        Constructor for LocalObjectCache
+        :param cache_dir: local directory of the cache
+        :param max_bytes: maximal size of all cached files in bytes
+        """
+        self._logger = logging.getLogger(__name__)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # path -> size of the cached files, from the least to the most recently used
+        self._index = OrderedDict(
+            (entry.path, stat.st_size) for entry, stat in
+            sorted(((entry, entry.stat()) for entry in self.__entries()), key=lambda item: item[1].st_mtime)
+        )
+        self._size = sum(self._index.values())
+
+    def get(self, bucket: str, key: str, etag: str, read_options: dict):
+        """
+        Reading a cached DataFrame
+        :param bucket: name of the S3 bucket
+        :param key: key of the object
+        :param etag: ETag of the object
+        :param read_options: options the object was parsed with
+        :return data_frame: cached DataFrame or None if the object is not cached
+        """
+        path = self.__path(bucket, key, etag, read_options)
+        try:
+            data_frame = pd.read_feather(path)
+        except FileNotFoundError:
+            return None
+        # the modification time keeps the access order for later runs
+        os.utime(path)
+        with self._lock:
+            if path in self._index:
+                self._index.move_to_end(path)
+        self._logger.debug('Cache hit for %s/%s', bucket, key)
+        return data_frame
+
+    def put(self, bucket: str, key: str, etag: str, read_options: dict, data_frame: pd.DataFrame):
+        """
+        Writing a DataFrame to the cache, evicting the least recently used entries if needed
+        :param bucket: name of the S3 bucket
+        :param key: key of the object
+        :param etag: ETag of the object
+        :param read_options: options the object was parsed with
+        :param data_frame: parsed content of the object
+        :return: True if the DataFrame was cached
+        """
+        path = self.__path(bucket, key, etag, read_options)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            data_frame.to_feather(tmp_path)
+        except (ValueError, TypeError, pa.ArrowException) as error:
+            self._logger.warning('%s/%s can not be cached: %s', bucket, key, error)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            # a rewritten entry only adds the difference to the old file
+            self._size += size - self._index.pop(path, 0)
+            self._index[path] = size
+            if self._size > self.max_bytes:
+                self.__evict()
+        return True
+
+    def __evict(self):
+        while self._index and self._size > self.max_bytes * self.LOW_WATERMARK:
+            path, size = self._index.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._logger.debug('Evicted %s from the cache', os.path.basename(path))
+
+    def __entries(self):
+        return [entry for entry in os.scandir(self.cache_dir)
+                if entry.is_file() and entry.name.endswith(self.FILE_SUFFIX)]
+
+    def __path(self, bucket: str, key: str, etag: str, read_options: dict):
+        digest = hashlib.sha256(
+            json.dumps([bucket, key, etag, read_options], sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+        return os.path.join(self.cache_dir, f'{digest}{self.FILE_SUFFIX}')
@@ -0,0 +1,153 @@
+"""Profiling of an ETL run"""
+import os
+import io
+import json
+import shlex
+import signal
+import logging
+import pstats
+import cProfile
+import threading
+import subprocess
+import tracemalloc
+from contextlib import contextmanager
+
+from xetra.common.metrics import RunMetrics
+
+
+class RunProfiler():
+    """
+    class profiling an ETL run with cProfile and tracemalloc
+
+    Time and allocations are attributed to the stages of RunMetrics, everything outside of
+    a stage is attributed to the stage 'other'. cProfile only sees the thread that started
+    the profiler, time spent in worker threads shows up as waiting for their results and
+    stages running in other threads are not attributed. A sampling profiler like py-spy can
+    be attached as external command to see all threads.
+    """
+
+    OTHER_STAGE = 'other'
+
+    def __init__(self, output_dir: str, top_n: int = 25, sampler_command: str = None, trace_frames: int = 1):
+        """
+        Constructor for RunProfiler
+        :param output_dir: local directory of the profile artifacts
+        :param top_n: number of hotspots and allocation sites reported per stage
+        :param sampler_command: command of a sampling profiler, {pid} and {output_dir} are replaced,
+                                e.g. 'py-spy record --pid {pid} --output {output_dir}/py-spy.svg'
+        :param trace_frames: number of frames tracemalloc keeps per allocation
+        """
+        self._logger = logging.getLogger(__name__)
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.sampler_command = sampler_command
+        self.trace_frames = trace_frames
+        self._profiles = {}
+        self._allocations = {}
+        self._peaks = {}
+        self._active = []
+        self._sampler = None
+        self._thread_id = None
+
+    def attach(self, metrics: RunMetrics):
+        """
+        Profiling every stage of the metrics separately
+        :param metrics: metrics of the run
+        """
+        metrics.add_stage_hook(self.stage)
+
+    def start(self):
+        """
+        Starting the profilers, profiling the stage 'other' until a stage is entered
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.sampler_command:
+            command = self.sampler_command.format(pid=os.getpid(), output_dir=self.output_dir)
+            self._logger.info('Starting sampling profiler: %s', command)
+            self._sampler = subprocess.Popen(shlex.split(command))
+        tracemalloc.start(self.trace_frames)
+        self._thread_id = threading.get_ident()
+        self.__enter(self.OTHER_STAGE)
+
+    def stop(self):
+        """
+        Stopping the profilers
+        """
+        while self._active:
+            self.__exit()
+        tracemalloc.stop()
+        if self._sampler is not None:
+            # py-spy and similar tools write their output on SIGINT
+            self._sampler.send_signal(signal.SIGINT)
+            self._sampler.wait()
+            self._sampler = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Context manager attributing time and allocations to a stage
+        :param name: name of the stage
+        """
+        if threading.get_ident() != self._thread_id:
+            yield
+            return
+        self.__enter(name)
+        try:
+            yield
+        finally:
+            self.__exit()
+
+    def __enter(self, name: str):
+        if self._active:
+            self._profiles[self._active[-1]['name']].disable()
+            self._active[-1]['peak'] = max(self._active[-1]['peak'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self._active.append({'name': name, 'snapshot': tracemalloc.take_snapshot(), 'peak': 0})
+        self._profiles.setdefault(name, cProfile.Profile()).enable()
+
+    def __exit(self):
+        entry = self._active.pop()
+        name = entry['name']
+        self._profiles[name].disable()
+        peak = max(entry['peak'], tracemalloc.get_traced_memory()[1])
+        self._peaks[name] = max(self._peaks.get(name, 0), peak)
+        self._allocations.setdefault(name, []).extend(
+            tracemalloc.take_snapshot().compare_to(entry['snapshot'], 'lineno')[:self.top_n]
+        )
+        if self._active:
+            # the peak of the inner stage is also a peak of the outer stage
+            self._active[-1]['peak'] = max(self._active[-1]['peak'], peak)
+            self._profiles[self._active[-1]['name']].enable()
+
+    def write(self):
+        """
+        Writing the profile artifacts to output_dir: a pstats file per stage and of the
+        whole run, the top hotspots and allocation sites per stage and a JSON summary
+        :return summary: per stage the peak traced memory and the profiled calls
+        """
+        summary = {}
+        profiled = []
+        with open(os.path.join(self.output_dir, 'hotspots.txt'), 'w', encoding='utf-8') as hotspots_file:
+            for name, profile in self._profiles.items():
+                stream = io.StringIO()
+                try:
+                    stats = pstats.Stats(profile, stream=stream)
+                except TypeError:
+                    # nothing was called while the stage was profiled
+                    continue
+                stats.dump_stats(os.path.join(self.output_dir, f'profile_{name}.pstats'))
+                profiled.append(profile)
+                stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top_n)
+                hotspots_file.write(f'===== stage {name}: hotspots by own time =====\n{stream.getvalue()}\n')
+                allocations = sorted(self._allocations.get(name, []), key=lambda stat: stat.size_diff,
+                                     reverse=True)[:self.top_n]
+                hotspots_file.write(f'===== stage {name}: allocations, peak {self._peaks.get(name, 0)} bytes =====\n')
+                hotspots_file.writelines(f'{stat}\n' for stat in allocations)
+                hotspots_file.write('\n')
+                summary[name] = {'peak_traced_bytes': self._peaks.get(name, 0), 'calls': stats.total_calls,
+                                 'profiled_seconds': stats.total_tt}
+        if profiled:
+            pstats.Stats(*profiled).dump_stats(os.path.join(self.output_dir, 'profile.pstats'))
+        with open(os.path.join(self.output_dir, 'profile_summary.json'), 'w', encoding='utf-8') as summary_file:
+            json.dump(summary, summary_file, indent=2)
+        return summary
@@ -1,12 +1,213 @@
 """Connector and methods accessing S3"""
 import os
+import json
 import logging
+import time
+import operator
+import threading
+from functools import reduce
+from collections import deque
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
+from botocore.config import Config
+import numpy as np
 from io import StringIO, BytesIO
 import pandas as pd
-from xetra.common.constants import S3FileTypes
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+from pyarrow import parquet as pq
+from pyarrow import compute as pc
+from xetra.common.constants import S3FileTypes, CsvEngines
 from xetra.common.custom_exceptions import WrongFormatException
+from xetra.common.object_cache import LocalObjectCache
+from xetra.common.metrics import RunMetrics
+
+
+def arrow_type(dtype: str):
+    """
+    Translating a pandas dtype name to the matching arrow type for the arrow csv reader
+    :param dtype: pandas dtype name, e.g. 'str', 'category', 'float32'
+    :return: arrow DataType
+    """
+    if dtype == 'category':
+        return pa.dictionary(pa.int32(), pa.string())
+    if dtype in ('str', 'string', 'object'):
+        return pa.string()
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+def filter_expression(filters: dict):
+    """
+    Translating row filters to an arrow expression
+    :param filters: allowed values by column name, a row is kept if all its columns have an allowed value
+    :return: arrow Expression
+    """
+    return reduce(operator.and_, (pc.field(column).isin(values) for column, values in filters.items()))
+
+
+def filter_frame(data_frame: pd.DataFrame, filters: dict):
+    """
+    Keeping the rows of a DataFrame whose columns have one of the allowed values
+    :param data_frame: DataFrame that is filtered
+    :param filters: allowed values by column name, no filtering if None
+    :return data_frame: filtered DataFrame
+    """
+    if not filters or data_frame.empty:
+        return data_frame
+    mask = np.logical_and.reduce([data_frame[column].isin(values).to_numpy() for column, values in filters.items()])
+    return data_frame[mask].reset_index(drop=True)
+
+
+class S3ClientFactory():
+    """
+    class sharing boto3 sessions and S3 resources between S3BucketConnector instances
+
+    Connectors with the same credentials and endpoint share one resource and with it one
+    thread safe client and its connection pool.
+    """
+
+    def __init__(self, max_pool_connections: int = 10, max_attempts: int = None, retry_mode: str = None):
+        """
+        Constructor for S3ClientFactory
+        :param max_pool_connections: maximal number of connections kept open per client
+        :param max_attempts: maximal number of attempts per request, botocore default if None
+        :param retry_mode: botocore retry mode, e.g. 'standard' or 'adaptive', botocore default if None
+        """
+        retries = {}
+        if max_attempts is not None:
+            retries['max_attempts'] = max_attempts
+        if retry_mode is not None:
+            retries['mode'] = retry_mode
+        self.config_options = {'max_pool_connections': max_pool_connections, 'retries': retries or None}
+        self.config = Config(**self.config_options)
+        self._resources = {}
+        self._lock = threading.Lock()
+
+    def resource(self, access_key: str, secret_key: str, endpoint_url: str):
+        """
+        Returning the shared session and S3 resource for credentials and endpoint
+        :param access_key: name of the environment variable with the access key
+        :param secret_key: name of the environment variable with the secret key
+        :param endpoint_url: end point url for accessing S3
+        :return: tuple of boto3 session and S3 resource
+        """
+        cache_key = (os.environ[access_key], os.environ[secret_key], endpoint_url)
+        with self._lock:
+            if cache_key not in self._resources:
+                session = boto3.Session(aws_access_key_id=cache_key[0], aws_secret_access_key=cache_key[1])
+                self._resources[cache_key] = (
+                    session, session.resource(service_name='s3', endpoint_url=endpoint_url, config=self.config)
+                )
+            return self._resources[cache_key]
+
+
+class S3MultipartUpload():
+    """
+    Writable file-like object uploading everything written to it as S3 multipart upload.
+    Full parts are uploaded concurrently while writing goes on, at most max_workers parts
+    are buffered, so memory stays bounded by part_size * (max_workers + 1).
+    """
+
+    def __init__(self, client, bucket: str, key: str, part_size: int, max_workers: int = 4):
+        """
+        Constructor for S3MultipartUpload, starts the multipart upload
+        :param client: boto3 S3 client
+        :param bucket: name of the S3 bucket
+        :param key: key of the uploaded file
+        :param part_size: size of the uploaded parts in bytes, at least 5 MB for S3
+        :param max_workers: maximal number of parts uploaded concurrently
+        """
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._part_size = part_size
+        self._max_workers = max_workers
+        self._buffer = bytearray()
+        self._position = 0
+        self._futures = deque()
+        self._parts = []
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._upload_id = client.create_multipart_upload(Bucket=bucket, Key=key)['UploadId']
+        self.closed = False
+
+    def write(self, data):
+        """
+        Buffering data and uploading every full part
+        :param data: bytes-like object
+        :return: number of bytes written
+        """
+        self._buffer.extend(data)
+        self._position += len(data)
+        while len(self._buffer) >= self._part_size:
+            self.__submit_part(bytes(self._buffer[:self._part_size]))
+            del self._buffer[:self._part_size]
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        """
+        Uploading the last part and completing the multipart upload
+        """
+        if self.closed:
+            return
+        try:
+            # a multipart upload needs at least one part, even if it is empty
+            if self._buffer or not self._parts and not self._futures:
+                self.__submit_part(bytes(self._buffer))
+                self._buffer = bytearray()
+            while self._futures:
+                self._parts.append(self._futures.popleft().result())
+            self._executor.shutdown()
+            self._client.complete_multipart_upload(
+                Bucket=self._bucket, Key=self._key, UploadId=self._upload_id,
+                MultipartUpload={'Parts': sorted(self._parts, key=lambda part: part['PartNumber'])}
+            )
+        except BaseException:
+            # errors of part uploads surface here, the stored parts must not be left behind
+            self.abort()
+            raise
+        self.closed = True
+
+    def abort(self):
+        """
+        Aborting the multipart upload, S3 drops all uploaded parts
+        """
+        if self.closed:
+            return
+        self._executor.shutdown(cancel_futures=True)
+        self._client.abort_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=self._upload_id)
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def __submit_part(self, body: bytes):
+        part_number = len(self._parts) + len(self._futures) + 1
+        self._futures.append(self._executor.submit(self.__upload_part, part_number, body))
+        # backpressure: wait for the oldest part if too many parts are in flight
+        while len(self._futures) > self._max_workers:
+            self._parts.append(self._futures.popleft().result())
+
+    def __upload_part(self, part_number: int, body: bytes):
+        response = self._client.upload_part(Bucket=self._bucket, Key=self._key, UploadId=self._upload_id,
+                                            PartNumber=part_number, Body=body)
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
 
 
 class S3BucketConnector():
@@ -14,20 +215,38 @@ class S3BucketConnector():
     class for interacting with s3 Buckets
     """
 
-    def __init__(self, access_key: str, secret_key: str, endpoint_url: str, bucket: str):
+    def __init__(self, access_key: str, secret_key: str, endpoint_url: str, bucket: str,
+                 object_cache: LocalObjectCache = None, client_factory: S3ClientFactory = None,
+                 metrics: RunMetrics = None):
         """
         Constructor for S3 Bucket connector
         :param access_key: for accessing S3
         :param secret_key: key for accessing S3
         :param endpoint_url: end point url for accessing S3
         :param bucket: S3 Bucket
+        :param object_cache: local cache for parsed csv files, no caching if None
+        :param client_factory: factory sharing clients between connectors, a private one if None
+        :param metrics: metrics of the run the transfers are recorded in, a private instance if None
         """
         self._logger = logging.getLogger(__name__)
         self.endpoint_url = endpoint_url
-        self.session = boto3.Session(aws_access_key_id=os.environ[access_key],
-                                     aws_secret_access_key=os.environ[secret_key])
-        self._s3 = self.session.resource(service_name='s3', endpoint_url=endpoint_url)
+        client_factory = client_factory or S3ClientFactory()
+        self.session, self._s3 = client_factory.resource(access_key, secret_key, endpoint_url)
         self._bucket = self._s3.Bucket(bucket)
+        # low level client is thread safe, the resource objects are not
+        self._client = self._s3.meta.client
+        # modeled exceptions of the client, e.g. exceptions.NoSuchKey
+        self.exceptions = self._client.exceptions
+        self._object_cache = object_cache
+        # ETags and sizes seen while listing, saves a HEAD request per cached object
+        self._etags = {}
+        self._sizes = {}
+        self._metrics = metrics or RunMetrics()
+
+    def close(self):
+        """
+        Releasing the resources of the connector, the shared boto3 client needs no cleanup
+        """
 
     def list_filex_in_prefix(self, prefix: str):
         """
@@ -38,19 +257,260 @@ class S3BucketConnector():
         files = [obj.key for obj in self._bucket.objects.filter(Prefix=prefix)]
         return files
 
-    def read_csv_to_df(self, key: str, decoding='utf-8', sep=','):
+    def list_files_in_prefixes(self, prefixes: list, max_workers: int = 1, cache_dir: str = None,
+                               cacheable: set = None):
+        """
+        Listing all files for many prefixes on the S3 bucket, concurrently if max_workers > 1
+        :param prefixes: prefixes on the S3 bucket
+        :param max_workers: maximal number of threads listing prefixes
+        :param cache_dir: local directory for caching the listings, no caching if None
+        :param cacheable: prefixes whose content can not change anymore and whose listing may be cached
+        :return files: list of all the file names, ordered by the order of the prefixes
+        """
+        cacheable = cacheable or set()
+
+        def list_cached(prefix):
+            use_cache = cache_dir is not None and prefix in cacheable
+            if use_cache:
+                files = self.__read_listing_cache(cache_dir, prefix)
+                if files is not None:
+                    return files
+            start = time.perf_counter()
+            files = self._list_keys(prefix)
+            self._metrics.observe('list_seconds', time.perf_counter() - start)
+            # an empty listing could be a day that is not published yet
+            if use_cache and files:
+                self.__write_listing_cache(cache_dir, prefix, files)
+            return files
+
+        if max_workers <= 1 or len(prefixes) <= 1:
+            listings = [list_cached(prefix) for prefix in prefixes]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(prefixes))) as executor:
+                listings = list(executor.map(list_cached, prefixes))
+        return [key for listing in listings for key in listing]
+
+    def _list_keys(self, prefix: str):
+        paginator = self._client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=self._bucket.name, Prefix=prefix,
+                                   PaginationConfig={'PageSize': 1000})
+        files = []
+        for page in pages:
+            for obj in page.get('Contents', []):
+                self._etags[obj['Key']] = obj['ETag']
+                self._sizes[obj['Key']] = obj['Size']
+                files.append(obj['Key'])
+        return files
+
+    def object_info(self, key: str):
+        """
+        ETag and size of an object seen while listing, read with a HEAD request otherwise
+        :param key: key of the object
+        :return: tuple of ETag and size in bytes
+        """
+        if self._etags.get(key) is None or self._sizes.get(key) is None:
+            response = self._client.head_object(Bucket=self._bucket.name, Key=key)
+            self._etags[key] = response['ETag']
+            self._sizes[key] = response['ContentLength']
+        return self._etags[key], self._sizes[key]
+
+    def __listing_cache_path(self, cache_dir: str, prefix: str):
+        return os.path.join(cache_dir, self._bucket.name, f'{quote(prefix, safe="")}.json')
+
+    def __read_listing_cache(self, cache_dir: str, prefix: str):
+        path = self.__listing_cache_path(cache_dir, prefix)
+        if not os.path.exists(path):
+            return None
+        self._logger.debug('Using cached listing %s for prefix %s', path, prefix)
+        with open(path, encoding='utf-8') as cache_file:
+            listing = json.load(cache_file)
+        for key, info in listing.items():
+            # listings cached by earlier versions only hold the ETag
+            etag, size = info if isinstance(info, list) else (info, None)
+            self._etags[key] = etag
+            if size is not None:
+                self._sizes[key] = size
+        return list(listing)
+
+    def __write_listing_cache(self, cache_dir: str, prefix: str, files: list):
+        path = self.__listing_cache_path(cache_dir, prefix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as cache_file:
+            json.dump({key: [self._etags.get(key), self._sizes.get(key)] for key in files}, cache_file)
+        os.replace(tmp_path, path)
+
+    def read_csv_to_df(self, key: str, decoding='utf-8', sep=',', engine: str = None, columns: list = None,
+                       dtypes: dict = None, filters: dict = None):
+        """
+        Reading a csv file from the S3 bucket and returning a DataFrame
+        :param key: key of the file that should be read
+        :param decoding: encoding of the data inside the csv file
+        :param sep: seperator of the csv file
+        :param engine: csv parser, one of CsvEngines, pandas default if None
+        :param columns: columns that should be read, all columns if None
+        :param dtypes: dtypes of the columns by column name, inferred if None
+        :param filters: allowed values by column name, all rows if None
+        :return df: Pandas DataFrame containing the data of the csv file
+        """
+        read_options = {'decoding': decoding, 'sep': sep, 'engine': engine, 'columns': columns, 'dtypes': dtypes}
+        if filters:
+            # unfiltered cache entries stay valid
+            read_options['filters'] = filters
+        if self._object_cache is not None:
+            etag = self._etags.get(key) or self._client.head_object(Bucket=self._bucket.name, Key=key)['ETag']
+            df = self._object_cache.get(self._bucket.name, key, etag, read_options)
+            if df is not None:
+                self._metrics.increment('cache_hits')
+                return df
         self._logger.info('Reading files %s/%s/%s', self.endpoint_url, self._bucket.name, key)
-        obj = self._bucket.Object(key=key).get().get('Body').read().decode(decoding)
-        data_all = StringIO(obj)
-        df = pd.read_csv(data_all, delimiter=sep)
+        start = time.perf_counter()
+        response = self._client.get_object(Bucket=self._bucket.name, Key=key)
+        body = response.get('Body').read()
+        self._record_transfer('download', start, len(body))
+        start = time.perf_counter()
+        df = self.parse_csv(body, decoding=decoding, sep=sep, engine=engine, columns=columns, dtypes=dtypes,
+                            filters=filters)
+        self._record_parse(start, df)
+        if self._object_cache is not None:
+            self._object_cache.put(self._bucket.name, key, response['ETag'], read_options, df)
         return df
 
-    def write_df_to_s3(self, data_frame: pd.DataFrame, key: str, file_format: str):
+    def _record_transfer(self, direction: str, start: float, size: int):
+        """
+        Recording latency and size of one download or upload started at start
+        """
+        self._metrics.observe(f'{direction}_seconds', time.perf_counter() - start)
+        self._metrics.increment(f'{direction}_bytes', size)
+        self._metrics.increment(f'{direction}_objects')
+
+    def _record_parse(self, start: float, data_frame: pd.DataFrame):
+        """
+        Recording the time of parsing one object started at start
+        """
+        self._metrics.observe('parse_seconds', time.perf_counter() - start)
+        self._metrics.increment('parsed_rows', data_frame.shape[0])
+
+    @staticmethod
+    def parse_csv(body: bytes, decoding='utf-8', sep=',', engine: str = None, columns: list = None,
+                  dtypes: dict = None, filters: dict = None):
+        """
+        Parsing the raw bytes of a csv file without decoding them to a string first
+        :param body: content of the csv file
+        :param decoding: encoding of the data inside the csv file
+        :param sep: seperator of the csv file
+        :param engine: csv parser, one of CsvEngines, pandas default if None
+        :param columns: columns that should be read, all columns if None
+        :param dtypes: dtypes of the columns by column name, inferred if None
+        :param filters: allowed values by column name, all rows if None. The pyarrow engine drops
+                        the other rows before they are converted to pandas.
+        :return df: Pandas DataFrame containing the data of the csv file
+        """
+        if engine == CsvEngines.PYARROW.value:
+            table = pa_csv.read_csv(
+                pa.BufferReader(body),
+                read_options=pa_csv.ReadOptions(encoding=decoding, use_threads=True),
+                parse_options=pa_csv.ParseOptions(delimiter=sep),
+                convert_options=pa_csv.ConvertOptions(
+                    include_columns=columns,
+                    column_types={column: arrow_type(dtype) for column, dtype in (dtypes or {}).items()}
+                )
+            )
+            if filters:
+                table = table.filter(filter_expression(filters))
+            return table.to_pandas()
+        return filter_frame(pd.read_csv(BytesIO(body), delimiter=sep, encoding=decoding, engine=engine,
+                                        usecols=columns, dtype=dtypes), filters)
+
+    def read_object(self, key: str):
+        """
+        Reading the raw content of a file from the S3 bucket
+        :param key: key of the file that should be read
+        :return body: content of the file as bytes
+        """
+        self._logger.info('Reading files %s/%s/%s', self.endpoint_url, self._bucket.name, key)
+        start = time.perf_counter()
+        body = self._client.get_object(Bucket=self._bucket.name, Key=key).get('Body').read()
+        self._record_transfer('download', start, len(body))
+        return body
+
+    def read_parquet_to_df(self, key: str, columns: list = None, filters: dict = None):
+        """
+        Reading a parquet file from the S3 bucket and returning a DataFrame
+        :param key: key of the file that should be read
+        :param columns: columns that should be read, all columns if None
+        :param filters: allowed values by column name, all rows if None, row groups are skipped by their statistics
+        :return df: Pandas DataFrame containing the data of the parquet file
+        """
+        self._logger.info('Reading files %s/%s/%s', self.endpoint_url, self._bucket.name, key)
+        start = time.perf_counter()
+        body = self._client.get_object(Bucket=self._bucket.name, Key=key).get('Body').read()
+        self._record_transfer('download', start, len(body))
+        return pd.read_parquet(BytesIO(body), columns=columns, filters=filter_expression(filters) if filters else None)
+
+    def read_csv_to_dfs(self, keys: list, max_workers: int = 1, **read_kwargs):
+        """
+        Reading many csv files from the S3 bucket, concurrently if max_workers > 1
+        :param keys: keys of the files that should be read
+        :param max_workers: maximal number of threads fetching and parsing files
+        :param read_kwargs: keyword arguments passed to read_csv_to_df
+        :return dfs: list of DataFrames in the same order as keys
+        """
+        return list(self.iter_csv_to_dfs(keys, max_workers=max_workers, **read_kwargs))
+
+    def iter_csv_to_dfs(self, keys: list, max_workers: int = 1, **read_kwargs):
+        """
+        Generator reading many csv files from the S3 bucket, concurrently if max_workers > 1.
+        At most 2 * max_workers files are fetched ahead of the consumer.
+        :param keys: keys of the files that should be read
+        :param max_workers: maximal number of threads fetching and parsing files
+        :param read_kwargs: keyword arguments passed to read_csv_to_df
+        :return: yields DataFrames in the same order as keys
+        """
+        def read_timed(key):
+            start = time.perf_counter()
+            data_frame = self.read_csv_to_df(key, **read_kwargs)
+            self._logger.debug('Read %s with %s rows in %.3f s',
+                               key, data_frame.shape[0], time.perf_counter() - start)
+            return data_frame
+
+        if max_workers <= 1 or len(keys) <= 1:
+            for key in keys:
+                yield read_timed(key)
+            return
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(keys))) as executor:
+            pending = deque()
+            for key in keys:
+                pending.append(executor.submit(read_timed, key))
+                if len(pending) >= 2 * max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def delete_objects(self, keys: list):
+        """
+        Deleting files from the S3 bucket
+        :param keys: keys of the files that should be deleted
+        """
+        self._logger.info('Deleting %s files from %s/%s', len(keys), self.endpoint_url, self._bucket.name)
+        # delete_objects accepts at most 1000 keys per request
+        for offset in range(0, len(keys), 1000):
+            self._client.delete_objects(Bucket=self._bucket.name, Delete={
+                'Objects': [{'Key': key} for key in keys[offset:offset + 1000]],
+                'Quiet': True
+            })
+        return True
+
+    def write_df_to_s3(self, data_frame: pd.DataFrame, key: str, file_format: str, part_size: int = None,
+                       max_workers: int = 4, row_group_size: int = None):
         """
 
         :param data_frame:  Pandas DataFrame that should be written
         :param key: key of the saved file
         :param file_format: format of the saved file
+        :param part_size: parquet files are streamed as multipart upload with parts of this size if set
+        :param max_workers: maximal number of parts uploaded concurrently
+        :param row_group_size: maximal number of rows per parquet row group
         """
         if data_frame.empty:
             self._logger.info('The DataFrame is empty! File will not be written!')
@@ -59,14 +519,59 @@ class S3BucketConnector():
             out_buffer = StringIO()
             data_frame.to_csv(out_buffer, index=False)
             return self.__put_object(out_buffer, key)
+        if file_format == S3FileTypes.PARQUET.value and part_size:
+            return self.__put_parquet_multipart(data_frame, key, part_size, max_workers, row_group_size)
         if file_format == S3FileTypes.PARQUET.value:
             out_buffer = BytesIO()
-            data_frame.to_parquet(out_buffer, index=False)
+            data_frame.to_parquet(out_buffer, index=False, row_group_size=row_group_size)
             return self.__put_object(out_buffer, key)
         self._logger.info('The file format %s is not supported', file_format)
         raise WrongFormatException
 
     def __put_object(self, out_buffer: StringIO or BytesIO, key: str):
         self._logger.info('Writing file to %s/%s/%s', self.endpoint_url, self._bucket.name, key)
-        self._bucket.put_object(Body=out_buffer.getvalue(), Key=key)
+        start = time.perf_counter()
+        if isinstance(out_buffer, BytesIO):
+            # uploading from the buffer itself saves the copy of getvalue()
+            size = out_buffer.tell()
+            out_buffer.seek(0)
+            self._bucket.put_object(Body=out_buffer, Key=key)
+        else:
+            body = out_buffer.getvalue().encode('utf-8')
+            size = len(body)
+            self._bucket.put_object(Body=body, Key=key)
+        self._record_transfer('upload', start, size)
+        return True
+
+    def __put_parquet_multipart(self, data_frame: pd.DataFrame, key: str, part_size: int, max_workers: int,
+                                row_group_size: int = None):
+        return self.write_parquet_stream([data_frame], key, part_size, max_workers, row_group_size)
+
+    def write_parquet_stream(self, data_frames, key: str, part_size: int, max_workers: int = 4,
+                             row_group_size: int = None):
+        """
+        Writing DataFrames with the same columns one after another as one parquet file, streamed
+        to the S3 bucket as multipart upload. The upload is aborted if the iterable raises.
+        :param data_frames: iterable of DataFrames, the first non empty one determines the schema
+        :param key: key of the saved file
+        :param part_size: size of the uploaded parts in bytes, at least 5 MB for S3
+        :param max_workers: maximal number of parts uploaded concurrently
+        :param row_group_size: maximal number of rows per parquet row group
+        :return: True if the file was written, None if there was no data
+        """
+        data_frames = (data_frame for data_frame in data_frames if not data_frame.empty)
+        first = next(data_frames, None)
+        if first is None:
+            self._logger.info('The DataFrame is empty! File will not be written!')
+            return None
+        self._logger.info('Writing file to %s/%s/%s as multipart upload', self.endpoint_url, self._bucket.name, key)
+        start = time.perf_counter()
+        table = pa.Table.from_pandas(first, preserve_index=False)
+        with S3MultipartUpload(self._client, self._bucket.name, key, part_size, max_workers) as upload:
+            with pq.ParquetWriter(upload, table.schema) as writer:
+                writer.write_table(table, row_group_size=row_group_size)
+                for data_frame in data_frames:
+                    writer.write_table(pa.Table.from_pandas(data_frame, schema=table.schema, preserve_index=False),
+                                       row_group_size=row_group_size)
+        self._record_transfer('upload', start, upload.tell())
         return True
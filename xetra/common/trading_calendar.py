@@ -0,0 +1,58 @@
+"""Trading calendar of the Xetra exchange"""
+import numpy as np
+
+# Xetra trades from Monday to Friday
+XETRA_WEEKMASK = '1111100'
+ALL_DAYS_WEEKMASK = '1111111'
+# closing days with a fixed date as month-day, Good Friday and Easter Monday move with Easter
+XETRA_FIXED_HOLIDAYS = ['01-01', '05-01', '12-24', '12-25', '12-26', '12-31']
+
+
+def easter_sundays(years):
+    """
+    Easter Sundays of the Gregorian calendar by the anonymous Gregorian algorithm
+    :param years: array of years
+    :return: datetime64[D] array of the Easter Sundays of the years
+    """
+    years = np.asarray(years, dtype=np.int64)
+    golden = years % 19
+    century, year_of_century = np.divmod(years, 100)
+    leap_centuries, leap_century_remainder = np.divmod(century, 4)
+    moon_correction = (century + 8) // 25
+    solar_correction = (century - moon_correction + 1) // 3
+    epact = (19 * golden + century - leap_centuries - solar_correction + 15) % 30
+    leap_years, leap_year_remainder = np.divmod(year_of_century, 4)
+    weekday = (32 + 2 * leap_century_remainder + 2 * leap_years - epact - leap_year_remainder) % 7
+    offset = (golden + 11 * epact + 22 * weekday) // 451
+    month, day = np.divmod(epact + weekday - 7 * offset + 114, 31)
+    year_starts = (years - 1970).astype('datetime64[Y]')
+    return (year_starts.astype('datetime64[M]') + (month - 1)).astype('datetime64[D]') + day
+
+
+def xetra_holidays(first_year: int, last_year: int):
+    """
+    Closing days of Xetra on weekdays and weekends
+    :param first_year: first year of the holidays
+    :param last_year: last year of the holidays
+    :return: sorted datetime64[D] array of the closing days of the years
+    """
+    years = np.arange(first_year, last_year + 1)
+    fixed = np.array([f'{year:04d}-{month_day}' for year in years for month_day in XETRA_FIXED_HOLIDAYS],
+                     dtype='datetime64[D]')
+    easter = easter_sundays(years)
+    return np.unique(np.concatenate([fixed, easter - 2, easter + 1]))
+
+
+def trading_calendar(first_year: int = None, last_year: int = None, holidays: list = None):
+    """
+    Business day calendar of the Xetra trading days, weekends and closing days are skipped
+    :param first_year: first year of the Xetra closing days, all days of the week are trading days if None
+    :param last_year: last year of the Xetra closing days
+    :param holidays: further closing days as strings in the format YYYY-MM-DD, e.g. special closures
+    :return: numpy busdaycalendar
+    """
+    extra = np.array(holidays or [], dtype='datetime64[D]')
+    if first_year is None:
+        return np.busdaycalendar(weekmask=ALL_DAYS_WEEKMASK, holidays=extra)
+    return np.busdaycalendar(weekmask=XETRA_WEEKMASK,
+                             holidays=np.concatenate([xetra_holidays(first_year, last_year), extra]))
@@ -0,0 +1,213 @@
+"""Incremental execution of the Xetra report1 ETL job per source object"""
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from xetra.common.constants import MetaProcessFormat, S3FileTypes
+from xetra.common.meta_process import MetaProcess
+
+
+class XetraIncremental():
+    """
+    Runs report1 of a XetraETL job incrementally per source object
+
+    The manifest next to the meta file records source date, key, ETag, size and processing time
+    of every processed source object and a partial report1 aggregate of every object is kept
+    under partials_key. The dates of the job and the processed dates of the last
+    run_manifest_lookback_days days are listed and compared with the manifest, so late files of
+    a processed date are picked up:
+
+    new objects: only they are fetched, the ISINs they contain are the affected ISIN-days of their date
+    changed or removed objects: all ISINs of their date are affected, an aggregate can not be taken
+                                back out of a day
+
+    The day aggregates are merged from the object partials, the other objects of a date are not
+    fetched again. The rows of the affected ISIN-days and the next row of their ISINs, whose change
+    to the previous day depends on them, are recomputed, so all dates from the first affected date
+    on are aggregated. The previous prices come from the previous close state and, for ISINs the
+    state has later prices of, from the partials of the last processed dates before. A partitioned
+    target gets the dates of these rows rewritten, a timestamped target gets them in the file of
+    the run and the latest file holds the valid row of an ISIN-day.
+    """
+
+    def __init__(self, xetra_etl):
+        """
+        Constructor for XetraIncremental
+        :param xetra_etl: XetraETL job with manifest_key and partials_key
+        """
+        self._logger = logging.getLogger(__name__)
+        self.etl = xetra_etl
+        if not xetra_etl.partials_key:
+            raise ValueError('An incremental run needs the partials_key of the object partials')
+        self._reported_dates = set()
+        # dates with object partials of earlier runs
+        self._partial_dates = []
+        # partial aggregates of this run per date, dates whose objects were all fetched are not read back
+        self._partials = {}
+
+    def run(self):
+        """
+        Processing the new and changed source objects, rewriting the affected report rows and
+        updating the meta file and the manifest
+        """
+        etl = self.etl
+        self._logger.info('Running Xetra report 1 incrementally started...')
+        with etl.metrics.stage('list'):
+            dates = self.__dates()
+            df_listing = self.__list(dates)
+        df_manifest = MetaProcess.read_manifest(etl.manifest_key, etl.s3_bucket_trg)
+        self._partial_dates = sorted(set(df_manifest[MetaProcessFormat.META_SOURCE_DATE_COL.value].astype(str)))
+        df_new, df_changed, df_removed = MetaProcess.diff_manifest(df_manifest, df_listing)
+        etl.metrics.increment('source_files', df_listing.shape[0])
+        etl.metrics.increment('new_objects', df_new.shape[0])
+        etl.metrics.increment('changed_objects', df_changed.shape[0] + df_removed.shape[0])
+        self._logger.info('%s new, %s changed and %s removed source objects', df_new.shape[0],
+                          df_changed.shape[0], df_removed.shape[0])
+        df_fetch = pd.concat([df_new, df_changed], ignore_index=True)
+        with etl.metrics.stage('extract_transform'):
+            affected = self.__process(df_fetch, df_changed, df_removed)
+        with etl.metrics.stage('transform'):
+            data_frame = self.__report(dates, df_listing, df_fetch, affected)
+        etl.metrics.increment('rows_out', data_frame.shape[0])
+        etl.load(data_frame)
+        # the manifest comes last, objects of a failed run are processed again and overwrite their partials
+        MetaProcess.update_manifest(df_fetch, list(df_removed[MetaProcessFormat.MANIFEST_KEY_COL.value]),
+                                    etl.manifest_key, etl.s3_bucket_trg)
+        self._logger.info('Running Xetra report 1 incrementally finished')
+        return True
+
+    def __dates(self):
+        """
+        Dates of the job and processed dates of the lookback period
+        :return dates: sorted list of the dates that are listed
+        """
+        etl = self.etl
+        first_recheck = np.datetime64(datetime.today().date() - timedelta(days=etl.run_args.run_manifest_lookback_days))
+        try:
+            processed = MetaProcess.read_meta_dates(etl.meta_key, etl.s3_bucket_trg)
+        except etl.s3_bucket_trg.exceptions.NoSuchKey:
+            processed = np.array([], dtype='datetime64[D]')
+        recheck = list(np.datetime_as_string(processed[processed >= first_recheck]))
+        self._reported_dates = set(etl.meta_update_list) | set(recheck)
+        return sorted(set(etl.extract_date_list) | set(recheck))
+
+    def __list(self, dates: list):
+        """
+        Listing the source objects of the dates with ETag and size
+        :return df_listing: DataFrame with source date, key, ETag and size ordered by date
+        """
+        etl = self.etl
+        # only dates before the lookback period are complete and their listings cacheable
+        first_recheck = (datetime.today().date() - timedelta(days=etl.run_args.run_manifest_lookback_days)).strftime(
+            MetaProcessFormat.META_DATE_FORMAT.value
+        )
+        keys = etl.s3_bucket_src.list_files_in_prefixes(
+            dates, max_workers=etl.src_args.src_max_workers, cache_dir=etl.src_args.src_listing_cache_dir,
+            cacheable={date for date in dates if date < first_recheck}
+        )
+        rows = [[date, key, *etl.s3_bucket_src.object_info(key)] for date, key in MetaProcess.dated_keys(dates, keys)]
+        return pd.DataFrame(rows, columns=MetaProcess.manifest_columns()[:-1])
+
+    def __process(self, df_fetch: pd.DataFrame, df_changed: pd.DataFrame, df_removed: pd.DataFrame):
+        """
+        Fetching the new and changed objects and replacing their partial aggregates
+        :return affected: dictionary of the affected ISINs per date, None if all ISINs of the date are affected
+        """
+        etl = self.etl
+        date_col = MetaProcessFormat.META_SOURCE_DATE_COL.value
+        key_col = MetaProcessFormat.MANIFEST_KEY_COL.value
+        affected = {date: None for date in pd.concat([df_changed[date_col], df_removed[date_col]])}
+        if not df_removed.empty:
+            etl.s3_bucket_trg.delete_objects([self.__partial_key(key) for key in df_removed[key_col]])
+        data_frames = etl.s3_bucket_src.iter_csv_to_dfs(list(df_fetch[key_col]),
+                                                        max_workers=etl.src_args.src_max_workers,
+                                                        **etl.src_read_kwargs)
+        for date, key, data_frame in zip(df_fetch[date_col], df_fetch[key_col], data_frames):
+            etl.metrics.increment('rows_in', data_frame.shape[0])
+            partial = etl._partial_report1(data_frame)
+            if partial.empty:
+                # a changed object may have had a partial before
+                etl.s3_bucket_trg.delete_objects([self.__partial_key(key)])
+                continue
+            etl.s3_bucket_trg.write_df_to_s3(partial, self.__partial_key(key), S3FileTypes.PARQUET.value)
+            self._partials.setdefault(date, []).append(partial)
+            if affected.get(date, set()) is not None:
+                affected.setdefault(date, set()).update(partial[etl.src_args.src_col_isin].astype(str))
+        if etl.trg_args.trg_partition_key:
+            # a partition is rewritten as a whole
+            affected = dict.fromkeys(affected)
+        return affected
+
+    def __report(self, dates: list, df_listing: pd.DataFrame, df_fetch: pd.DataFrame, affected: dict):
+        """
+        Computing the report rows of the affected ISIN-days and of the next row of their ISINs
+        """
+        etl = self.etl
+        affected = {date: isins for date, isins in affected.items() if isins is None or isins}
+        if not affected:
+            return pd.DataFrame()
+        isin_col, date_col = etl.src_args.src_col_isin, etl.src_args.src_col_date
+        first_affected = min(affected)
+        # the next row of an ISIN can be on any later date, e.g. after a weekend or a day without trades
+        window = [date for date in dates if date >= first_affected]
+        fetched = df_fetch.groupby(MetaProcessFormat.META_SOURCE_DATE_COL.value).size()
+        listed = df_listing.groupby(MetaProcessFormat.META_SOURCE_DATE_COL.value).size()
+        day_aggregates = []
+        for date in window:
+            if date in listed and fetched.get(date, 0) == listed[date]:
+                partials = self._partials.get(date, [])
+            else:
+                partials = self.__read_partials(date)
+            if partials:
+                day_aggregates.append(self.__day_aggregate(partials))
+        if not day_aggregates:
+            return pd.DataFrame()
+        aggregated = pd.concat(day_aggregates, ignore_index=True)
+        view = etl._chunk(sorted(self._reported_dates), window)
+        view.prev_close_state = self.__previous_prices(first_affected, set(aggregated[isin_col].astype(str)))
+        data_frame = view._finalize_report1(aggregated)
+        etl.report_state = view.report_state
+        data_frame = data_frame.sort_values(by=[isin_col, date_col], kind='stable').reset_index(drop=True)
+        recomputed = pd.Series([date in affected and (affected[date] is None or isin in affected[date])
+                                for isin, date in zip(data_frame[isin_col], data_frame[date_col])])
+        # the change to the previous day of the next row of the ISIN depends on the recomputed rows
+        recomputed |= recomputed.groupby(data_frame[isin_col]).shift(1, fill_value=False)
+        recomputed &= data_frame[date_col].isin(self._reported_dates)
+        if etl.trg_args.trg_partition_key:
+            recomputed = data_frame[date_col].isin(data_frame.loc[recomputed, date_col])
+        return data_frame[recomputed].reset_index(drop=True)
+
+    def __previous_prices(self, first_date: str, isins: set):
+        """
+        Last prices of the ISINs before first_date. The previous close state holds them unless an
+        ISIN has later prices, those ISINs are looked up in the partials of the last dates before
+        first_date that have partials, at most run_manifest_lookback_days + 1 dates are read.
+        :return state: DataFrame with ISIN, date, opening and closing price per ISIN, None if there are none
+        """
+        etl = self.etl
+        isin_col, date_col = etl.src_args.src_col_isin, etl.src_args.src_col_date
+        state = etl._read_prev_close_state() if etl.state_key else None
+        if state is not None:
+            state = state[state[date_col].astype(str) < first_date]
+        earlier = [date for date in self._partial_dates if date < first_date]
+        for date in reversed(earlier[-(etl.run_args.run_manifest_lookback_days + 1):]):
+            if state is not None and isins <= set(state[isin_col].astype(str)):
+                break
+            partials = self.__read_partials(date)
+            if partials:
+                state = etl._merge_prev_close_state(state, self.__day_aggregate(partials))
+        return state
+
+    def __day_aggregate(self, partials: list):
+        etl = self.etl
+        return etl._merge_partials_report1(partials).drop(columns=[etl._FIRST_TIME_COL, etl._LAST_TIME_COL])
+
+    def __read_partials(self, date: str):
+        etl = self.etl
+        return [etl.s3_bucket_trg.read_parquet_to_df(key)
+                for key in etl.s3_bucket_trg.list_filex_in_prefix(f'{etl.partials_key}{date}')]
+
+    def __partial_key(self, key: str):
+        return f'{self.etl.partials_key}{key}.{S3FileTypes.PARQUET.value}'
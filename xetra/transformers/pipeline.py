@@ -0,0 +1,195 @@
+"""Pipelined execution of the Xetra report1 ETL job"""
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from xetra.common.constants import S3FileTypes
+from xetra.common.meta_process import MetaProcess
+
+
+class XetraPipeline():
+    """
+    Runs report1 of a XetraETL job as stages working concurrently on bounded queues
+
+    fetch: src_max_workers threads download the source files, at most run_pipeline_queue_size files ahead
+    parse: run_pipeline_parse_workers threads parse the files and reduce them to partial aggregates
+    aggregate: the calling thread merges the partial aggregates per date and finalizes a date as soon
+               as the files of the next date arrive, the source listing is ordered by date
+    write: a thread writes the finalized dates while the next dates are fetched and aggregated
+
+    Memory is bounded by the queues instead of the number of extracted dates. The object cache
+    of the source connector is not used, the files are fetched as raw bytes.
+    """
+
+    # finalized dates waiting for the writer
+    WRITE_QUEUE_SIZE = 2
+    # part size of the streamed parquet target if trg_part_size is not set
+    DEFAULT_PART_SIZE = 8 * 1024 ** 2
+    _DONE = object()
+
+    def __init__(self, xetra_etl):
+        """
+        Constructor for XetraPipeline
+        :param xetra_etl: XetraETL job whose dates are processed
+        """
+        self._logger = logging.getLogger(__name__)
+        self.etl = xetra_etl
+        self._write_queue = queue.Queue(maxsize=self.WRITE_QUEUE_SIZE)
+        self._writer = None
+        self._write_error = None
+
+    def run(self):
+        """
+        Extracting, transforming and loading all dates of the job and updating the meta file
+        :return state: last prices per ISIN after the last extracted date, carried to the next backfill chunk
+        """
+        etl = self.etl
+        self._logger.info('Running Xetra report 1 as pipeline started...')
+        with etl.metrics.stage('list'):
+            files = etl.list_source_files()
+        etl.metrics.increment('source_files', len(files))
+        self._writer = threading.Thread(target=self.__write, name='xetra-pipeline-writer', daemon=True)
+        self._writer.start()
+        try:
+            with etl.metrics.stage('pipeline'):
+                state = self.__aggregate(files)
+            self.__put(self._DONE)
+        except BaseException as error:
+            # the writer aborts a streamed upload instead of completing it
+            if self._writer.is_alive():
+                self.__put(error)
+            raise
+        finally:
+            self._writer.join()
+        if self._write_error is not None:
+            raise self._write_error
+        with etl.metrics.stage('commit'):
+            # the state is written first, a state ahead of the meta file is not used by the next run
+            if etl.state_key and state is not None:
+                etl._update_prev_close_state(state)
+            MetaProcess.update_meta_file(etl.meta_update_list, etl.meta_key, etl.s3_bucket_trg)
+        self._logger.info('Running Xetra report 1 as pipeline finished')
+        return state
+
+    def __aggregate(self, files: list):
+        etl = self.etl
+        state = etl.prev_close_state
+        current_date, partials = None, []
+        dated_files = MetaProcess.dated_keys(etl.extract_date_list, files)
+        for date, partial in self.__parse(self.__fetch(dated_files)):
+            if date != current_date:
+                if current_date is not None:
+                    state = self.__finalize(current_date, partials, state)
+                current_date, partials = date, []
+            if not partial.empty:
+                partials.append(partial)
+            if len(partials) >= etl.run_args.run_stream_merge_batch:
+                partials = [etl._merge_partials_report1(partials)]
+        if current_date is not None:
+            state = self.__finalize(current_date, partials, state)
+        return state
+
+    def __finalize(self, date: str, partials: list, state: pd.DataFrame):
+        """
+        Computing the report rows of a complete date and handing them to the writer
+        :return state: state extended by the last prices of the date
+        """
+        etl = self.etl
+        if not partials:
+            return state
+        aggregated = etl._merge_partials_report1(partials).drop(columns=[etl._FIRST_TIME_COL, etl._LAST_TIME_COL])
+        day = etl._chunk([date], [date])
+        day.prev_close_state = state
+        report = day._finalize_report1(aggregated)
+        if date in etl.meta_update_list and not report.empty:
+            etl.metrics.increment('rows_out', report.shape[0])
+            self.__put((date, report))
+        # unrounded prices, the same a single transformation of all dates uses
+        return day.report_state
+
+    def __fetch(self, dated_files):
+        etl = self.etl
+        queue_size = etl.run_args.run_pipeline_queue_size
+        with ThreadPoolExecutor(max_workers=max(etl.src_args.src_max_workers, 1),
+                                thread_name_prefix='xetra-fetch') as executor:
+            pending = deque()
+            try:
+                for date, key in dated_files:
+                    pending.append((date, executor.submit(etl.s3_bucket_src.read_object, key)))
+                    if len(pending) >= queue_size:
+                        date, future = pending.popleft()
+                        yield date, future.result()
+                while pending:
+                    date, future = pending.popleft()
+                    yield date, future.result()
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def __parse(self, fetched):
+        workers = self.etl.run_args.run_pipeline_parse_workers
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='xetra-parse') as executor:
+            pending = deque()
+            try:
+                for date, body in fetched:
+                    pending.append((date, executor.submit(self.__parse_partial, body)))
+                    if len(pending) >= 2 * workers:
+                        date, future = pending.popleft()
+                        yield date, future.result()
+                while pending:
+                    date, future = pending.popleft()
+                    yield date, future.result()
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def __parse_partial(self, body: bytes):
+        etl = self.etl
+        start = time.perf_counter()
+        data_frame = etl.s3_bucket_src.parse_csv(body, **etl.src_read_kwargs)
+        etl.metrics.observe('parse_seconds', time.perf_counter() - start)
+        etl.metrics.increment('rows_in', data_frame.shape[0])
+        return etl._partial_report1(data_frame)
+
+    def __put(self, item):
+        while self._writer.is_alive():
+            try:
+                self._write_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise self._write_error or RuntimeError('The pipeline writer stopped')
+
+    def __finalized_dates(self):
+        while True:
+            item = self._write_queue.get()
+            if item is self._DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def __write(self):
+        etl = self.etl
+        try:
+            if etl.trg_args.trg_partition_key:
+                for date, report in self.__finalized_dates():
+                    etl._write_partition(date, report)
+            elif etl.trg_args.trg_format == S3FileTypes.PARQUET.value:
+                # every date becomes row groups of one parquet file uploaded while it is written
+                etl.s3_bucket_trg.write_parquet_stream(
+                    (report for _, report in self.__finalized_dates()), etl._target_key(),
+                    part_size=etl.trg_args.trg_part_size or self.DEFAULT_PART_SIZE,
+                    max_workers=etl.trg_args.trg_upload_workers, row_group_size=etl.trg_args.trg_row_group_size
+                )
+            else:
+                reports = [report for _, report in self.__finalized_dates()]
+                etl._write_target(pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(),
+                                  etl._target_key())
+        except BaseException as error:
+            self._write_error = error
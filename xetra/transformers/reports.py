@@ -0,0 +1,49 @@
+"""Several Xetra reports computed from one extraction"""
+import logging
+
+import pandas as pd
+
+
+class XetraReportsETL():
+    """
+    Runs several XetraETL jobs on one extraction of the source files
+
+    Every job computes the report of its trg_args.trg_report and keeps its own target and meta
+    file, so the jobs can be at different dates. The source files of the union of their dates
+    are downloaded once and every job transforms the rows of its own dates. All jobs have to
+    share the source configuration and connection. The reports are computed in batch mode.
+    """
+
+    def __init__(self, xetra_etls: list):
+        """
+        Constructor for XetraReportsETL
+        :param xetra_etls: XetraETL jobs of the reports
+        """
+        self._logger = logging.getLogger(__name__)
+        self.xetra_etls = xetra_etls
+
+    def extract(self):
+        """
+        Extracting the source files of all dates any of the reports needs
+        :return data_frame: source DataFrame of all dates
+        """
+        extract_dates = sorted(set().union(*(etl.extract_date_list for etl in self.xetra_etls)))
+        if not extract_dates:
+            return pd.DataFrame()
+        return self.xetra_etls[0]._chunk(extract_dates, extract_dates).extract()
+
+    def etl_reports(self):
+        """
+        Extracting once, then transforming and loading every report and updating its meta file
+        """
+        data_frame = self.extract()
+        for etl in self.xetra_etls:
+            self._logger.info('Computing Xetra report %s started...', etl.trg_args.trg_report)
+            report_frame = data_frame
+            if not data_frame.empty:
+                report_frame = data_frame[
+                    data_frame[etl.src_args.src_col_date].isin(etl.extract_date_list)
+                ].reset_index(drop=True)
+            etl.load(etl.transform_report(report_frame))
+            self._logger.info('Computing Xetra report %s finished', etl.trg_args.trg_report)
+        return True
@@ -1,12 +1,20 @@
 """Xetra ETL Component"""
 import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import NamedTuple
 
 import pandas as pd
-from datetime import datetime
+import pyarrow as pa
+from pandas.api.types import union_categoricals
+from datetime import datetime, timedelta
 import xetra.common.meta_process
-from xetra.common.s3 import S3BucketConnector
+from xetra.common.s3 import S3BucketConnector, filter_frame
+from xetra.common.metrics import RunMetrics
+from xetra.common.trading_calendar import trading_calendar
 from xetra.common.meta_process import MetaProcess, MetaProcessFormat
+from xetra.common.constants import XetraRunModes, S3FileTypes
+from xetra.transformers.pipeline import XetraPipeline
+from xetra.transformers.incremental import XetraIncremental
 
 
 class XetraSourceConfig(NamedTuple):
@@ -22,6 +30,23 @@ class XetraSourceConfig(NamedTuple):
     src_col_min_price: column name for minimum string price in source
     src_col_max_price: column name for maximum string price in source
     src_col_traded_vol: column name for traded volume in source
+    src_max_workers: number of threads fetching and parsing source files concurrently
+    src_listing_cache_dir: local directory for caching the listings of past dates, no caching if None
+    src_csv_engine: csv parser for the source files, one of CsvEngines, pandas default if None
+    src_dtypes: schema of the source columns as dtype by column name, applied while parsing. Prices
+                have to be float64, the report is computed in float64 and float32 prices with more
+                than 6 significant digits change the rounded prices and changes to the previous day
+    src_compacted_key: prefix in the target bucket of the compacted source data, one parquet file
+                       of the source columns per completed date sorted by ISIN and time, no compaction if None
+    src_isins: ISINs that are extracted, the rows of other ISINs are dropped while parsing
+    src_isin_file: local text file with further ISINs that are extracted, one per line,
+                   all ISINs are extracted if neither src_isins nor src_isin_file is set
+    src_trading_calendar: if True, only Xetra trading days are extracted, weekends and exchange
+                          holidays are neither listed nor recorded in the meta file
+    src_holidays: further closing days in the format YYYY-MM-DD skipped with src_trading_calendar
+    src_settle_hours: hours after the end of a date, in local time, until the date is completed. The
+                      listing of a completed date is cached and its source files are compacted, files
+                      arriving later are not seen by these
     """
 
     src_first_extract_date: str
@@ -33,6 +58,16 @@ class XetraSourceConfig(NamedTuple):
     src_col_min_price: str
     src_col_max_price: str
     src_col_traded_vol: str
+    src_max_workers: int = 1
+    src_listing_cache_dir: str = None
+    src_csv_engine: str = None
+    src_dtypes: dict = None
+    src_compacted_key: str = None
+    src_isins: list = None
+    src_isin_file: str = None
+    src_trading_calendar: bool = False
+    src_holidays: list = None
+    src_settle_hours: int = 6
 
 
 class XetraTargetConfig(NamedTuple):
@@ -52,6 +87,12 @@ class XetraTargetConfig(NamedTuple):
     trg_key: basic key of target file
     trg_key_date_format: date format of target file key
     trg_format: file format of the target file
+    trg_part_size: parquet targets are streamed as multipart upload with parts of this size in bytes if set
+    trg_upload_workers: number of parts uploaded concurrently in a multipart upload
+    trg_partition_key: if set, the target is written per date as <trg_partition_key>date=<date>/part-<n>.<format>
+    trg_isin_buckets: number of files per date partition, rows are assigned to files by the hash of the ISIN
+    trg_row_group_size: maximal number of rows per parquet row group
+    trg_report: name of the transformation in REPORT_TRANSFORMS computing the target
     """
 
     trg_col_date: str
@@ -65,6 +106,66 @@ class XetraTargetConfig(NamedTuple):
     trg_key: str
     trg_key_date_format: str
     trg_format: str
+    trg_part_size: int = None
+    trg_upload_workers: int = 4
+    trg_partition_key: str = None
+    trg_isin_buckets: int = 1
+    trg_row_group_size: int = None
+    trg_report: str = 'report1'
+
+
+def frame_to_ipc(data_frame: pd.DataFrame):
+    """
+    Serializing a DataFrame as Arrow IPC stream
+    :param data_frame: DataFrame to serialize
+    :return: bytes of the IPC stream
+    """
+    table = pa.Table.from_pandas(data_frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def ipc_to_frame(payload: bytes):
+    """
+    Deserializing an Arrow IPC stream to a DataFrame
+    :param payload: bytes of the IPC stream
+    :return: DataFrame
+    """
+    return pa.ipc.open_stream(pa.py_buffer(payload)).read_pandas()
+
+
+def _transform_report1_shard(xetra_etl, payload: bytes):
+    """
+    Process pool worker computing report1 for one shard of the source data
+    """
+    report = xetra_etl._transform_report1_frame(ipc_to_frame(payload))
+    return frame_to_ipc(report), frame_to_ipc(xetra_etl.report_state)
+
+
+class XetraRunConfig(NamedTuple):
+    """
+    Class for run configuration data
+
+    run_mode: execution mode of the ETL job, one of XetraRunModes
+    run_stream_merge_batch: number of partially aggregated source files merged at once in streaming mode
+    run_transform_workers: number of processes computing the transformations on shards of the ISINs
+    run_backfill_chunk_days: if set, the dates to extract are processed in chunks of this many days,
+                             the target and the meta file are written per chunk
+    run_pipeline_queue_size: number of source files fetched ahead of the parsing in pipelined mode
+    run_pipeline_parse_workers: number of threads parsing source files in pipelined mode
+    run_manifest_lookback_days: number of past days whose processed dates are listed again in incremental
+                                runs to pick up late or changed source files
+    """
+
+    run_mode: str = XetraRunModes.BATCH.value
+    run_stream_merge_batch: int = 64
+    run_transform_workers: int = 1
+    run_backfill_chunk_days: int = None
+    run_pipeline_queue_size: int = 64
+    run_pipeline_parse_workers: int = 2
+    run_manifest_lookback_days: int = 3
 
 
 class XetraETL():
@@ -72,8 +173,14 @@ class XetraETL():
     Reads the Xetra data, transform and writes transformed to target
     """
 
+    # helper columns of the partial report1 aggregates used in streaming mode
+    _FIRST_TIME_COL = 'first_time'
+    _LAST_TIME_COL = 'last_time'
+
     def __init__(self, s3_bucket_src: S3BucketConnector, s3_bucket_trg: S3BucketConnector,
-                 meta_key: str, src_args: XetraSourceConfig, trg_args: XetraTargetConfig):
+                 meta_key: str, src_args: XetraSourceConfig, trg_args: XetraTargetConfig,
+                 run_args: XetraRunConfig = None, state_key: str = None, metrics: RunMetrics = None,
+                 manifest_key: str = None, partials_key: str = None):
         """
         Constructor for XetraTransformer
 
@@ -82,63 +189,426 @@ class XetraETL():
         :param meta_key: used as self.meta_key -> key of meta file
         :param src_args: NamedTouple class with source configuration data
         :param trg_args: NamedTouple class with target configuration data
+        :param run_args: NamedTouple class with run configuration data, defaults if None
+        :param state_key: key of the previous close state file, no state is kept if None
+        :param metrics: metrics of the run the stages are recorded in, a private instance if None
+        :param manifest_key: key of the manifest of the processed source objects, runs are incremental
+                             per source object if set
+        :param partials_key: prefix of the partial aggregates per source object of incremental runs
         """
         self._logger = logging.getLogger(__name__)
+        self.metrics = metrics or RunMetrics()
         self.s3_bucket_src = s3_bucket_src
         self.s3_bucket_trg = s3_bucket_trg
         self.meta_key = meta_key
         self.src_args = src_args
         self.trg_args = trg_args
+        self.run_args = run_args or XetraRunConfig()
         self.extract_date, self.extract_date_list = MetaProcess.return_date_list(
-            self.src_args.src_first_extract_date, self.meta_key, self.s3_bucket_trg
+            self.src_args.src_first_extract_date, self.meta_key, self.s3_bucket_trg, self._trading_calendar()
         )
         self.meta_update_list = [date for date in self.extract_date_list if date >= self.extract_date]
+        # the last prices per ISIN of earlier runs make the extra day before extract_date unnecessary
+        self.state_key = state_key
+        self.prev_close_state = None
+        # unrounded last prices per ISIN after the transformed dates, set by the report1 transformation
+        self.report_state = None
+        self.manifest_key = manifest_key
+        self.partials_key = partials_key
+        # distinguishes the timestamped target keys of backfill chunks written in the same second
+        self._target_key_suffix = ''
+        if self.state_key and self.extract_date_list:
+            state = self._read_prev_close_state()
+            if state is not None and not state.empty and state[self.src_args.src_col_date].max() < self.extract_date:
+                self.prev_close_state = state
+                self.extract_date_list = list(self.meta_update_list)
+        # only the source columns are parsed, keys are kept as strings if the schema does not say otherwise
+        self.src_read_kwargs = {
+            'engine': self.src_args.src_csv_engine,
+            'columns': self.src_args.src_columns,
+            'dtypes': {
+                self.src_args.src_col_isin: 'str',
+                self.src_args.src_col_date: 'str',
+                self.src_args.src_col_time: 'str',
+                **(self.src_args.src_dtypes or {})
+            }
+        }
+        self.isin_universe = self._read_isin_universe()
+        if self.isin_universe is not None:
+            self.src_read_kwargs['filters'] = {self.src_args.src_col_isin: self.isin_universe}
+
+    def _trading_calendar(self):
+        """
+        Calendar of the dates that are extracted
+        :return calendar: numpy busdaycalendar of the Xetra trading days, None if every day is extracted
+        """
+        if not self.src_args.src_trading_calendar:
+            return None
+        # the year before the first date holds the trading day providing the previous closing prices
+        first_year = datetime.strptime(self.src_args.src_first_extract_date,
+                                       MetaProcessFormat.META_DATE_FORMAT.value).year - 1
+        return trading_calendar(first_year, datetime.today().year, self.src_args.src_holidays)
+
+    def _read_isin_universe(self):
+        """
+        Reading the ISINs that are extracted from src_isins and src_isin_file
+        :return isins: sorted list of ISINs, None if all ISINs are extracted
+        """
+        if self.src_args.src_isins is None and not self.src_args.src_isin_file:
+            return None
+        isins = set(self.src_args.src_isins or [])
+        if self.src_args.src_isin_file:
+            with open(self.src_args.src_isin_file, encoding='utf-8') as isin_file:
+                isins.update(line.strip() for line in isin_file if line.strip())
+        self._logger.info('Extracting %s ISINs', len(isins))
+        return sorted(isins)
+
+    def __getstate__(self):
+        # S3 connections can not be pickled, an unpickled instance can only transform data
+        state = self.__dict__.copy()
+        state['s3_bucket_src'] = None
+        state['s3_bucket_trg'] = None
+        state['metrics'] = None
+        return state
+
+    def _first_open_date(self):
+        """
+        First date that is not completed, see src_settle_hours
+        :return date: date string, the dates before it are completed
+        """
+        return (datetime.today() - timedelta(hours=self.src_args.src_settle_hours)).strftime(
+            MetaProcessFormat.META_DATE_FORMAT.value
+        )
+
+    def list_source_files(self, dates: list = None):
+        """
+        Listing the source files of dates
+        :param dates: dates whose files are listed, extract_date_list if None
+        :return files: list of source file keys ordered by date
+        """
+        dates = self.extract_date_list if dates is None else dates
+        # files of completed dates do not change, so their listing can be cached
+        first_open = self._first_open_date()
+        return self.s3_bucket_src.list_files_in_prefixes(
+            dates,
+            max_workers=self.src_args.src_max_workers,
+            cache_dir=self.src_args.src_listing_cache_dir,
+            cacheable={date for date in dates if date < first_open}
+        )
 
     def extract(self):
         self._logger.info('Extracting Xetra source files started...')
-        files = [key for date in self.extract_date_list for key in self.s3_bucket_src.list_filex_in_prefix(date)]
-        if not files:
-            data_frame = pd.DataFrame()
-        else:
-            data_frame = pd.concat([self.s3_bucket_src.read_csv_to_df(file) for file in files], ignore_index=True)
+        with self.metrics.stage('extract'):
+            if self.src_args.src_compacted_key:
+                data_frames = self._extract_days()
+                data_frame = self._concat_frames(data_frames) if data_frames else pd.DataFrame()
+            else:
+                files = self.list_source_files()
+                self.metrics.increment('source_files', len(files))
+                if not files:
+                    data_frame = pd.DataFrame()
+                else:
+                    data_frame = self._concat_frames(self.s3_bucket_src.read_csv_to_dfs(
+                        files, max_workers=self.src_args.src_max_workers, **self.src_read_kwargs
+                    ))
+        self.metrics.increment('rows_in', data_frame.shape[0])
         self._logger.info('Extracting Xetra source files finished')
         return data_frame
 
+    @staticmethod
+    def _concat_frames(data_frames: list):
+        """
+        Concatenating source DataFrames, keeping categorical columns categorical with the
+        sorted union of all categories instead of falling back to object columns
+        """
+        for column in data_frames[0].select_dtypes(include='category').columns:
+            categories = union_categoricals([data_frame[column] for data_frame in data_frames],
+                                            sort_categories=True).categories
+            for data_frame in data_frames:
+                data_frame[column] = data_frame[column].cat.set_categories(categories)
+        return pd.concat(data_frames, ignore_index=True)
+
+    def _extract_days(self):
+        """
+        Extracting the source data of extract_date_list, a date from its compacted file if there is
+        one. The completed dates read from the source files are compacted on the way.
+        :return data_frames: list of DataFrames ordered by date
+        """
+        compacted = self._compacted_dates()
+        dates = [date for date in self.extract_date_list if date not in compacted]
+        files = self.list_source_files(dates)
+        self.metrics.increment('source_files', len(files))
+        # the compacted files hold all ISINs, the ISIN universe is applied after compacting
+        filters = self.src_read_kwargs.get('filters')
+        source_frames = iter(self.s3_bucket_src.read_csv_to_dfs(files, max_workers=self.src_args.src_max_workers,
+                                                                **self.__unfiltered_read_kwargs()))
+        files_per_date = dict.fromkeys(dates, 0)
+        for date, _ in MetaProcess.dated_keys(dates, files):
+            files_per_date[date] += 1
+        first_open = self._first_open_date()
+        data_frames = []
+        for date in self.extract_date_list:
+            if date in compacted:
+                data_frames.append(self.s3_bucket_trg.read_parquet_to_df(self._compacted_key(date),
+                                                                         columns=self.src_args.src_columns,
+                                                                         filters=filters))
+                continue
+            day_frames = [next(source_frames) for _ in range(files_per_date[date])]
+            if day_frames and date < first_open:
+                day_frames = [self._compact_day(date, day_frames)]
+            data_frames.extend(filter_frame(data_frame, filters) for data_frame in day_frames)
+        return data_frames
+
+    def __unfiltered_read_kwargs(self):
+        return {name: value for name, value in self.src_read_kwargs.items() if name != 'filters'}
+
+    def compact_source(self):
+        """
+        Compacting the source files of the completed dates of extract_date_list that are not compacted
+        yet, one date after another
+        :return dates: list of the compacted dates
+        """
+        first_open = self._first_open_date()
+        compacted_dates = []
+        with self.metrics.stage('compact'):
+            compacted = self._compacted_dates()
+            for date in self.extract_date_list:
+                if date in compacted or date >= first_open:
+                    continue
+                files = self.list_source_files([date])
+                if files:
+                    self._compact_day(date, self.s3_bucket_src.read_csv_to_dfs(
+                        files, max_workers=self.src_args.src_max_workers, **self.__unfiltered_read_kwargs()
+                    ))
+                    compacted_dates.append(date)
+        self._logger.info('Compacted the source files of %s dates', len(compacted_dates))
+        return compacted_dates
+
+    def _compacted_key(self, date: str):
+        return f'{self.src_args.src_compacted_key}{date}.{S3FileTypes.PARQUET.value}'
+
+    def _compacted_dates(self):
+        """
+        Dates of extract_date_list with a compacted file
+        """
+        if not self.src_args.src_compacted_key or not self.extract_date_list:
+            return set()
+        # only the keys of the dates are listed, not every compacted date of the history
+        keys = set(self.s3_bucket_trg.list_files_in_prefixes(
+            [self._compacted_key(date) for date in self.extract_date_list], max_workers=self.src_args.src_max_workers
+        ))
+        return {date for date in self.extract_date_list if self._compacted_key(date) in keys}
+
+    def _compact_day(self, date: str, data_frames: list):
+        """
+        Writing the source data of a date as one parquet file sorted by ISIN and time
+        :return data_frame: the compacted DataFrame
+        """
+        data_frame = self._concat_frames(data_frames).sort_values(
+            by=[self.src_args.src_col_isin, self.src_args.src_col_time], kind='stable'
+        ).reset_index(drop=True)
+        # row groups sorted by ISIN let readers of a few ISINs skip most of the file
+        self.s3_bucket_trg.write_df_to_s3(data_frame, self._compacted_key(date), S3FileTypes.PARQUET.value,
+                                          row_group_size=self.trg_args.trg_row_group_size)
+        return data_frame
+
+    def extract_iter(self):
+        """
+        Generator extracting the source files one by one
+        :return: yields one DataFrame per source file or compacted date
+        """
+        self._logger.info('Extracting Xetra source files as stream started...')
+        with self.metrics.stage('list'):
+            compacted = self._compacted_dates()
+            files = self.list_source_files([date for date in self.extract_date_list if date not in compacted])
+        self.metrics.increment('source_files', len(files))
+        for date in sorted(compacted):
+            data_frame = self.s3_bucket_trg.read_parquet_to_df(self._compacted_key(date),
+                                                               columns=self.src_args.src_columns,
+                                                               filters=self.src_read_kwargs.get('filters'))
+            self.metrics.increment('rows_in', data_frame.shape[0])
+            yield data_frame
+        for data_frame in self.s3_bucket_src.iter_csv_to_dfs(files, max_workers=self.src_args.src_max_workers,
+                                                             **self.src_read_kwargs):
+            self.metrics.increment('rows_in', data_frame.shape[0])
+            yield data_frame
+        self._logger.info('Extracting Xetra source files as stream finished')
+
+    def transform_report(self, data_frame: pd.DataFrame):
+        """
+        Applying the transformation of the target configured by trg_report
+        :param data_frame: source DataFrame
+        :return data_frame: transformed DataFrame
+        """
+        return REPORT_TRANSFORMS[self.trg_args.trg_report](self, data_frame)
+
     def transform_report1(self, data_frame: pd.DataFrame):
         if data_frame.empty:
             self._logger.info('The dataframe is empty. No transformations will ne applied.')
             return data_frame
         self._logger.info('Applying transformations to Xetra source data for report 1 started...')
-        data_frame = data_frame.loc[:, self.src_args.src_columns]
-        data_frame.dropna(inplace=True)
-        data_frame[self.trg_args.trg_col_op_price] = data_frame.sort_values(by=[self.src_args.src_col_time]).groupby([
-            self.src_args.src_col_isin,
-            self.src_args.src_col_date
-        ])[self.src_args.src_col_starting_price].transform('first')
+        with self.metrics.stage('transform'):
+            if self.run_args.run_transform_workers > 1:
+                data_frame = self._transform_report1_sharded(data_frame)
+            else:
+                data_frame = self._transform_report1_frame(data_frame)
+        self.metrics.increment('rows_out', data_frame.shape[0])
+        self._logger.info('Applying transformations to Xetra source data finished...')
+        return data_frame
 
-        data_frame[self.trg_args.trg_col_clos_price] = data_frame.sort_values(by=[self.src_args.src_col_time]).groupby([
+    def _transform_report1_frame(self, data_frame: pd.DataFrame):
+        """
+        Computing report1 for source data in a single process
+        """
+        data_frame = data_frame.loc[:, self.src_args.src_columns].dropna()
+        # one stable sort, after it first and last of every group are the opening and closing trades
+        data_frame = data_frame.sort_values(by=[
             self.src_args.src_col_isin,
-            self.src_args.src_col_date
-        ])[self.src_args.src_col_starting_price].transform('last')
-
-        data_frame.rename(columns={
-            self.src_args.src_col_min_price: self.trg_args.trg_col_min_price,
-            self.src_args.src_col_max_price: self.trg_args.trg_col_max_price,
-            self.src_args.src_col_traded_vol: self.trg_args.trg_col_daily_trad_vol
-        }, inplace=True)
-
+            self.src_args.src_col_date,
+            self.src_args.src_col_time
+        ], kind='stable')
         data_frame = data_frame.groupby([
             self.src_args.src_col_isin,
-            self.src_args.src_col_date], as_index=False
+            self.src_args.src_col_date], as_index=False, observed=True, sort=False
+        ).agg(**{
+            self.trg_args.trg_col_op_price: (self.src_args.src_col_starting_price, 'first'),
+            self.trg_args.trg_col_clos_price: (self.src_args.src_col_starting_price, 'last'),
+            self.trg_args.trg_col_min_price: (self.src_args.src_col_min_price, 'min'),
+            self.trg_args.trg_col_max_price: (self.src_args.src_col_max_price, 'max'),
+            self.trg_args.trg_col_daily_trad_vol: (self.src_args.src_col_traded_vol, 'sum')
+        })
+        return self._finalize_report1(data_frame)
+
+    def _transform_report1_sharded(self, data_frame: pd.DataFrame):
+        """
+        Computing report1 in a process pool on shards of the source data partitioned by the hash of the ISIN.
+        Every computation of report1 only depends on the rows of one ISIN, so the shards are independent.
+        Shards and results are passed to the workers as Arrow IPC streams instead of pickled DataFrames.
+        """
+        workers = self.run_args.run_transform_workers
+        data_frame = data_frame.loc[:, self.src_args.src_columns]
+        shard_ids = pd.util.hash_pandas_object(data_frame[self.src_args.src_col_isin], index=False).to_numpy() % workers
+        payloads = [frame_to_ipc(data_frame[shard_ids == shard]) for shard in range(workers)
+                    if (shard_ids == shard).any()]
+        with ProcessPoolExecutor(max_workers=min(workers, len(payloads))) as executor:
+            results = list(executor.map(_transform_report1_shard, [self] * len(payloads), payloads))
+        data_frame = pd.concat([ipc_to_frame(report) for report, _ in results], ignore_index=True)
+        # every shard state contains the previous close state, merging drops the duplicates
+        self.report_state = self._merge_prev_close_state(
+            None, pd.concat([ipc_to_frame(state) for _, state in results], ignore_index=True)
+        )
+        return data_frame.sort_values(by=[self.src_args.src_col_isin, self.src_args.src_col_date],
+                                      kind='stable').reset_index(drop=True)
+
+    def transform_report1_stream(self, data_frames):
+        """
+        Applying the report1 transformations on a stream of source DataFrames. Every DataFrame is
+        reduced to partial aggregates per ISIN and date right away, so only the aggregates are kept in memory.
+        The time of the stage includes fetching the source DataFrames consumed from the stream.
+
+        :param data_frames: iterable of source DataFrames, e.g. extract_iter()
+        :return data_frame: transformed report1 DataFrame
+        """
+        self._logger.info('Applying streaming transformations to Xetra source data for report 1 started...')
+        aggregated = None
+        partials = []
+        with self.metrics.stage('extract_transform'):
+            for data_frame in data_frames:
+                partial = self._partial_report1(data_frame)
+                if not partial.empty:
+                    partials.append(partial)
+                if len(partials) >= self.run_args.run_stream_merge_batch:
+                    aggregated = self._merge_partials_report1(
+                        ([aggregated] if aggregated is not None else []) + partials
+                    )
+                    partials = []
+            if partials:
+                aggregated = self._merge_partials_report1(([aggregated] if aggregated is not None else []) + partials)
+            if aggregated is None:
+                self._logger.info('The dataframe is empty. No transformations will ne applied.')
+                return pd.DataFrame()
+            data_frame = self._finalize_report1(aggregated.drop(columns=[self._FIRST_TIME_COL,
+                                                                         self._LAST_TIME_COL]))
+        self.metrics.increment('rows_out', data_frame.shape[0])
+        self._logger.info('Applying streaming transformations to Xetra source data finished...')
+        return data_frame
+
+    def _partial_report1(self, data_frame: pd.DataFrame):
+        """
+        Reducing source data to partial report1 aggregates per ISIN and date, keeping the
+        time of the first and last trade so partial aggregates can be merged later on
+        """
+        if data_frame.empty:
+            return data_frame
+        data_frame = data_frame.loc[:, self.src_args.src_columns].dropna()
+        data_frame = data_frame.sort_values(by=[self.src_args.src_col_time], kind='stable')
+        return data_frame.groupby([self.src_args.src_col_isin, self.src_args.src_col_date], as_index=False,
+                                  observed=True).agg(**{
+            self._FIRST_TIME_COL: (self.src_args.src_col_time, 'first'),
+            self.trg_args.trg_col_op_price: (self.src_args.src_col_starting_price, 'first'),
+            self._LAST_TIME_COL: (self.src_args.src_col_time, 'last'),
+            self.trg_args.trg_col_clos_price: (self.src_args.src_col_starting_price, 'last'),
+            self.trg_args.trg_col_min_price: (self.src_args.src_col_min_price, 'min'),
+            self.trg_args.trg_col_max_price: (self.src_args.src_col_max_price, 'max'),
+            self.trg_args.trg_col_daily_trad_vol: (self.src_args.src_col_traded_vol, 'sum')
+        })
+
+    def _merge_partials_report1(self, partials: list):
+        """
+        Merging partial report1 aggregates into one partial aggregate per ISIN and date
+        """
+        data_frame = pd.concat(partials, ignore_index=True)
+        keys = [self.src_args.src_col_isin, self.src_args.src_col_date]
+        merged = data_frame.sort_values(by=[self._FIRST_TIME_COL], kind='stable').groupby(
+            keys, as_index=False, observed=True
         ).agg({
-            self.trg_args.trg_col_op_price: 'min',
-            self.trg_args.trg_col_clos_price: 'min',
+            self._FIRST_TIME_COL: 'first',
+            self.trg_args.trg_col_op_price: 'first',
             self.trg_args.trg_col_min_price: 'min',
             self.trg_args.trg_col_max_price: 'max',
             self.trg_args.trg_col_daily_trad_vol: 'sum'
         })
+        closing = data_frame.sort_values(by=[self._LAST_TIME_COL], kind='stable').groupby(
+            keys, as_index=False, observed=True
+        ).agg({
+            self._LAST_TIME_COL: 'last',
+            self.trg_args.trg_col_clos_price: 'last'
+        })
+        merged = merged.merge(closing, on=keys)
+        return merged.loc[:, keys + [
+            self._FIRST_TIME_COL,
+            self.trg_args.trg_col_op_price,
+            self._LAST_TIME_COL,
+            self.trg_args.trg_col_clos_price,
+            self.trg_args.trg_col_min_price,
+            self.trg_args.trg_col_max_price,
+            self.trg_args.trg_col_daily_trad_vol
+        ]]
 
-        data_frame[self.trg_args.trg_col_ch_prev_clos] = data_frame.sort_values(by=self.src_args.src_col_date).groupby(
+    def _finalize_report1(self, data_frame: pd.DataFrame):
+        """
+        Computing the change to the previous day, rounding and restricting the report1
+        aggregates per ISIN and date to the dates that have to be reported. The unrounded last
+        prices per ISIN are kept as report_state.
+        """
+        # the report is written with string keys and float64 prices whatever the source schema is
+        data_frame = data_frame.astype({
+            self.src_args.src_col_isin: str,
+            self.src_args.src_col_date: str,
+            self.trg_args.trg_col_op_price: 'float64',
+            self.trg_args.trg_col_clos_price: 'float64',
+            self.trg_args.trg_col_min_price: 'float64',
+            self.trg_args.trg_col_max_price: 'float64'
+        })
+        # changes to the previous day are computed from unrounded prices, in later runs as well
+        self.report_state = self._merge_prev_close_state(self.prev_close_state, data_frame)
+        history = data_frame.loc[:, [self.src_args.src_col_isin, self.src_args.src_col_date,
+                                     self.trg_args.trg_col_op_price]]
+        if self.prev_close_state is not None:
+            # state rows get an index behind the data, so the shifted values align with the data again
+            state = self.prev_close_state.loc[:, history.columns]
+            history = pd.concat([history, state.set_axis(range(len(history), len(history) + len(state)))])
+        data_frame[self.trg_args.trg_col_ch_prev_clos] = history.sort_values(by=self.src_args.src_col_date).groupby(
             [self.src_args.src_col_isin])[self.trg_args.trg_col_op_price].shift(1)
 
         data_frame[self.trg_args.trg_col_ch_prev_clos] = (
@@ -147,24 +617,195 @@ class XetraETL():
                                                          ) / data_frame[self.trg_args.trg_col_ch_prev_clos] * 100
 
         data_frame = data_frame.round(decimals=2)
-        data_frame = data_frame[data_frame.Date >= self.extract_date].reset_index(drop=True)
-        self._logger.info('Applying transformations to Xetra source data finished...')
+        data_frame = data_frame[data_frame[self.src_args.src_col_date] >= self.extract_date].reset_index(drop=True)
         return data_frame
 
     def load(self, data_frame: pd.DataFrame):
-        target_key = (
+        with self.metrics.stage('load'):
+            if self.trg_args.trg_partition_key:
+                self._load_partitioned(data_frame)
+            else:
+                self._write_target(data_frame, self._target_key())
+            self._logger.info('Xetra target data successfully written.')
+            # the state is written first, a state ahead of the meta file is not used by the next run
+            if self.state_key and self.report_state is not None:
+                self._update_prev_close_state(self.report_state)
+                self._logger.info('Xetra previous close state successfully updated.')
+            MetaProcess.update_meta_file(self.meta_update_list, self.meta_key, self.s3_bucket_trg)
+            self._logger.info('Xetra meta file successfully updated.')
+        return True
+
+    def _target_key(self):
+        """
+        Key of the target file of this run if the target is not partitioned
+        """
+        return (
             f'{self.trg_args.trg_key}'
-            f'{datetime.today().strftime(self.trg_args.trg_key_date_format)}.'
+            f'{datetime.today().strftime(self.trg_args.trg_key_date_format)}{self._target_key_suffix}.'
             f'{self.trg_args.trg_format}'
         )
-        self.s3_bucket_trg.write_df_to_s3(data_frame, target_key, self.trg_args.trg_format)
-        self._logger.info('Xetra target data successfully written.')
-        MetaProcess.update_meta_file(self.meta_update_list, self.meta_key, self.s3_bucket_trg)
-        self._logger.info('Xetra meta file successfully updated.')
-        return True
+
+    def _read_prev_close_state(self):
+        """
+        Reading the last opening and closing price per ISIN of earlier runs
+        :return state: DataFrame with ISIN, date, opening and closing price or None if there is no state yet
+        """
+        try:
+            return self.s3_bucket_trg.read_parquet_to_df(self.state_key)
+        except self.s3_bucket_trg.exceptions.NoSuchKey:
+            return None
+
+    def _update_prev_close_state(self, data_frame: pd.DataFrame):
+        """
+        Merging the last unrounded prices per ISIN, e.g. report_state, into the previous close state
+        """
+        state = self._merge_prev_close_state(self._read_prev_close_state(), data_frame)
+        self.s3_bucket_trg.write_df_to_s3(state, self.state_key, S3FileTypes.PARQUET.value)
+
+    def _merge_prev_close_state(self, state: pd.DataFrame, data_frame: pd.DataFrame):
+        """
+        Merging the last prices per ISIN of a report into a previous close state
+        :param state: previous close state or None
+        :param data_frame: report1 aggregates per ISIN and date
+        :return state: DataFrame with the last date, opening and closing price per ISIN
+        """
+        columns = [self.src_args.src_col_isin, self.src_args.src_col_date,
+                   self.trg_args.trg_col_op_price, self.trg_args.trg_col_clos_price]
+        dtypes = dict(zip(columns, [str, str, 'float64', 'float64']))
+        frames = [data_frame.loc[:, columns].astype(dtypes)]
+        if state is not None:
+            frames.insert(0, state.loc[:, columns].astype(dtypes))
+        state = pd.concat(frames, ignore_index=True).sort_values(by=self.src_args.src_col_date, kind='stable')
+        return state.groupby(self.src_args.src_col_isin, as_index=False, observed=True).last()
+
+    def _write_target(self, data_frame: pd.DataFrame, target_key: str):
+        return self.s3_bucket_trg.write_df_to_s3(data_frame, target_key, self.trg_args.trg_format,
+                                                 part_size=self.trg_args.trg_part_size,
+                                                 max_workers=self.trg_args.trg_upload_workers,
+                                                 row_group_size=self.trg_args.trg_row_group_size)
+
+    def _load_partitioned(self, data_frame: pd.DataFrame):
+        """
+        Writing the target partitioned by date and bucketed by the hash of the ISIN. Every file is
+        sorted by ISIN, so the row group statistics allow predicate pushdown on the ISIN. The keys
+        only depend on date and bucket, so rewriting a date replaces its files.
+        """
+        if data_frame.empty:
+            self._logger.info('The DataFrame is empty! File will not be written!')
+            return
+        for date, date_frame in data_frame.groupby(self.src_args.src_col_date, sort=True):
+            self._write_partition(date, date_frame)
+
+    def _write_partition(self, date: str, date_frame: pd.DataFrame):
+        """
+        Replacing the files of the date partition with the report rows of the date
+        """
+        isin_col = self.src_args.src_col_isin
+        prefix = f'{self.trg_args.trg_partition_key}date={date}/'
+        existing_keys = set(self.s3_bucket_trg.list_filex_in_prefix(prefix))
+        buckets = pd.util.hash_pandas_object(date_frame[isin_col], index=False) % self.trg_args.trg_isin_buckets
+        written_keys = set()
+        for bucket, bucket_frame in date_frame.groupby(buckets.to_numpy(), sort=True):
+            target_key = f'{prefix}part-{bucket:05d}.{self.trg_args.trg_format}'
+            self._write_target(bucket_frame.sort_values(by=isin_col).reset_index(drop=True), target_key)
+            written_keys.add(target_key)
+        stale_keys = existing_keys - written_keys
+        if stale_keys:
+            self.s3_bucket_trg.delete_objects(sorted(stale_keys))
 
     def etl_report1(self):
-        data_frame = self.extract()
-        data_frame = self.transform_report1(data_frame)
+        if self.manifest_key:
+            return XetraIncremental(self).run()
+        if self.run_args.run_backfill_chunk_days and len(self.meta_update_list) > self.run_args.run_backfill_chunk_days:
+            return self._etl_report1_backfill()
+        if self.run_args.run_mode == XetraRunModes.PIPELINED.value:
+            XetraPipeline(self).run()
+            return True
+        if self.run_args.run_mode == XetraRunModes.STREAMING.value:
+            data_frame = self.transform_report1_stream(self.extract_iter())
+        else:
+            data_frame = self.extract()
+            data_frame = self.transform_report1(data_frame)
         self.load(data_frame)
         return True
+
+    def _etl_report1_backfill(self):
+        """
+        Running report1 in chunks of run_backfill_chunk_days dates. Every chunk is loaded and
+        committed to the meta file on its own, so a failed run resumes after the last committed
+        chunk. In batch mode the next chunk is extracted while the current one is transformed
+        and loaded, in pipelined mode every chunk runs as pipeline. The last prices per ISIN are
+        carried from chunk to chunk, so only the first chunk reads the day before the extract date.
+        """
+        chunk_days = self.run_args.run_backfill_chunk_days
+        date_chunks = [self.meta_update_list[start:start + chunk_days]
+                       for start in range(0, len(self.meta_update_list), chunk_days)]
+        lookback = self.extract_date_list[:len(self.extract_date_list) - len(self.meta_update_list)]
+        chunks = [self._chunk(dates, lookback + dates if number == 0 else dates)
+                  for number, dates in enumerate(date_chunks)]
+        self._logger.info('Backfilling %s dates in %s chunks', len(self.meta_update_list), len(chunks))
+        streaming = self.run_args.run_mode == XetraRunModes.STREAMING.value
+        pipelined = self.run_args.run_mode == XetraRunModes.PIPELINED.value
+        prev_close_state = self.prev_close_state
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            extraction = None if streaming or pipelined else executor.submit(chunks[0].extract)
+            for number, chunk in enumerate(chunks):
+                chunk.prev_close_state = prev_close_state
+                if pipelined:
+                    prev_close_state = XetraPipeline(chunk).run()
+                    self._logger.info('Backfill chunk %s to %s committed', chunk.meta_update_list[0],
+                                      chunk.meta_update_list[-1])
+                    continue
+                if streaming:
+                    data_frame = chunk.transform_report1_stream(chunk.extract_iter())
+                else:
+                    data_frame = extraction.result()
+                    if number + 1 < len(chunks):
+                        extraction = executor.submit(chunks[number + 1].extract)
+                    data_frame = chunk.transform_report1(data_frame)
+                if chunk.report_state is not None:
+                    # unrounded prices, the same a single transformation of all dates uses
+                    prev_close_state = chunk.report_state
+                if not data_frame.empty:
+                    # the lookback days are only needed for the change to the previous day
+                    data_frame = data_frame[
+                        data_frame[self.src_args.src_col_date] >= chunk.meta_update_list[0]
+                    ].reset_index(drop=True)
+                chunk.load(data_frame)
+                self._logger.info('Backfill chunk %s to %s committed', chunk.meta_update_list[0],
+                                  chunk.meta_update_list[-1])
+        return True
+
+    def _chunk(self, dates: list, extract_dates: list):
+        """
+        Creating a view of the ETL job restricted to the dates of one backfill chunk or pipelined date
+        :param dates: dates of the chunk that are reported and committed to the meta file
+        :param extract_dates: dates of the chunk that are extracted
+        :return chunk: shallow copy sharing the connections and metrics
+        """
+        # not copy.copy, it would drop the connections like pickling does
+        chunk = self.__class__.__new__(self.__class__)
+        chunk.__dict__.update(self.__dict__)
+        chunk.extract_date = extract_dates[0]
+        chunk.extract_date_list = extract_dates
+        chunk.meta_update_list = dates
+        chunk._target_key_suffix = f'_{dates[0]}_{dates[-1]}'
+        return chunk
+
+
+# transformations a target can be computed with, see XetraTargetConfig.trg_report
+REPORT_TRANSFORMS = {
+    'report1': XetraETL.transform_report1
+}
+
+
+def register_report_transform(name: str):
+    """
+    Decorator registering a transformation for XetraTargetConfig.trg_report
+    :param name: name of the transformation
+    :return: decorator taking a function (xetra_etl, data_frame) -> transformed DataFrame
+    """
+    def register(transform):
+        REPORT_TRANSFORMS[name] = transform
+        return transform
+    return register